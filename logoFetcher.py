@@ -1,18 +1,29 @@
-import requests
 import os
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent / "src" / "model"))
+import httpClient
 
 # URL of the logo
 url = "https://content.sportslogos.net/logos/30/596/full/akron_zips_logo_primary_2022_sportslogosnet-8974.png"
 
-# Create the logos directory if it doesn't exist
-os.makedirs("public/logos", exist_ok=True)
+def fetch_logo(url=url, output_file="public/logos/akronTest.png"):
+    # Create the logos directory if it doesn't exist
+    os.makedirs(os.path.dirname(output_file), exist_ok=True)
+
+    # Fetch the image (SSL verification disabled), conditionally once we have it
+    response = httpClient.default_client().get(url, body_file=output_file)
+    response.raise_for_status()
+    if response.unchanged and os.path.exists(output_file):
+        print(f"Logo unchanged, keeping {output_file}")
+        return
 
-# Fetch the image (SSL verification disabled)
-response = requests.get(url, verify=False)
-response.raise_for_status()
+    # Save the image
+    with open(output_file, "wb") as f:
+        f.write(response.content)
 
-# Save the image
-with open("public/logos/akronTest.png", "wb") as f:
-    f.write(response.content)
+    print(f"Logo saved successfully to {output_file}")
 
-print("Logo saved successfully to public/logos/akronTest.png")
+if __name__ == "__main__":
+    fetch_logo()
@@ -0,0 +1,160 @@
+"""
+Upset probabilities for every pair of teams in one pass.
+
+Teams are sorted by rating, so for every i < j in the upper triangle team i is the
+higher rated side. All those pairs are gathered from the team stat matrix at once (see
+model.featurize_matchups) and scored with one model call per column set, instead of a
+predict call per hypothetical game. The result is a square matrix of
+P(row team beats column team) on a neutral court with a team index. It is stored as
+float16 (or uint8 in 1/255 steps) so looking up any pair is O(1): the 64-team bracket
+takes a few KB and all ~365 D-I teams about 260KB.
+
+    python allPairs.py --scope all --dtype uint8 --json ../data/pairProbabilities.json
+"""
+import argparse
+import json
+from pathlib import Path
+
+import numpy as np
+
+import model
+
+MODEL_DIR = Path(__file__).resolve().parent
+OUTPUT_DIR = MODEL_DIR / "allPairs"
+# every neutral-site pair has rating_diff >= 0, so this segment scores every possible game
+PAIR_SEGMENT = [0, np.inf]
+UINT8_SCALE = 255
+
+def season_teams(season):
+    """Every team with both stats and a rating in the season."""
+    team_stats, _, ratings_by_team = season
+    return [team for team in ratings_by_team.index if team in team_stats.index and not np.isnan(ratings_by_team[team])]
+
+def win_probabilities(teams, year, artifacts_list, season=None):
+    """
+    P[i, j] = probability teams[i] beats teams[j] on a neutral court, averaged over the
+    given model artifacts (like write_upset_data_from_matchups does for base/advanced).
+    The diagonal is 0.5.
+    """
+    if season is None:
+        season = model.load_prediction_season(year)
+    team_stats, averages, ratings_by_team = season
+
+    missing = [team for team in teams if team not in team_stats.index or team not in ratings_by_team.index]
+    if missing:
+        raise ValueError(f"Team stats or ratings missing for: {', '.join(missing)}")
+
+    ratings = ratings_by_team.reindex(teams).to_numpy(dtype=np.float64)
+    # stable, so equally rated teams keep input order like predict_many's teamA-first tie break
+    order = np.argsort(-ratings, kind="stable")
+    hi, lo = np.triu_indices(len(teams), k=1)
+    hi, lo = order[hi], order[lo]
+    names = np.array(teams, dtype=object)
+
+    columns = {
+        "year": np.full(len(hi), int(year), dtype=np.int16),
+        "hiTeam": names[hi],
+        "loTeam": names[lo],
+        "winningTeam": names[hi],
+        "higherRating": ratings[hi],
+        "lowerRating": ratings[lo],
+        "homeSign": np.zeros(len(hi), dtype=np.int8),
+        "is_postseason": np.zeros(len(hi), dtype=bool),
+        "seed_diff": np.full(len(hi), np.nan),
+    }
+
+    upset_prob = np.zeros(len(hi))
+    for artifacts in artifacts_list:
+        game_df = model.build_matchup_frame(columns, team_stats, averages, artifacts["ratingSegment"], numBuckets=0)
+        if len(game_df) != len(hi):
+            raise ValueError(f"Only {len(game_df)} of {len(hi)} pairs could be featurized for segment {artifacts['ratingSegment']}")
+        upset_prob += model.score_games(game_df, artifacts) / len(artifacts_list)
+
+    P = np.full((len(teams), len(teams)), 0.5)
+    P[hi, lo] = 1 - upset_prob
+    P[lo, hi] = upset_prob
+    return P
+
+class PairMatrix:
+    """Stored all-pairs matrix with O(1) lookups by team name."""
+
+    def __init__(self, teams, probs, year=None):
+        self.teams = list(teams)
+        self.index = {team: i for i, team in enumerate(self.teams)}
+        self.probs = probs
+        self.year = year
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as arrays:
+            return cls([str(team) for team in arrays["teams"]], arrays["probs"], int(arrays["year"]))
+
+    def win_prob(self, team, opponent):
+        """Probability team beats opponent on a neutral court."""
+        value = self.probs[self.index[team], self.index[opponent]]
+        return float(value) / UINT8_SCALE if self.probs.dtype == np.uint8 else float(value)
+
+    def save(self, path):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "wb") as f:
+            np.savez(f, teams=np.array(self.teams, dtype=str), probs=self.probs, year=np.array(self.year))
+
+def compact_probs(P, dtype="float16"):
+    if dtype == "uint8":
+        return np.round(P * UINT8_SCALE).astype(np.uint8)
+    return P.astype(np.float16)
+
+def build_pair_matrix(year=model.END_YEAR, teams=None, colsList=None, dtype="float16"):
+    """Score every pair of teams (default: every team in the season) and return a PairMatrix."""
+    season = model.load_prediction_season(year)
+    teams = teams or season_teams(season)
+    colsList = colsList or [model.BASE_COLS, model.ADVANCED_COLS]
+    artifacts_list = [model.train_model_artifacts(PAIR_SEGMENT, cols, numBuckets=0, compact=True) for cols in colsList]
+    P = win_probabilities(teams, year, artifacts_list, season=season)
+    return PairMatrix(teams, compact_probs(P, dtype), year)
+
+def bracket_teams(year):
+    """The 64 teams in util/matchups{year}.json."""
+    with open(MODEL_DIR / "util" / f"matchups{year}.json", "r", encoding="utf-8") as f:
+        regions = json.load(f)
+    return [team for region_matchups in regions.values() for matchup in region_matchups for team in matchup.split("_", 1)]
+
+def write_pair_matrix(matrix, output, json_path=None):
+    """Save the matrix as npz, and optionally as {teams, probs} JSON for the frontend."""
+    matrix.save(output)
+    print(f"Wrote {len(matrix.teams)}x{len(matrix.teams)} {matrix.probs.dtype} matrix ({matrix.probs.nbytes / 1024:.1f}KB) to {output}")
+
+    if json_path:
+        uint8 = matrix.probs.dtype == np.uint8
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "year": matrix.year,
+                "teams": matrix.teams,
+                "scale": UINT8_SCALE if uint8 else 1,
+                "probs": matrix.probs.tolist() if uint8 else matrix.probs.astype(np.float64).round(4).tolist(),
+            }, f)
+        print(f"Wrote {json_path}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Precompute upset probabilities for every pair of teams.")
+    parser.add_argument("--year", type=int, default=model.END_YEAR)
+    parser.add_argument("--scope", choices=["bracket", "all"], default="bracket",
+        help="teams in util/matchups{year}.json, or every team with stats and a rating")
+    parser.add_argument("--teams", nargs="+", default=None, help="explicit team list (overrides --scope), e.g. all 68")
+    parser.add_argument("--cols", nargs="+", choices=["base", "advanced"], default=["base", "advanced"],
+        help="models whose probabilities are averaged")
+    parser.add_argument("--dtype", choices=["float16", "uint8"], default="float16")
+    parser.add_argument("--output", default=None, help="npz output (default: allPairs/{year}_{scope}.npz)")
+    parser.add_argument("--json", default=None, help="also write {teams, probs} JSON for the frontend")
+    args = parser.parse_args(argv)
+
+    teams = args.teams or (bracket_teams(args.year) if args.scope == "bracket" else None)
+    colsList = [model.BASE_COLS if cols == "base" else model.ADVANCED_COLS for cols in args.cols]
+    matrix = build_pair_matrix(args.year, teams=teams, colsList=colsList, dtype=args.dtype)
+
+    output = args.output or OUTPUT_DIR / f"{args.year}_{'custom' if args.teams else args.scope}.npz"
+    write_pair_matrix(matrix, output, json_path=args.json)
+
+if __name__ == "__main__":
+    main()
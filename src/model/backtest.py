@@ -0,0 +1,180 @@
+"""
+Walk-forward backtests over arbitrary year windows.
+
+Rather than the single static START_YEAR/SPLIT_YEAR/END_YEAR split, every fold trains on
+a range of seasons and is scored on a later range. Rolling-origin folds (train <= Y-1,
+test Y) are generated for an expanding window or for fixed-length windows, and explicit
+"2010-2019:2020-2025" folds can be added on top. The frame for all the years involved is
+built once from the per-season feature cache, shared read-only with a process pool (see
+sharedMatrix), and folds run in parallel. The result is one per-year metrics table
+covering every window, so window choices can be compared from a single command.
+
+    python backtest.py --windows 0 3 5 --fold 2010-2022:2023-2026
+"""
+import argparse
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from sklearn.metrics import brier_score_loss, log_loss
+from sklearn.preprocessing import StandardScaler
+
+import model
+from sharedMatrix import attach_shared, publish, shared
+
+OUTPUT_DIR = Path(__file__).resolve().parent / "backtest"
+
+def rolling_folds(firstTrainYear, firstTestYear, lastTestYear, window=0):
+    """
+    One fold per test year: train on the window years before it (every year back to
+    firstTrainYear when window is 0), test on that year alone.
+    """
+    label = "expanding" if window == 0 else f"last{window}"
+    folds = []
+    for testYear in range(firstTestYear, lastTestYear + 1):
+        trainStart = firstTrainYear if window == 0 else max(firstTrainYear, testYear - window)
+        folds.append({"label": label, "trainYears": [trainStart, testYear - 1], "testYears": [testYear, testYear]})
+    return folds
+
+def parse_fold(spec):
+    """'2010-2019:2020-2025' (or '2010-2019:2020') -> fold dict."""
+    def year_range(part):
+        first, _, last = part.partition("-")
+        return [int(first), int(last or first)]
+
+    train, _, test = spec.partition(":")
+    if not test:
+        raise ValueError(f"Fold '{spec}' should look like TRAIN_START-TRAIN_END:TEST_START-TEST_END")
+    return {"label": spec, "trainYears": year_range(train), "testYears": year_range(test)}
+
+def score(y, probs):
+    if len(y) == 0:
+        return {"games": 0, "upsets": 0, "upsetRate": None, "meanProb": None, "brier": None, "logLoss": None}
+    return {
+        "games": int(len(y)),
+        "upsets": int(y.sum()),
+        "upsetRate": float(y.mean()),
+        "meanProb": float(probs.mean()),
+        "brier": float(brier_score_loss(y, probs)),
+        "logLoss": float(log_loss(y, probs, labels=[0, 1])),
+    }
+
+def evaluate_fold(fold, hyperparams):
+    """Train on the fold's training years of the shared frame and score each test year."""
+    years = shared["year"]
+    train = (years >= fold["trainYears"][0]) & (years <= fold["trainYears"][1])
+    test = (years >= fold["testYears"][0]) & (years <= fold["testYears"][1])
+
+    # same scaling as train_model_artifacts: fit on the training years only
+    scaler = StandardScaler()
+    X_train = scaler.fit_transform(shared["X"][train])
+    X_test = scaler.transform(shared["X"][test])
+    calibrated_lr = model.fit_calibrated_model(X_train, shared["y"][train], hyperparams)
+    probs = calibrated_lr.predict_proba(X_test)[:, 1]
+
+    y_test = shared["y"][test]
+    test_years = years[test]
+    postseason = shared["is_postseason"][test]
+    rows = []
+    for year in np.unique(test_years):
+        in_year = test_years == year
+        in_postseason = in_year & postseason
+        postseason_score = score(y_test[in_postseason], probs[in_postseason])
+        rows.append({
+            "fold": fold["label"],
+            "trainYears": fold["trainYears"],
+            "trainGames": int(train.sum()),
+            "year": int(year),
+            **score(y_test[in_year], probs[in_year]),
+            "postseasonGames": postseason_score["games"],
+            "postseasonBrier": postseason_score["brier"],
+        })
+    return rows
+
+def run_backtest(
+    ratingSegment,
+    colsToKeep,
+    folds,
+    numBuckets=0,
+    hyperparams=None,
+    workers=None,
+    name=None
+):
+    """Run every fold in parallel and return the per-year metrics table (also written to backtest/{name}.json)."""
+    hyperparams = {**model.DEFAULT_HYPERPARAMS, **(hyperparams or {})}
+    startYear = min(min(fold["trainYears"][0], fold["testYears"][0]) for fold in folds)
+    endYear = max(max(fold["trainYears"][1], fold["testYears"][1]) for fold in folds)
+
+    df, team_info = model.prepare_model_dataframe(ratingSegment, numBuckets, columns=colsToKeep, startYear=startYear, endYear=endYear)
+    years = team_info["year"].to_numpy()
+    y = df["upset"].to_numpy()
+
+    # folds without both outcomes in training (or without any test games) can't be scored
+    runnable = []
+    for fold in folds:
+        train = (years >= fold["trainYears"][0]) & (years <= fold["trainYears"][1])
+        test = (years >= fold["testYears"][0]) & (years <= fold["testYears"][1])
+        if len(np.unique(y[train])) < 2 or not test.any():
+            print(f"Skipping fold {fold['label']} train {fold['trainYears']} test {fold['testYears']}: not enough games")
+            continue
+        runnable.append(fold)
+
+    rows = []
+    with tempfile.TemporaryDirectory(prefix="backtest-") as shared_dir:
+        paths = publish({
+            "X": df[colsToKeep].to_numpy(np.float64),
+            "y": y,
+            "year": years,
+            "is_postseason": team_info["is_postseason"].to_numpy(bool),
+        }, shared_dir)
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=attach_shared, initargs=(paths,)) as executor:
+            futures = [executor.submit(evaluate_fold, fold, hyperparams) for fold in runnable]
+            for fold, future in zip(runnable, futures):
+                fold_rows = future.result()
+                rows += fold_rows
+                print(f"Fold {fold['label']} train {fold['trainYears']} test {fold['testYears']}: "
+                    + ", ".join(f"{row['year']} brier {row['brier']:.4f}" for row in fold_rows))
+
+    table = pd.DataFrame(rows)
+    name = name or f"{'_'.join(colsToKeep)}_{ratingSegment[0]}to{ratingSegment[1]}"
+    OUTPUT_DIR.mkdir(exist_ok=True)
+    output_file = OUTPUT_DIR / f"{name}.json"
+    table.to_json(output_file, orient="records", indent=2)
+
+    if len(table):
+        print("\nBrier score by test year:")
+        print(table.pivot_table(index="year", columns="fold", values="brier", sort=False).sort_index().round(4).to_string())
+        # game-weighted over every test year of each fold set
+        weighted = table.assign(weighted=table["brier"] * table["games"]).groupby("fold", sort=False)[["weighted", "games"]].sum()
+        print("\nOverall (game-weighted) Brier:")
+        print((weighted["weighted"] / weighted["games"]).round(4).to_string())
+    print(f"Metrics written to {output_file}")
+    return table
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Walk-forward backtest of the upset model over year windows.")
+    parser.add_argument("--cols", choices=["base", "advanced"], default="advanced")
+    parser.add_argument("--segment", type=float, nargs=2, default=[model.RANK_DIFF_MIN, model.RANK_DIFF_MAX])
+    parser.add_argument("--first-train-year", type=int, default=model.START_YEAR)
+    parser.add_argument("--first-test-year", type=int, default=model.START_YEAR + 3)
+    parser.add_argument("--last-test-year", type=int, default=model.END_YEAR)
+    parser.add_argument("--windows", type=int, nargs="*", default=[0],
+        help="rolling-origin training window lengths in years (0 = expanding)")
+    parser.add_argument("--fold", nargs="*", default=[], help="extra TRAIN_START-TRAIN_END:TEST_START-TEST_END folds")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: one per core)")
+    parser.add_argument("--name", default=None, help="output file name")
+    args = parser.parse_args(argv)
+
+    folds = []
+    for window in args.windows:
+        folds += rolling_folds(args.first_train_year, args.first_test_year, args.last_test_year, window)
+    folds += [parse_fold(spec) for spec in args.fold]
+
+    colsToKeep = model.BASE_COLS if args.cols == "base" else model.ADVANCED_COLS
+    run_backtest(args.segment, colsToKeep, folds, workers=args.workers, name=args.name)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+"""
+Benchmarks for the model and extraction pipeline, with stored baselines.
+
+Every stage runs against the checked-in data (matchups, ratings, regSeasonGames and
+the saved util/tempTeamPhps and util/tempTeamQuads pages) in a fresh Python process,
+so peak RSS is the stage's own and in-process caches start empty. CPU time includes
+any worker processes the stage starts, and peak RSS adds the largest worker's. The on-disk caches
+(featureCache, matchupStore, modelCache) and every output file are redirected into a
+scratch directory, so the tree is never touched. By default that directory starts
+empty (cold caches). With --warm the stage is run once untimed first and the timed
+runs reuse its caches.
+
+For each stage the median wall and CPU time and the peak RSS over --repeat runs are
+compared with benchmarkBaselines.json. A stage is flagged when its time or memory
+grows by more than the tolerance, and then the exit status is 1. --save records the
+current numbers as the new baseline.
+
+    python benchmark.py
+    python benchmark.py --stages train_model_artifacts extractKpOvrStats --repeat 5
+    python benchmark.py --save
+"""
+import argparse
+import json
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+MODEL_DIR = Path(__file__).resolve().parent
+UTIL_DIR = MODEL_DIR / "util"
+BASELINE_FILE = MODEL_DIR / "benchmarkBaselines.json"
+YEAR = 2026
+# timing changes smaller than this are noise, whatever the relative change
+MIN_TIME_CHANGE = 0.05
+STAGES = [
+    "prepare_model_dataframe",
+    "train_model_artifacts",
+    "write_upset_data_from_matchups",
+    "extractKpOvrStats",
+    "extractQuadStats",
+    "process_year",
+]
+
+def redirect_caches(scratch):
+    """Point every on-disk cache at the scratch directory."""
+    import featureCache
+    import matchupStore
+    import modelCache
+
+    featureCache.CACHE_DIR = scratch / "featureCache"
+    matchupStore.STORE_DIR = scratch / "matchupStore"
+    modelCache.CACHE_DIR = scratch / "modelCache"
+
+def util_module(name):
+    if str(UTIL_DIR) not in sys.path:
+        sys.path.append(str(UTIL_DIR))
+    import importlib
+
+    return importlib.import_module(name)
+
+def prepare_stage(name, scratch):
+    """Import what the stage needs and return a zero-argument callable that runs it."""
+    import matchupStore
+    import model
+
+    segment = [model.RANK_DIFF_MIN, model.RANK_DIFF_MAX]
+    if name == "prepare_model_dataframe":
+        return lambda: model.prepare_model_dataframe(segment, 0)
+    if name == "train_model_artifacts":
+        return lambda: model.train_model_artifacts(segment, model.ADVANCED_COLS, useCache=False)
+    if name == "write_upset_data_from_matchups":
+        from allPairs import PAIR_SEGMENT
+
+        # the default segment leaves out the 1 v 16 games, so score every first-round game
+        return lambda: model.write_upset_data_from_matchups(YEAR, PAIR_SEGMENT, output_path=scratch / "upsetData.json")
+    if name == "extractKpOvrStats":
+        extractor = util_module("quadAndOvrExtractor")
+        # no manifest, so every page is parsed
+        extractor.EXTRACT_STATE_DIR = scratch / "extractState"
+        return lambda: extractor.extractKpOvrStats(YEAR, target_file=scratch / f"kpOvrStats{YEAR}.json")
+    if name == "extractQuadStats":
+        extractor = util_module("quadAndOvrExtractor")
+        # no manifest, so every page is parsed
+        extractor.EXTRACT_STATE_DIR = scratch / "extractState"
+        return lambda: extractor.extractQuadStats(YEAR, target_file=scratch / f"quadStats{YEAR}.json")
+    if name == "process_year":
+        gameExtractor = util_module("gameExtractor")
+        # a copy of the season's matchups with no ingest state, so every line is parsed again
+        matchups_dir = scratch / "matchups"
+        matchups_dir.mkdir(exist_ok=True)
+        shutil.copy(matchupStore.MATCHUPS_DIR / f"{YEAR}.json", matchups_dir / f"{YEAR}.json")
+        gameExtractor.MATCHUPS_DIR = matchups_dir
+        gameExtractor.INGEST_STATE_DIR = scratch / "ingestState"
+        gameExtractor.clear_ingest_state(str(YEAR))
+        return lambda: gameExtractor.process_year(str(MODEL_DIR / "regSeasonGames"), str(YEAR))
+    raise ValueError(f"Unknown stage: {name}")
+
+def run_child(name, scratch):
+    """Run one stage in this process and print its measurements as JSON on the last line."""
+    import contextlib
+    import io
+    import resource
+    import time
+
+    scratch = Path(scratch)
+    redirect_caches(scratch)
+    stage = prepare_stage(name, scratch)
+    def children_cpu():
+        usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+        return usage.ru_utime + usage.ru_stime
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        wall_start, cpu_start, children_start = time.perf_counter(), time.process_time(), children_cpu()
+        stage()
+        wall = time.perf_counter() - wall_start
+        # worker pools (kenpom page parsing, backtest, bootstrap) are reaped by now, so their CPU counts here
+        cpu = time.process_time() - cpu_start + children_cpu() - children_start
+    # ru_maxrss is in KB on Linux; for children it is the largest worker's, which ran alongside this process
+    peak_mb = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss + resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss) / 1024
+    print(json.dumps({"wall": wall, "cpu": cpu, "peakRssMb": peak_mb}))
+
+def measure(name, scratch):
+    completed = subprocess.run(
+        [sys.executable, "-W", "ignore", str(Path(__file__).resolve()), "--child", name, str(scratch)],
+        capture_output=True, text=True, cwd=MODEL_DIR,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"{name} failed:\n{completed.stderr}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def benchmark_stage(name, repeat=3, warm=False):
+    """Median wall/CPU seconds and max peak RSS over repeat fresh-process runs."""
+    runs = []
+    with tempfile.TemporaryDirectory(prefix="benchmark-") as scratch:
+        scratch = Path(scratch)
+        if warm:
+            measure(name, scratch)
+        for _ in range(repeat):
+            if not warm:
+                for path in scratch.iterdir():
+                    shutil.rmtree(path) if path.is_dir() else path.unlink()
+            runs.append(measure(name, scratch))
+    return {
+        "wall": statistics.median(run["wall"] for run in runs),
+        "cpu": statistics.median(run["cpu"] for run in runs),
+        "peakRssMb": max(run["peakRssMb"] for run in runs),
+        "repeat": repeat,
+    }
+
+def machine_info():
+    import os
+
+    return {"platform": platform.platform(), "python": platform.python_version(), "cpus": os.cpu_count()}
+
+def load_baselines(path=BASELINE_FILE):
+    if not Path(path).exists():
+        return {"machine": None, "stages": {}}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def regressions(result, baseline, time_tolerance, memory_tolerance):
+    """Which of the stage's measurements grew past the tolerance over its baseline."""
+    flagged = []
+    for key, tolerance in (("wall", time_tolerance), ("cpu", time_tolerance), ("peakRssMb", memory_tolerance)):
+        if key not in baseline or result[key] <= baseline[key] * (1 + tolerance):
+            continue
+        if key != "peakRssMb" and result[key] - baseline[key] < MIN_TIME_CHANGE:
+            continue
+        flagged.append(key)
+    return flagged
+
+def run_benchmarks(stages=None, repeat=3, warm=False, time_tolerance=0.25, memory_tolerance=0.15, save=False, baseline_path=BASELINE_FILE):
+    """Benchmark stages against the baselines. Returns {stage: result} with any regressions listed."""
+    stages = stages or STAGES
+    mode = "warm" if warm else "cold"
+    baselines = load_baselines(baseline_path)
+    baseline_stages = baselines["stages"].get(mode, {})
+    if baselines["machine"] and baselines["machine"] != machine_info():
+        print(f"Note: baselines were recorded on {baselines['machine']}, not this machine")
+
+    print(f"{'Stage':<32} {'Wall':>8} {'CPU':>8} {'RSS MB':>8}   {'vs baseline'}")
+    results = {}
+    for name in stages:
+        result = benchmark_stage(name, repeat, warm)
+        baseline = baseline_stages.get(name)
+        result["regressions"] = regressions(result, baseline, time_tolerance, memory_tolerance) if baseline else []
+        results[name] = result
+
+        if baseline:
+            change = " ".join(
+                f"{key} {(result[key] / baseline[key] - 1) * 100:+.0f}%" for key in ("wall", "cpu", "peakRssMb") if baseline.get(key)
+            )
+            flag = f"  REGRESSION ({', '.join(result['regressions'])})" if result["regressions"] else ""
+        else:
+            change, flag = "no baseline", ""
+        print(f"{name:<32} {result['wall']:>7.2f}s {result['cpu']:>7.2f}s {result['peakRssMb']:>8.0f}   {change}{flag}")
+
+    if save:
+        baselines["machine"] = machine_info()
+        baselines["stages"].setdefault(mode, {}).update({
+            name: {key: round(result[key], 4) for key in ("wall", "cpu", "peakRssMb", "repeat")}
+            for name, result in results.items()
+        })
+        with open(baseline_path, "w", encoding="utf-8") as f:
+            json.dump(baselines, f, indent=2)
+        print(f"Baselines written to {baseline_path}")
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the model and extraction pipeline against stored baselines.")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=None, help="stages to run (default: all)")
+    parser.add_argument("--repeat", type=int, default=3, help="fresh-process runs per stage")
+    parser.add_argument("--warm", action="store_true", help="run each stage once first so the timed runs reuse its caches")
+    parser.add_argument("--time-tolerance", type=float, default=0.25, help="allowed relative growth in wall/CPU time")
+    parser.add_argument("--memory-tolerance", type=float, default=0.15, help="allowed relative growth in peak RSS")
+    parser.add_argument("--baselines", default=str(BASELINE_FILE))
+    parser.add_argument("--save", action="store_true", help="record these results as the new baselines")
+    parser.add_argument("--child", nargs=2, metavar=("STAGE", "SCRATCH"), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        run_child(*args.child)
+        return
+
+    results = run_benchmarks(
+        args.stages,
+        repeat=args.repeat,
+        warm=args.warm,
+        time_tolerance=args.time_tolerance,
+        memory_tolerance=args.memory_tolerance,
+        save=args.save,
+        baseline_path=args.baselines
+    )
+    if any(result["regressions"] for result in results.values()) and not args.save:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
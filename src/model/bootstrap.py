@@ -0,0 +1,242 @@
+"""
+Bootstrap confidence intervals for matchup upset probabilities.
+
+upsetData.json has one number per first-round matchup: the average of the base and
+advanced models' upset probabilities. Here the training years (START_YEAR..SPLIT_YEAR)
+are resampled with replacement, either game by game or whole seasons at a time, and the
+scaler and calibrated model are refit for every replicate. Each refit scores all target
+matchups in one batch. The training matrix (the union of every column set) and the
+target features are built once and shared read-only with a process pool (see
+sharedMatrix), so replicates only pay for their fits. With --upset-data the models are
+trained on the rating segment upsetData.json records for its upset numbers.
+
+    python bootstrap.py --replicates 500 --resample seasons --upset-data ../data/upsetData.json
+"""
+import argparse
+import json
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+import model
+from allPairs import PAIR_SEGMENT
+from sharedMatrix import attach_shared, publish, shared
+
+MODEL_DIR = Path(__file__).resolve().parent
+OUTPUT_DIR = MODEL_DIR / "bootstrap"
+
+def matchup_pairs(year, matchups_path=None):
+    """(matchup, teamA, teamB) for every first-round game, as write_upset_data_from_matchups reads them."""
+    matchups_path = Path(matchups_path) if matchups_path else MODEL_DIR / "util" / f"matchups{year}.json"
+    with open(matchups_path, "r", encoding="utf-8") as f:
+        regions = json.load(f)
+
+    pairs = []
+    for region_matchups in regions.values():
+        for matchup in region_matchups:
+            teams = matchup.split("_", 1)
+            if len(teams) != 2:
+                raise ValueError(f"Invalid matchup format: {matchup}")
+            pairs.append((matchup, *teams))
+    return pairs
+
+def resample_rows(years, resample, rng):
+    """Training row positions for one replicate."""
+    if resample == "games":
+        return rng.integers(0, len(years), len(years))
+
+    seasons = np.unique(years)
+    picked = rng.choice(seasons, len(seasons))
+    return np.concatenate([np.flatnonzero(years == season) for season in picked])
+
+def fit_replicate(seed, resample, col_sets, hyperparams):
+    """
+    Refit every column set on one resample of the shared training rows (all of them when
+    seed is None) and return the target matchups' upset probabilities averaged over sets.
+    """
+    from sklearn.preprocessing import StandardScaler
+
+    years = shared["year"]
+    rows = np.arange(len(years)) if seed is None else resample_rows(years, resample, np.random.default_rng(seed))
+    X_train = shared["X_train"][rows]
+    y_train = shared["y_train"][rows]
+
+    probs = np.zeros(len(shared["X_targets"]))
+    for col_ids in col_sets:
+        # same scaling as train_model_artifacts: fit on the training rows only
+        scaler = StandardScaler()
+        calibrated_lr = model.fit_calibrated_model(scaler.fit_transform(X_train[:, col_ids]), y_train, hyperparams)
+        probs += calibrated_lr.predict_proba(scaler.transform(shared["X_targets"][:, col_ids]))[:, 1] / len(col_sets)
+    return probs
+
+def run_bootstrap(
+    year=model.END_YEAR,
+    matchups_path=None,
+    ratingSegment=None,
+    colsList=None,
+    replicates=200,
+    resample="games",
+    levels=(0.05, 0.95),
+    seed=0,
+    workers=None,
+    hyperparams=None,
+    output_path=None,
+):
+    """
+    Percentile intervals for every first-round matchup in matchups_path (default util/matchups{year}.json).
+    Returns {matchup: {upset, mean, std, interval}}, also written to bootstrap/{year}.json.
+    """
+    ratingSegment = ratingSegment or PAIR_SEGMENT
+    colsList = colsList or [model.BASE_COLS, model.ADVANCED_COLS]
+    hyperparams = {**model.DEFAULT_HYPERPARAMS, **(hyperparams or {})}
+    columns = list(dict.fromkeys(col for cols in colsList for col in cols))
+    col_sets = [[columns.index(col) for col in cols] for cols in colsList]
+
+    pairs = matchup_pairs(year, matchups_path)
+    info, game_df, scored = model.featurize_pairs([(team_a, team_b) for _, team_a, team_b in pairs], year, ratingSegment)
+    failed = info[info["error"].notna()]
+    if len(failed):
+        raise ValueError(failed["error"].iloc[0])
+    X_targets = np.empty((len(pairs), len(columns)))
+    X_targets[scored] = game_df[columns].to_numpy(np.float64)
+
+    data = model.training_data(ratingSegment, columns)
+    years = data["team_info"].loc[data["X_train"].index, "year"].to_numpy()
+    print(f"{replicates} {resample} bootstrap replicates over {len(years)} games "
+        f"({years.min()}-{years.max()}) for {len(pairs)} matchups")
+
+    replicate_seeds = np.random.SeedSequence(seed).spawn(replicates)
+    with tempfile.TemporaryDirectory(prefix="bootstrap-") as shared_dir:
+        paths = publish({
+            "X_train": data["X_train"].to_numpy(np.float64),
+            "y_train": data["y_train"].to_numpy(),
+            "year": years,
+            "X_targets": X_targets,
+        }, shared_dir)
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=attach_shared, initargs=(paths,)) as executor:
+            point = executor.submit(fit_replicate, None, resample, col_sets, hyperparams)
+            futures = [executor.submit(fit_replicate, replicate_seed, resample, col_sets, hyperparams) for replicate_seed in replicate_seeds]
+            probs = np.empty((replicates, len(pairs)))
+            for i, future in enumerate(futures):
+                probs[i] = future.result()
+                if (i + 1) % max(1, replicates // 10) == 0:
+                    print(f"  {i + 1}/{replicates} replicates")
+            point = point.result()
+
+    lower, upper = np.quantile(probs, levels, axis=0)
+    intervals = {
+        matchup: {
+            "upset": float(point[i]),
+            "mean": float(probs[:, i].mean()),
+            "std": float(probs[:, i].std(ddof=1)) if replicates > 1 else 0.0,
+            "interval": [float(lower[i]), float(upper[i])],
+        }
+        for i, (matchup, _, _) in enumerate(pairs)
+    }
+
+    output_path = Path(output_path) if output_path else OUTPUT_DIR / f"{year}.json"
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump({
+            "year": year,
+            "ratingSegment": list(ratingSegment),
+            "columns": [list(cols) for cols in colsList],
+            "replicates": replicates,
+            "resample": resample,
+            "levels": list(levels),
+            "matchups": intervals,
+        }, f, indent=2)
+
+    print(f"\n{'Matchup':<40} {'Upset':>6} {'Interval':>15}")
+    for matchup, row in sorted(intervals.items(), key=lambda item: -item[1]["upset"]):
+        print(f"{matchup:<40} {row['upset']:>6.2f}   [{row['interval'][0]:.2f}, {row['interval'][1]:.2f}]")
+    print(f"Intervals written to {output_path}")
+    return intervals
+
+def upset_data_segment(upset_data_path):
+    """The rating segment upsetData.json's upset numbers were built with, or None if it doesn't say."""
+    with open(upset_data_path, "r", encoding="utf-8") as f:
+        recorded = json.load(f).get("ratingSegment")
+    return None if recorded is None else model.segment_from_json(recorded)
+
+def add_intervals_to_upset_data(intervals, upset_data_path, ratingSegment):
+    """
+    Add each matchup's rounded interval next to its upset number in upsetData.json.
+    Refuses when the intervals' models were trained on a different rating segment than
+    the upset numbers', or when the bootstrap's point estimates don't reproduce them.
+    """
+    with open(upset_data_path, "r", encoding="utf-8") as f:
+        upset_data = json.load(f)
+
+    recorded = upset_data.get("ratingSegment")
+    if recorded is not None and recorded != model.segment_to_json(ratingSegment):
+        raise ValueError(f"{upset_data_path} was built with rating segment {recorded}, "
+            f"the intervals with {model.segment_to_json(ratingSegment)}")
+    # the full-data fit scores exactly what write_upset_data_from_matchups published, so any difference means other models
+    mismatched = [
+        f"{matchup} ({entry['upset']} vs {round(intervals[matchup]['upset'], 2)})"
+        for matchup, entry in upset_data["matchups"].items()
+        if matchup in intervals and round(intervals[matchup]["upset"], 2) != entry.get("upset")
+    ]
+    if mismatched:
+        raise ValueError(f"The bootstrap's point estimates don't match the upset numbers in {upset_data_path} "
+            f"for {len(mismatched)} matchups, e.g. {', '.join(mismatched[:3])}")
+
+    for matchup, entry in upset_data["matchups"].items():
+        if matchup in intervals:
+            entry["upsetInterval"] = [round(value, 2) for value in intervals[matchup]["interval"]]
+
+    with open(upset_data_path, "w", encoding="utf-8") as f:
+        json.dump(upset_data, f, indent=2)
+    print(f"Added intervals to {upset_data_path}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bootstrap confidence intervals for first-round upset probabilities.")
+    parser.add_argument("--year", type=int, default=model.END_YEAR)
+    parser.add_argument("--matchups", default=None, help="first-round matchups file (default: util/matchups{year}.json)")
+    parser.add_argument("--segment", type=float, nargs=2, default=None,
+        help="rating diff segment the models are trained on (default: --upset-data's, else every game)")
+    parser.add_argument("--cols", nargs="+", choices=["base", "advanced"], default=["base", "advanced"],
+        help="models whose probabilities are averaged")
+    parser.add_argument("--replicates", type=int, default=200)
+    parser.add_argument("--resample", choices=["games", "seasons"], default="games")
+    parser.add_argument("--level", type=float, default=0.9, help="central interval coverage")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: one per core)")
+    parser.add_argument("--output", default=None, help="output file (default: bootstrap/{year}.json)")
+    parser.add_argument("--upset-data", default=None, help="also add the intervals to this upsetData.json")
+    args = parser.parse_args(argv)
+
+    ratingSegment = args.segment
+    if args.upset_data:
+        # the intervals have to come from models trained like the ones behind the upset numbers
+        recorded = upset_data_segment(args.upset_data)
+        if ratingSegment is None and recorded is None:
+            parser.error(f"{args.upset_data} doesn't record the rating segment its upset numbers came from; pass --segment")
+        if ratingSegment is not None and recorded is not None and model.segment_to_json(ratingSegment) != model.segment_to_json(recorded):
+            parser.error(f"{args.upset_data} was built with rating segment {model.segment_to_json(recorded)}, not {ratingSegment}")
+        ratingSegment = ratingSegment or recorded
+    ratingSegment = ratingSegment or PAIR_SEGMENT
+
+    colsList = [model.BASE_COLS if cols == "base" else model.ADVANCED_COLS for cols in args.cols]
+    tail = (1 - args.level) / 2
+    intervals = run_bootstrap(
+        args.year,
+        matchups_path=args.matchups,
+        ratingSegment=ratingSegment,
+        colsList=colsList,
+        replicates=args.replicates,
+        resample=args.resample,
+        levels=(tail, 1 - tail),
+        seed=args.seed,
+        workers=args.workers,
+        output_path=args.output
+    )
+    if args.upset_data:
+        add_intervals_to_upset_data(intervals, args.upset_data, ratingSegment)
+
+if __name__ == "__main__":
+    main()
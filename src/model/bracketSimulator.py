@@ -0,0 +1,224 @@
+"""
+Monte Carlo tournament simulator built on the upset model.
+
+The 64-team bracket is an array tree: team i starts in slot i and in round r plays the
+game in slot i >> (r + 1), so a whole round is pairs of adjacent columns in an
+(n_brackets, n_alive) array. Every possible game's win probability comes from one
+precomputed 64x64 matrix (see allPairs), and each round is a single vectorized draw for
+every bracket in a chunk. Chunks run in parallel, each with its own seed, so results
+only depend on the seed and chunk size and not on the number of workers.
+
+Decided games are just entries of that matrix: two teams can meet at most once, so
+forcing P[winner, loser] = 1 conditions every simulated bracket on the result (pass every
+result so far, since earlier rounds decide who meets later) and rerunning the whole
+tournament takes seconds.
+
+util/matchups{year}.json lists each region's first-round games ordered by the higher
+seed (1v16, 2v15, ..., 8v9). Regions meet in file order: the first two regions'
+winners play one semifinal and the last two the other.
+
+    python bracketSimulator.py --sims 2000000 --game Duke "Mount St. Mary's"
+"""
+import argparse
+import json
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+import model
+from allPairs import PAIR_SEGMENT, win_probabilities
+
+MODEL_DIR = Path(__file__).resolve().parent
+OUTPUT_DIR = MODEL_DIR / "bracketSim"
+ROUND_NAMES = ["Round of 32", "Sweet 16", "Elite 8", "Final 4", "Championship", "Champion"]
+ROUND_LABELS = ["R32", "S16", "E8", "F4", "Final", "Champ"]
+# first-round games in bracket order, as positions in a region's seed-ordered list
+BRACKET_ORDER = [0, 7, 4, 3, 5, 2, 6, 1]
+
+def load_bracket(year, matchups_path=None):
+    """Teams in slot order and each team's seed, from the first-round matchups file."""
+    matchups_path = Path(matchups_path) if matchups_path else MODEL_DIR / "util" / f"matchups{year}.json"
+    with open(matchups_path, "r", encoding="utf-8") as f:
+        regions = json.load(f)
+
+    teams, seeds = [], []
+    for region, region_matchups in regions.items():
+        if len(region_matchups) != 8:
+            raise ValueError(f"{region} has {len(region_matchups)} first-round games, expected 8")
+        for position in BRACKET_ORDER:
+            pair = region_matchups[position].split("_", 1)
+            if len(pair) != 2:
+                raise ValueError(f"Invalid matchup format: {region_matchups[position]}")
+            teams += pair
+            seeds += [position + 1, 16 - position]
+    if len(teams) != 64:
+        raise ValueError(f"Expected 64 teams in {matchups_path}, found {len(teams)}")
+    return teams, np.array(seeds, dtype=np.int8)
+
+def condition(P, teams, results):
+    """Copy of P with every decided (winner, loser) game forced."""
+    P = P.copy()
+    slot = {team: i for i, team in enumerate(teams)}
+    for winner, loser in results:
+        for team in (winner, loser):
+            if team not in slot:
+                raise ValueError(f"{team} is not in the bracket")
+        P[slot[winner], slot[loser]], P[slot[loser], slot[winner]] = 1.0, 0.0
+    return P
+
+def simulate_chunk(P, n, seed, path_teams):
+    """
+    Play n brackets. Returns how often each team won each round (6 x 64) and counts of
+    runs of 2+ wins by path_teams, keyed by team * 65**6 + base-65 code of the beaten slots.
+    """
+    rng = np.random.default_rng(seed)
+    P = P.astype(np.float32)
+    alive = np.broadcast_to(np.arange(64, dtype=np.int8), (n, 64))
+    wins = np.zeros((6, 64), dtype=np.int64)
+    winners, losers = [], []
+    for r in range(6):
+        a, b = alive[:, 0::2], alive[:, 1::2]
+        # the first round's games are the same in every bracket
+        p = P[np.arange(0, 64, 2), np.arange(1, 64, 2)] if r == 0 else P[a, b]
+        a_wins = rng.random(a.shape, dtype=np.float32) < p
+        alive = np.where(a_wins, a, b)
+        winners.append(alive)
+        losers.append(np.where(a_wins, b, a))
+        wins[r] = np.bincount(alive.ravel(), minlength=64)
+
+    paths = Counter()
+    for team in path_teams:
+        # base-65 digits of the beaten slots (+1), 0 once the team is out
+        code = np.zeros(n, dtype=np.int64)
+        for r in range(6):
+            game = team >> (r + 1)
+            won = winners[r][:, game] == team
+            code += np.where(won, losers[r][:, game].astype(np.int64) + 1, 0) * 65 ** r
+        runs = code[code >= 65]
+        values, counts = np.unique(runs, return_counts=True)
+        paths.update(dict(zip((team * 65 ** 6 + values).tolist(), counts.tolist())))
+    return wins, paths
+
+def decode_path(key, teams):
+    team, code = divmod(key, 65 ** 6)
+    beaten = []
+    while code:
+        code, digit = divmod(code, 65)
+        beaten.append(teams[digit - 1])
+    return teams[team], beaten
+
+def simulate(P, teams, seeds, sims=1_000_000, chunk_size=250_000, seed=0, workers=None, upset_seed=10, top_paths=25):
+    """
+    Simulate sims brackets in chunks across a process pool. Returns per-team round
+    advancement probabilities and the most likely runs of 2+ wins by teams seeded
+    upset_seed or worse.
+    """
+    chunks = [min(chunk_size, sims - start) for start in range(0, sims, chunk_size)]
+    chunk_seeds = np.random.SeedSequence(seed).spawn(len(chunks))
+    path_teams = [team for team in range(64) if seeds[team] >= upset_seed]
+
+    wins = np.zeros((6, 64), dtype=np.int64)
+    paths = Counter()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(simulate_chunk, P, n, chunk_seed, path_teams) for n, chunk_seed in zip(chunks, chunk_seeds)]
+        for future in futures:
+            chunk_wins, chunk_paths = future.result()
+            wins += chunk_wins
+            paths.update(chunk_paths)
+
+    advancement = [
+        {
+            "team": teams[team],
+            "seed": int(seeds[team]),
+            **{ROUND_NAMES[r]: float(wins[r, team] / sims) for r in range(6)},
+        }
+        for team in range(64)
+    ]
+    upset_paths = []
+    for key, count in paths.most_common(top_paths):
+        team, beaten = decode_path(key, teams)
+        upset_paths.append({
+            "team": team,
+            "seed": int(seeds[teams.index(team)]),
+            "beat": beaten,
+            "probability": count / sims,
+        })
+    return {
+        "sims": sims,
+        "advancement": sorted(advancement, key=lambda row: -row["Champion"]),
+        "upsetPaths": upset_paths,
+    }
+
+def run_simulation(
+    year=model.END_YEAR,
+    colsList=None,
+    results=(),
+    sims=1_000_000,
+    chunk_size=250_000,
+    seed=0,
+    workers=None,
+    upset_seed=10,
+    output_path=None,
+):
+    """Build the win matrix for year's bracket, condition it on results and simulate."""
+    teams, seeds = load_bracket(year)
+    colsList = colsList or [model.BASE_COLS, model.ADVANCED_COLS]
+    artifacts_list = [model.train_model_artifacts(PAIR_SEGMENT, cols, numBuckets=0, compact=True) for cols in colsList]
+    P = condition(win_probabilities(teams, year, artifacts_list), teams, results)
+
+    summary = simulate(P, teams, seeds, sims=sims, chunk_size=chunk_size, seed=seed, workers=workers, upset_seed=upset_seed)
+    summary["results"] = [list(result) for result in results]
+
+    output_path = Path(output_path) if output_path else OUTPUT_DIR / f"{year}.json"
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2)
+
+    print(f"{'Team':<22} {'Seed':>4} " + " ".join(f"{label:>7}" for label in ROUND_LABELS))
+    for row in summary["advancement"][:16]:
+        print(f"{row['team']:<22} {row['seed']:>4} " + " ".join(f"{row[name]*100:>6.1f}%" for name in ROUND_NAMES))
+    print(f"\nMost likely runs by {upset_seed}+ seeds:")
+    for path in summary["upsetPaths"][:10]:
+        print(f"  {path['probability']*100:5.2f}%  ({path['seed']}) {path['team']} over {', '.join(path['beat'])}")
+    print(f"Simulation written to {output_path}")
+    return summary
+
+def load_results(path):
+    """Decided games from a JSON list of [winner, loser] pairs (or {"winner", "loser"} objects)."""
+    with open(path, "r", encoding="utf-8") as f:
+        games = json.load(f)
+    return [(game["winner"], game["loser"]) if isinstance(game, dict) else tuple(game) for game in games]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Monte Carlo simulation of the tournament bracket.")
+    parser.add_argument("--year", type=int, default=model.END_YEAR)
+    parser.add_argument("--cols", nargs="+", choices=["base", "advanced"], default=["base", "advanced"],
+        help="models whose probabilities are averaged")
+    parser.add_argument("--sims", type=int, default=1_000_000)
+    parser.add_argument("--chunk-size", type=int, default=250_000, help="brackets per vectorized chunk (bounds memory)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: one per core)")
+    parser.add_argument("--upset-seed", type=int, default=10, help="seeds this high or worse count as upset runs")
+    parser.add_argument("--results", default=None, help="JSON file of decided [winner, loser] games")
+    parser.add_argument("--game", nargs=2, action="append", default=[], metavar=("WINNER", "LOSER"), help="a decided game")
+    parser.add_argument("--output", default=None, help="output file (default: bracketSim/{year}.json)")
+    args = parser.parse_args(argv)
+
+    results = (load_results(args.results) if args.results else []) + [tuple(game) for game in args.game]
+    colsList = [model.BASE_COLS if cols == "base" else model.ADVANCED_COLS for cols in args.cols]
+    run_simulation(
+        args.year,
+        colsList=colsList,
+        results=results,
+        sims=args.sims,
+        chunk_size=args.chunk_size,
+        seed=args.seed,
+        workers=args.workers,
+        upset_seed=args.upset_seed,
+        output_path=args.output
+    )
+
+if __name__ == "__main__":
+    main()
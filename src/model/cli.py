@@ -0,0 +1,331 @@
+"""
+Command-line entry point for the whole pipeline.
+
+    python cli.py train --cols base
+    python cli.py predict --input pairs.jsonl --output probs.jsonl
+    python cli.py extract games --year 2026
+    python cli.py extract kppages --year 2026 --workers 4
+    python cli.py fetch teams --year 2026 --top-ranked
+    python cli.py fetch teams --year 2026 --top-ranked --quads --extract
+    python cli.py export --cols base
+    python cli.py update --cols advanced
+    python cli.py compare --year 2026
+    python cli.py compare --grid --thresholds 0.03 0.06 0.1 --years 0 2025 2026
+    python cli.py simulate --sims 2000000 --game Duke "Mount St. Mary's"
+    python cli.py pairs --scope all --dtype uint8
+    python cli.py bootstrap --replicates 500 --resample seasons
+    python cli.py backtest --windows 0 3 5
+
+bootstrap, backtest, grid-search, subset-search and stream-train hand the rest of
+the command line to that script's own main, so their options (and --help) are the
+script's.
+
+Only argparse is imported up front. Each subcommand imports what it needs (pandas,
+sklearn, bs4) when it runs, so --help is instant and predict with a cached
+model never loads sklearn (see modelCache.load_compact).
+"""
+import argparse
+import sys
+from pathlib import Path
+
+MODEL_DIR = Path(__file__).resolve().parent
+UTIL_DIR = MODEL_DIR / "util"
+# training results per column set, as read by resultsComparer
+RESULTS_FILES = {
+    "base": MODEL_DIR / "v2outputs" / "13to26lr_base.json",
+    "advanced": MODEL_DIR / "v2outputs" / "13to26lr_Rs3PLoThreeTo.json",
+}
+# season for extract/fetch when --year isn't given
+DEFAULT_YEAR = 2026
+
+def util_module(name):
+    """Import a script from util/ (they aren't a package)."""
+    import importlib
+
+    if str(UTIL_DIR) not in sys.path:
+        sys.path.append(str(UTIL_DIR))
+    return importlib.import_module(name)
+
+def columns_for(name):
+    import model
+
+    return model.BASE_COLS if name == "base" else model.ADVANCED_COLS
+
+def segment_for(segment):
+    # resolved here rather than as an argparse default so --help doesn't import model
+    import model
+
+    return segment or [model.RANK_DIFF_MIN, model.RANK_DIFF_MAX]
+
+def train(args):
+    import model
+    import pipelineTrace
+
+    results = model.buildAndRunModel(segment_for(args.segment), columns_for(args.cols), 0)
+    output = args.output or RESULTS_FILES[args.cols]
+    Path(output).parent.mkdir(parents=True, exist_ok=True)
+    with pipelineTrace.stage("write_results", "write-json", rows=len(results)) as stage:
+        results.to_json(output, orient="records", indent=2)
+        stage.wrote(pipelineTrace.file_size(output))
+    print(f"Results written to {output}")
+
+def predict(args):
+    import contextlib
+
+    import model
+
+    input_file = sys.stdin if args.input == "-" else open(args.input, "r", encoding="utf-8")
+    output_file = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    # keep training/progress chatter off the JSONL stream
+    with contextlib.redirect_stdout(sys.stderr):
+        if args.live:
+            import incrementalModel
+
+            artifacts = incrementalModel.load_latest(segment_for(args.segment), columns_for(args.cols))
+            if artifacts is None:
+                raise SystemExit("No live model yet, run: python cli.py update")
+        else:
+            artifacts = model.train_model_artifacts(segment_for(args.segment), columns_for(args.cols), numBuckets=0, compact=True)
+        count = model.predict_jsonl(input_file, output_file, artifacts, year=args.year or model.END_YEAR)
+        print(f"Scored {count} matchups")
+
+def export(args):
+    import compactScorer
+    import model
+
+    segment = segment_for(args.segment)
+    output = args.output or compactScorer.EXPORT_DIR / f"{args.cols}_{segment[0]:g}to{segment[1]:g}.npz"
+    artifacts = model.train_model_artifacts(segment, columns_for(args.cols), numBuckets=0)
+    scorer = compactScorer.export_compact(artifacts, output)
+    lut = "no lookup table" if scorer.lut is None else f"lookup table {scorer.lut.shape}, max interpolation error {scorer.lut_max_error:.2g}"
+    print(f"Wrote {output} ({len(scorer.coef)} folds, {scorer.method} calibration, {lut})")
+
+def update(args):
+    import incrementalModel
+
+    incrementalModel.update_live_model(
+        segment_for(args.segment),
+        columns_for(args.cols),
+        drift_threshold=args.drift_threshold,
+        rebuild=args.rebuild
+    )
+
+def extract(args):
+    years = args.year or [DEFAULT_YEAR]
+    if args.source == "games":
+        util_module("gameExtractor").main(years)
+    elif args.source == "rankings":
+        util_module("rankingExtractor").main(years)
+    elif args.source == "averages":
+        util_module("averageExtractor").main(years)
+    elif args.source == "upset-counts":
+        util_module("averageExtractor").count_upsets_by_year()
+    elif args.source == "upsets":
+        util_module("kpFetcher").extractUpsets()
+    elif args.source in ("fourfactors", "misc"):
+        # both parse the saved kenpom page in response.txt
+        kpFetcher = util_module("kpFetcher")
+        parse = kpFetcher.parseFourFactors if args.source == "fourfactors" else kpFetcher.parseMiscStats
+        for year in years:
+            parse(year)
+    elif args.source == "quads":
+        quadAndOvrExtractor = util_module("quadAndOvrExtractor")
+        for year in years:
+            quadAndOvrExtractor.extractQuadStats(year)
+    else:
+        # kenpom team pages: kppages writes kpOvrStats and kpGames from one parse
+        quadAndOvrExtractor = util_module("quadAndOvrExtractor")
+        extractors = {
+            "kpovr": quadAndOvrExtractor.extractKpOvrStats,
+            "kpgames": quadAndOvrExtractor.extractKpGames,
+            "kppages": quadAndOvrExtractor.extractKpPages,
+        }
+        for year in years:
+            extractors[args.source](year, workers=args.workers)
+
+def fetch(args):
+    if args.source == "logos":
+        import imageFetcher
+
+        imageFetcher.fetch_team_logos(args.output or "team_logos.json")
+        return
+
+    kpFetcher = util_module("kpFetcher")
+    if args.source == "wab":
+        kpFetcher.fetchWabRankingsPage(args.year)
+    else:
+        if args.year not in kpFetcher.tournament_teams:
+            raise SystemExit(f"No tournament team list for {args.year} in kpFetcher.tournament_teams")
+        kpFetcher.fetchTopTeams(kpFetcher.tournament_teams[args.year], args.year, args.top_ranked, args.quads,
+            extract=args.extract, rate=args.rate, concurrency=args.concurrency, refresh=args.refresh)
+
+def compare(args):
+    import resultsComparer
+
+    enhanced = args.enhanced or RESULTS_FILES["advanced"]
+    base = args.base or RESULTS_FILES["base"]
+    if args.grid:
+        files = {Path(path).stem: path for path in args.models or sorted(Path(base).parent.glob("*.json"))}
+        files = {Path(base).stem: base, **files}
+        grid = resultsComparer.compare_grid(files, Path(base).stem, bin_sizes=args.bin_sizes or [args.bin_size],
+            thresholds=args.thresholds or [args.threshold], years=args.years or [args.year], output_file=args.output)
+        overall = grid[(grid["bin"] == "all") & (grid["side"] == "higher")]
+        print(overall.drop(columns=["base", "side", "bin", "baseProbSum", "modelProbSum"]).to_string(index=False))
+        if args.output:
+            print(f"{len(grid)} rows written to {args.output}")
+    elif args.detailed:
+        resultsComparer.print_detailed_stats(enhanced, base)
+    elif args.symmetric:
+        resultsComparer.test_enhanced_signal_symmetrically(enhanced, base, bin_size=args.bin_size, threshold=args.threshold)
+    else:
+        resultsComparer.test_enhanced_signal_asymmetrically(enhanced, base, bin_size=args.bin_size, threshold=args.threshold, year=args.year)
+
+def simulate(args):
+    import bracketSimulator
+    import model
+
+    results = (bracketSimulator.load_results(args.results) if args.results else []) + [tuple(game) for game in args.game]
+    bracketSimulator.run_simulation(
+        args.year or model.END_YEAR,
+        colsList=[columns_for(cols) for cols in args.cols],
+        results=results,
+        sims=args.sims,
+        chunk_size=args.chunk_size,
+        seed=args.seed,
+        workers=args.workers,
+        output_path=args.output
+    )
+
+def pairs(args):
+    import allPairs
+    import model
+
+    year = args.year or model.END_YEAR
+    teams = args.teams or (allPairs.bracket_teams(year) if args.scope == "bracket" else None)
+    matrix = allPairs.build_pair_matrix(year, teams=teams, dtype=args.dtype)
+    output = args.output or allPairs.OUTPUT_DIR / f"{year}_{'custom' if args.teams else args.scope}.npz"
+    allPairs.write_pair_matrix(matrix, output, json_path=args.json)
+
+# subcommands run by a script's own main: (module, help)
+SCRIPT_COMMANDS = {
+    "bootstrap": ("bootstrap", "bootstrap confidence intervals for first-round upset probabilities"),
+    "backtest": ("backtest", "walk-forward backtest over year windows"),
+    "grid-search": ("gridSearch", "parallel hyperparameter sweep"),
+    "subset-search": ("subsetSearch", "feature-subset search"),
+    "stream-train": ("streamTrain", "out-of-core training over every season"),
+}
+
+def run_script(args):
+    import importlib
+
+    importlib.import_module(args.script).main(args.script_args)
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="March Madness upset model pipeline.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    train_parser = subparsers.add_parser("train", help="train on the static split and write holdout results for resultsComparer")
+    train_parser.add_argument("--cols", choices=["base", "advanced"], default="advanced")
+    train_parser.add_argument("--segment", type=float, nargs=2, default=None, help="rating diff segment (default: model.RANK_DIFF_MIN/MAX)")
+    train_parser.add_argument("--output", default=None, help="results JSON (default: v2outputs/13to26lr_{base,Rs3PLoThreeTo}.json)")
+    train_parser.set_defaults(handler=train)
+
+    predict_parser = subparsers.add_parser("predict", help="score JSONL matchups ({teamA, teamB, year?, homeTeam?} per line)")
+    predict_parser.add_argument("--input", default="-", help="JSONL input file (default: stdin)")
+    predict_parser.add_argument("--output", default="-", help="JSONL output file (default: stdout)")
+    predict_parser.add_argument("--year", type=int, default=None, help="season for lines without a year (default: model.END_YEAR)")
+    predict_parser.add_argument("--cols", choices=["base", "advanced"], default="advanced")
+    predict_parser.add_argument("--segment", type=float, nargs=2, default=None, help="rating diff segment (default: model.RANK_DIFF_MIN/MAX)")
+    predict_parser.add_argument("--live", action="store_true", help="score with the newest live model (see cli.py update)")
+    predict_parser.set_defaults(handler=predict)
+
+    export_parser = subparsers.add_parser("export", help="write a compact numpy-only scoring artifact (see compactScorer)")
+    export_parser.add_argument("--cols", choices=["base", "advanced"], default="base")
+    export_parser.add_argument("--segment", type=float, nargs=2, default=None, help="rating diff segment (default: model.RANK_DIFF_MIN/MAX)")
+    export_parser.add_argument("--output", default=None, help="artifact path (default: compactModels/{cols}_{segment}.npz)")
+    export_parser.set_defaults(handler=export)
+
+    update_parser = subparsers.add_parser("update", help="warm-start the live model on newly extracted games (see incrementalModel)")
+    update_parser.add_argument("--cols", choices=["base", "advanced"], default="advanced")
+    update_parser.add_argument("--segment", type=float, nargs=2, default=None, help="rating diff segment (default: model.RANK_DIFF_MIN/MAX)")
+    update_parser.add_argument("--drift-threshold", type=float, default=0.01,
+        help="refit the isotonic calibration when its expected calibration error grows by more than this")
+    update_parser.add_argument("--rebuild", action="store_true", help="rebuild the design matrix and fit from scratch")
+    update_parser.set_defaults(handler=update)
+
+    extract_parser = subparsers.add_parser("extract", help="turn downloaded/raw files into the JSON the model reads")
+    extract_parser.add_argument("source", choices=["games", "rankings", "averages", "upsets", "upset-counts",
+        "fourfactors", "misc", "quads", "kpovr", "kpgames", "kppages"])
+    extract_parser.add_argument("--year", type=int, nargs="+", default=None, help=f"seasons to extract (default: {DEFAULT_YEAR})")
+    extract_parser.add_argument("--workers", type=int, default=None, help="kpovr/kpgames/kppages: parser processes (default: one per core)")
+    extract_parser.set_defaults(handler=extract)
+
+    fetch_parser = subparsers.add_parser("fetch", help="download team pages, WAB rankings or team logos")
+    fetch_parser.add_argument("source", choices=["teams", "wab", "logos"])
+    fetch_parser.add_argument("--year", type=int, default=DEFAULT_YEAR)
+    fetch_parser.add_argument("--quads", action="store_true", help="teams: fetch bballnet quad pages instead of kenpom pages")
+    fetch_parser.add_argument("--top-ranked", action="store_true", help="teams: also fetch every team ranked 55 or better")
+    fetch_parser.add_argument("--extract", action="store_true", help="teams: extract kpOvrStats/quadStats as pages arrive")
+    fetch_parser.add_argument("--refresh", action="store_true", help="teams: re-request saved pages, keeping the unchanged ones")
+    fetch_parser.add_argument("--rate", type=float, default=2.0, help="teams: requests per second to each host")
+    fetch_parser.add_argument("--concurrency", type=int, default=4, help="teams: requests in flight at once")
+    fetch_parser.add_argument("--output", default=None, help="logos: output file (default: team_logos.json)")
+    fetch_parser.set_defaults(handler=fetch)
+
+    compare_parser = subparsers.add_parser("compare", help="check whether the advanced model adds signal over the base model")
+    compare_parser.add_argument("--enhanced", default=None, help="enhanced results JSON (default: advanced train output)")
+    compare_parser.add_argument("--base", default=None, help="base results JSON (default: base train output)")
+    compare_parser.add_argument("--bin-size", type=float, default=0.05)
+    compare_parser.add_argument("--threshold", type=float, default=0.06)
+    compare_parser.add_argument("--year", type=int, default=0, help="only games from this season (default: all)")
+    mode = compare_parser.add_mutually_exclusive_group()
+    mode.add_argument("--symmetric", action="store_true", help="symmetric binning test instead of the asymmetric one")
+    mode.add_argument("--detailed", action="store_true", help="print detailed stats by postseason status")
+    mode.add_argument("--grid", action="store_true", help="every model against base over a grid of bin sizes, thresholds and years")
+    compare_parser.add_argument("--models", nargs="+", default=None, help="results JSONs for --grid (default: every file next to --base)")
+    compare_parser.add_argument("--bin-sizes", type=float, nargs="+", default=None, help="--grid bin sizes (default: --bin-size)")
+    compare_parser.add_argument("--thresholds", type=float, nargs="+", default=None, help="--grid thresholds (default: --threshold)")
+    compare_parser.add_argument("--years", type=int, nargs="+", default=None, help="--grid seasons, 0 for all (default: --year)")
+    compare_parser.add_argument("--output", default=None, help="write the --grid table to this CSV")
+    compare_parser.set_defaults(handler=compare)
+
+    simulate_parser = subparsers.add_parser("simulate", help="Monte Carlo the tournament bracket (see bracketSimulator)")
+    simulate_parser.add_argument("--year", type=int, default=None, help="season (default: model.END_YEAR)")
+    simulate_parser.add_argument("--cols", nargs="+", choices=["base", "advanced"], default=["base", "advanced"],
+        help="models whose probabilities are averaged")
+    simulate_parser.add_argument("--sims", type=int, default=1_000_000)
+    simulate_parser.add_argument("--chunk-size", type=int, default=250_000, help="brackets per vectorized chunk (bounds memory)")
+    simulate_parser.add_argument("--seed", type=int, default=0)
+    simulate_parser.add_argument("--workers", type=int, default=None, help="worker processes (default: one per core)")
+    simulate_parser.add_argument("--results", default=None, help="JSON file of decided [winner, loser] games")
+    simulate_parser.add_argument("--game", nargs=2, action="append", default=[], metavar=("WINNER", "LOSER"), help="a decided game")
+    simulate_parser.add_argument("--output", default=None, help="output file (default: bracketSim/{year}.json)")
+    simulate_parser.set_defaults(handler=simulate)
+
+    pairs_parser = subparsers.add_parser("pairs", help="precompute every pair's upset probability (see allPairs)")
+    pairs_parser.add_argument("--year", type=int, default=None, help="season (default: model.END_YEAR)")
+    pairs_parser.add_argument("--scope", choices=["bracket", "all"], default="bracket",
+        help="teams in util/matchups{year}.json, or every team with stats and a rating")
+    pairs_parser.add_argument("--teams", nargs="+", default=None, help="explicit team list (overrides --scope), e.g. all 68")
+    pairs_parser.add_argument("--dtype", choices=["float16", "uint8"], default="float16")
+    pairs_parser.add_argument("--output", default=None, help="npz output (default: allPairs/{year}_{scope}.npz)")
+    pairs_parser.add_argument("--json", default=None, help="also write {teams, probs} JSON for the frontend")
+    pairs_parser.set_defaults(handler=pairs)
+
+    for command, (module, help_text) in SCRIPT_COMMANDS.items():
+        # no -h here, so --help reaches the script's parser
+        script_parser = subparsers.add_parser(command, help=help_text, add_help=False)
+        script_parser.set_defaults(handler=run_script, script=module)
+    return parser
+
+def main(argv=None):
+    parser = build_parser()
+    args, extra = parser.parse_known_args(argv)
+    if args.handler is run_script:
+        args.script_args = extra
+    elif extra:
+        parser.error(f"unrecognized arguments: {' '.join(extra)}")
+    args.handler(args)
+
+if __name__ == "__main__":
+    main()
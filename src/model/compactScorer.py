@@ -0,0 +1,159 @@
+"""
+Small, dependency-free scoring artifact for a trained upset model.
+
+export_compact flattens a trained model (see model.train_model_artifacts) into a .npz of
+plain arrays: the StandardScaler mean/scale, each CV fold's logistic coefficients and
+that fold's calibrator (isotonic breakpoints or sigmoid a/b). CompactScorer reproduces
+CalibratedClassifierCV.predict_proba with a dot product plus np.interp per fold,
+averaged over folds, and only needs numpy, so loading and scoring takes milliseconds
+with no pandas/sklearn import.
+
+One-feature models (e.g. BASE_COLS) also get a lookup table scored with one np.interp
+(a searchsorted over the table), which model.score_games uses through score(). With
+isotonic calibration the model is piecewise linear in the feature, so the table holds
+every breakpoint and is exact; a sigmoid-calibrated table records its worst
+interpolation error and score() only uses it when that is tiny. Two-feature models get
+no table: a bilinear grid of the averaged fold calibrators was off by about 0.1 and
+never passed that check.
+"""
+from pathlib import Path
+
+import numpy as np
+
+EXPORT_DIR = Path(__file__).resolve().parent / "compactModels"
+LUT_SIZE_1D = 2049
+# lookup tables cover mean +/- this many standard deviations of each feature
+LUT_SPAN = 6.0
+# score() only uses a lookup table whose worst interpolation error is below this
+LUT_TOLERANCE = 1e-4
+
+def _fold_arrays(calibrated_classifiers):
+    coef = np.array([fold.estimator.coef_.ravel() for fold in calibrated_classifiers], dtype=np.float64)
+    intercept = np.array([fold.estimator.intercept_[0] for fold in calibrated_classifiers], dtype=np.float64)
+    method = calibrated_classifiers[0].method
+    arrays = {"coef": coef, "intercept": intercept, "method": np.array(method)}
+
+    calibrators = [fold.calibrators[0] for fold in calibrated_classifiers]
+    if method == "isotonic":
+        # ragged per-fold breakpoints, concatenated with offsets
+        x = [calibrator.X_thresholds_.astype(np.float64) for calibrator in calibrators]
+        y = [calibrator.y_thresholds_.astype(np.float64) for calibrator in calibrators]
+        arrays["iso_x"] = np.concatenate(x)
+        arrays["iso_y"] = np.concatenate(y)
+        arrays["iso_offsets"] = np.cumsum([0] + [len(values) for values in x])
+    elif method == "sigmoid":
+        arrays["sigmoid_a"] = np.array([calibrator.a_ for calibrator in calibrators], dtype=np.float64)
+        arrays["sigmoid_b"] = np.array([calibrator.b_ for calibrator in calibrators], dtype=np.float64)
+    else:
+        raise ValueError(f"Unsupported calibration method for export: {method}")
+    return arrays
+
+class CompactScorer:
+    """Upset probabilities from an exported artifact, using nothing but numpy."""
+
+    def __init__(self, arrays):
+        self.columns = [str(col) for col in arrays["columns"]]
+        self.rating_segment = arrays["rating_segment"].tolist()
+        self.mean = arrays["mean"]
+        self.scale = arrays["scale"]
+        self.coef = arrays["coef"]
+        self.intercept = arrays["intercept"]
+        self.method = str(arrays["method"])
+        if self.method == "isotonic":
+            offsets = arrays["iso_offsets"]
+            self.iso = [
+                (arrays["iso_x"][offsets[i]:offsets[i + 1]], arrays["iso_y"][offsets[i]:offsets[i + 1]])
+                for i in range(len(offsets) - 1)
+            ]
+        else:
+            self.sigmoid_a = arrays["sigmoid_a"]
+            self.sigmoid_b = arrays["sigmoid_b"]
+        self.lut_axes = [arrays[f"lut_axis{i}"] for i in range(len(self.columns)) if f"lut_axis{i}" in arrays]
+        # artifacts exported before two-feature tables were dropped may still carry one
+        self.lut = arrays["lut"] if "lut" in arrays and len(self.lut_axes) == 1 else None
+        self.exact_lut = self.method == "isotonic" and len(self.lut_axes) == 1
+        self.lut_max_error = float(arrays["lut_max_error"]) if "lut_max_error" in arrays else None
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as arrays:
+            return cls({name: arrays[name] for name in arrays.files})
+
+    def predict(self, X):
+        """Exact calibrated upset probability for raw (unscaled) feature rows in self.columns order."""
+        X = np.atleast_2d(np.asarray(X, dtype=np.float64))
+        # decision function of every fold at once: (n_samples, n_folds)
+        decision = ((X - self.mean) / self.scale) @ self.coef.T + self.intercept
+        if self.method == "isotonic":
+            probs = np.column_stack([np.interp(decision[:, i], x, y) for i, (x, y) in enumerate(self.iso)])
+        else:
+            probs = 1.0 / (1.0 + np.exp(self.sigmoid_a * decision + self.sigmoid_b))
+        return probs.mean(axis=1)
+
+    def predict_lut(self, X):
+        """Upset probability interpolated from the lookup table (one-feature models only)."""
+        if self.lut is None:
+            raise ValueError("This artifact has no lookup table (only one-feature models get one)")
+
+        X = np.atleast_2d(np.asarray(X, dtype=np.float64))
+        axis = self.lut_axes[0]
+        probs = np.interp(X[:, 0], axis, self.lut)
+        # the exact isotonic table is flat past its ends; otherwise score rows off the table exactly
+        if not self.exact_lut:
+            outside = (X[:, 0] < axis[0]) | (X[:, 0] > axis[-1])
+            if outside.any():
+                probs[outside] = self.predict(X[outside])
+        return probs
+
+    def score(self, X):
+        """Lookup table when there is an accurate one, exact scorer otherwise."""
+        if self.lut is None or self.lut_max_error > LUT_TOLERANCE:
+            return self.predict(X)
+        return self.predict_lut(X)
+
+def _lookup_table(scorer):
+    """Axes and table of probabilities for one-feature models (None otherwise)."""
+    if len(scorer.columns) == 1:
+        if scorer.method == "isotonic":
+            # every feature value where some fold's decision crosses one of its breakpoints
+            knots = [
+                (x - scorer.intercept[i]) / scorer.coef[i, 0] * scorer.scale[0] + scorer.mean[0]
+                for i, (x, _) in enumerate(scorer.iso) if scorer.coef[i, 0] != 0
+            ]
+            axis = np.unique(np.concatenate(knots)) if knots else np.array([scorer.mean[0]])
+        else:
+            axis = np.linspace(scorer.mean[0] - LUT_SPAN * scorer.scale[0], scorer.mean[0] + LUT_SPAN * scorer.scale[0], LUT_SIZE_1D)
+        return [axis], scorer.predict(axis[:, None])
+    return None, None
+
+def export_compact(artifacts, path):
+    """Write the compact artifact for trained model artifacts to path and return a scorer for it."""
+    scaler = artifacts["scaler"]
+    arrays = {
+        "columns": np.array(artifacts["colsToKeep"], dtype=str),
+        "rating_segment": np.array(artifacts["ratingSegment"], dtype=np.float64),
+        "mean": scaler.mean_.astype(np.float64),
+        "scale": scaler.scale_.astype(np.float64),
+        **_fold_arrays(artifacts["model"].calibrated_classifiers_),
+    }
+    return write_compact(arrays, path)
+
+def write_compact(arrays, path):
+    """Add the lookup table (if any) to a compact artifact's arrays, save them to path and return a scorer."""
+    arrays = dict(arrays)
+    axes, lut = _lookup_table(CompactScorer(arrays))
+    if lut is not None:
+        arrays["lut"] = lut
+        for dim, axis in enumerate(axes):
+            arrays[f"lut_axis{dim}"] = axis
+        # worst interpolation error, checked halfway between the table's grid points
+        scorer = CompactScorer(arrays)
+        midpoints = [(axis[1:] + axis[:-1]) / 2 for axis in axes]
+        check = np.stack(np.meshgrid(*midpoints, indexing="ij"), axis=-1).reshape(-1, len(axes))
+        arrays["lut_max_error"] = np.array(np.abs(scorer.predict_lut(check) - scorer.predict(check)).max())
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "wb") as f:
+        np.savez(f, **arrays)
+    return CompactScorer(arrays)
@@ -0,0 +1,109 @@
+"""
+Per-season feature matrices cached on disk as fixed-dtype .npy arrays.
+
+Each entry holds one season's fully featurized games (every game with ratings, before
+any rating segment is applied): a column-major float32 matrix of stat features, a
+column index in info.json, and one array per metadata column. Entries are opened with
+mmap_mode="r", so picking a rating segment or a handful of feature columns only touches
+the pages it needs. An entry is keyed by the featurizer params (home court advantage,
+feature spec) and rebuilt whenever the content hash of its source files changes.
+"""
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+
+import modelCache
+import pipelineTrace
+
+CACHE_DIR = Path(__file__).resolve().parent / "featureCache"
+# bump when the entry layout changes so old entries are ignored
+CACHE_VERSION = 1
+
+class FeatureEntry:
+    """One cached season. features/arrays are read-only memory maps."""
+
+    def __init__(self, path):
+        with open(path / "info.json", "r") as f:
+            info = json.load(f)
+        self.path = path
+        self.year = info["year"]
+        self.input_hash = info["inputHash"]
+        self.feature_columns = info["featureColumns"]
+        self.column_index = {col: i for i, col in enumerate(self.feature_columns)}
+        self.teams = np.array(info["teams"], dtype=object)
+        self.features = np.load(path / "features.npy", mmap_mode="r")
+        self.arrays = {name: np.load(path / f"{name}.npy", mmap_mode="r") for name in info["arrays"]}
+
+    def __len__(self):
+        return self.features.shape[0]
+
+    def feature_matrix(self, rows, columns=None):
+        """float32 features for the given rows, only reading the requested columns."""
+        columns = self.feature_columns if columns is None else columns
+        return {col: self.features[:, self.column_index[col]][rows] for col in columns}
+
+    def team_names(self, name, rows):
+        return self.teams[self.arrays[name][rows]]
+
+def params_key(params):
+    payload = json.dumps({"version": CACHE_VERSION, "params": params}, sort_keys=True, default=str)
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=8).hexdigest()
+
+def entry_path(year, params):
+    return CACHE_DIR / f"{year}-{params_key(params)}"
+
+def load_entry(year, params, input_hash):
+    """The cached entry for this season and params, or None if missing or built from other inputs."""
+    path = entry_path(year, params)
+    if not (path / "info.json").exists():
+        return None
+
+    try:
+        with pipelineTrace.stage("load_feature_entry", "load", year=year):
+            entry = FeatureEntry(path)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Ignoring unreadable feature cache {path}: {e}")
+        return None
+    return entry if entry.input_hash == input_hash else None
+
+def save_entry(year, params, input_hash, features, arrays, teams):
+    """
+    Write one season's entry and return it opened.
+    features: {column: float array} of stat features, arrays: {name: 1d array} of
+    metadata (team columns as int codes into teams)
+    """
+    CACHE_DIR.mkdir(exist_ok=True)
+    path = entry_path(year, params)
+    tmp_path = path.with_name(path.name + ".tmp")
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    tmp_path.mkdir()
+
+    columns = list(features)
+    matrix = np.empty((len(next(iter(arrays.values()))), len(columns)), dtype=np.float32, order="F")
+    for i, col in enumerate(columns):
+        matrix[:, i] = features[col]
+    np.save(tmp_path / "features.npy", matrix)
+    for name, values in arrays.items():
+        np.save(tmp_path / f"{name}.npy", np.ascontiguousarray(values))
+
+    with open(tmp_path / "info.json", "w") as f:
+        json.dump({
+            "year": year,
+            "params": params,
+            "inputHash": input_hash,
+            "featureColumns": columns,
+            "arrays": list(arrays),
+            "teams": list(teams),
+        }, f, indent=2)
+
+    # swap the finished entry in so readers never see a half-written one
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
+    return FeatureEntry(path)
+
+def input_hash(paths):
+    return modelCache.content_hash(paths)
@@ -0,0 +1,174 @@
+"""
+Parallel hyperparameter sweep for the calibrated logistic model.
+
+The training/holdout matrices are built once and shared read-only with every worker in
+a process pool (see sharedMatrix), so each grid cell only pays for its own fit. Every
+finished cell is appended to a JSONL checkpoint, and rerunning the same sweep skips
+cells that are already in it. The leaderboard ranks cells by Brier score (then log
+loss) on the > SPLIT_YEAR holdout.
+
+    python gridSearch.py --cols advanced --segment 8 24 --workers 8
+"""
+import argparse
+import itertools
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import numpy as np
+from sklearn.metrics import brier_score_loss, log_loss
+
+import model
+import modelCache
+from sharedMatrix import attach_shared, publish, shared
+
+OUTPUT_DIR = Path(__file__).resolve().parent / "gridSearch"
+
+DEFAULT_GRID = {
+    "C": [0.1, 0.3, 0.5, 1, 3],
+    "penalty": ["l2", "l1"],
+    "calibration": ["isotonic", "sigmoid"],
+    "cv": [3, 5],
+}
+# lbfgs has no l1 support
+SOLVER_FOR_PENALTY = {"l2": "lbfgs", "l1": "liblinear"}
+
+def grid_cells(grid):
+    """Every combination in grid as a full hyperparams dict (see model.DEFAULT_HYPERPARAMS)."""
+    names = list(grid)
+    cells = []
+    for values in itertools.product(*(grid[name] for name in names)):
+        hyperparams = {**model.DEFAULT_HYPERPARAMS, **dict(zip(names, values))}
+        hyperparams["solver"] = SOLVER_FOR_PENALTY[hyperparams["penalty"]]
+        cells.append(hyperparams)
+    return cells
+
+def cell_id(hyperparams):
+    # numbers as floats, so C=1 from DEFAULT_GRID and C=1.0 from --C are the same cell
+    normalized = {
+        name: float(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else value
+        for name, value in hyperparams.items()
+    }
+    return json.dumps(normalized, sort_keys=True)
+
+def evaluate_cell(hyperparams):
+    """Fit one grid cell on the shared training years and score it on the holdout."""
+    start = time.time()
+    calibrated_lr = model.fit_calibrated_model(shared["X_train"], shared["y_train"], hyperparams)
+    probs = calibrated_lr.predict_proba(shared["X_test"])[:, 1]
+    return {
+        "hyperparams": hyperparams,
+        "brier": float(brier_score_loss(shared["y_test"], probs)),
+        "logLoss": float(log_loss(shared["y_test"], probs)),
+        "seconds": round(time.time() - start, 3),
+    }
+
+def load_checkpoint(checkpoint_file, data_key):
+    """Finished cells from an earlier run of the same sweep (same data), by cell id."""
+    done = {}
+    if not os.path.exists(checkpoint_file):
+        return done
+
+    with open(checkpoint_file, "r") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                # a line cut short by an interrupted run
+                continue
+            if result.get("dataKey") == data_key:
+                done[cell_id(result["hyperparams"])] = result
+    return done
+
+def leaderboard(results):
+    return sorted(results, key=lambda result: (result["brier"], result["logLoss"]))
+
+def run_grid_search(ratingSegment, colsToKeep, grid=None, numBuckets=0, workers=None, name=None):
+    """
+    Evaluate every cell of grid (default DEFAULT_GRID) and return the leaderboard.
+    Results are checkpointed to gridSearch/{name}.jsonl and the leaderboard is written
+    to gridSearch/{name}.leaderboard.json.
+    """
+    grid = grid or DEFAULT_GRID
+    name = name or f"{'_'.join(colsToKeep)}_{ratingSegment[0]}to{ratingSegment[1]}"
+    OUTPUT_DIR.mkdir(exist_ok=True)
+    checkpoint_file = OUTPUT_DIR / f"{name}.jsonl"
+    leaderboard_file = OUTPUT_DIR / f"{name}.leaderboard.json"
+
+    # identifies the training data, so a checkpoint is never reused for different inputs
+    data_key = modelCache.artifact_key(
+        {
+            "ratingSegment": list(ratingSegment),
+            "colsToKeep": list(colsToKeep),
+            "numBuckets": numBuckets,
+            "years": [model.START_YEAR, model.SPLIT_YEAR, model.END_YEAR],
+            "homeCourtAdvantage": model.HOME_COURT_ADVANTAGE,
+        },
+        model.season_input_paths(range(model.START_YEAR, model.END_YEAR + 1))
+    )
+    done = load_checkpoint(checkpoint_file, data_key)
+    cells = grid_cells(grid)
+    todo = [cell for cell in cells if cell_id(cell) not in done]
+    print(f"{len(cells)} grid cells, {len(cells) - len(todo)} already in {checkpoint_file}")
+
+    if todo:
+        data = model.training_data(ratingSegment, colsToKeep, numBuckets)
+        with tempfile.TemporaryDirectory(prefix="gridSearch-") as shared_dir:
+            paths = publish({
+                "X_train": data["X_train_scaled"].to_numpy(np.float64),
+                "y_train": data["y_train"].to_numpy(),
+                "X_test": data["X_test_scaled"].to_numpy(np.float64),
+                "y_test": data["y_test"].to_numpy(),
+            }, shared_dir)
+
+            with ProcessPoolExecutor(max_workers=workers, initializer=attach_shared, initargs=(paths,)) as pool, \
+                    open(checkpoint_file, "a") as checkpoint:
+                futures = [pool.submit(evaluate_cell, cell) for cell in todo]
+                try:
+                    for i, future in enumerate(as_completed(futures), 1):
+                        result = {**future.result(), "dataKey": data_key}
+                        checkpoint.write(json.dumps(result) + "\n")
+                        checkpoint.flush()
+                        done[cell_id(result["hyperparams"])] = result
+                        print(f"[{i}/{len(todo)}] brier {result['brier']:.4f} log loss {result['logLoss']:.4f} {cell_id(result['hyperparams'])}")
+                except KeyboardInterrupt:
+                    for future in futures:
+                        future.cancel()
+                    print(f"Interrupted, {len(done)} cells saved to {checkpoint_file}")
+                    raise
+
+    board = leaderboard([done[cell_id(cell)] for cell in cells])
+    with open(leaderboard_file, "w") as f:
+        json.dump([{key: value for key, value in result.items() if key != "dataKey"} for result in board], f, indent=2)
+
+    print(f"\nTop cells (holdout > {model.SPLIT_YEAR}):")
+    for result in board[:10]:
+        hp = result["hyperparams"]
+        print(f"  brier {result['brier']:.4f}  log loss {result['logLoss']:.4f}  C={hp['C']} {hp['penalty']} {hp['calibration']} cv={hp['cv']}")
+    print(f"Leaderboard written to {leaderboard_file}")
+    return board
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Grid search the calibrated logistic model's hyperparameters.")
+    parser.add_argument("--cols", choices=["base", "advanced"], default="advanced")
+    parser.add_argument("--segment", type=float, nargs=2, default=[model.RANK_DIFF_MIN, model.RANK_DIFF_MAX])
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: one per core)")
+    parser.add_argument("--C", type=float, nargs="+", default=DEFAULT_GRID["C"])
+    parser.add_argument("--penalty", nargs="+", choices=list(SOLVER_FOR_PENALTY), default=DEFAULT_GRID["penalty"])
+    parser.add_argument("--calibration", nargs="+", choices=["isotonic", "sigmoid"], default=DEFAULT_GRID["calibration"])
+    parser.add_argument("--cv", type=int, nargs="+", default=DEFAULT_GRID["cv"])
+    parser.add_argument("--name", default=None, help="checkpoint/leaderboard file name")
+    args = parser.parse_args(argv)
+
+    colsToKeep = model.BASE_COLS if args.cols == "base" else model.ADVANCED_COLS
+    grid = {"C": args.C, "penalty": args.penalty, "calibration": args.calibration, "cv": args.cv}
+    run_grid_search(args.segment, colsToKeep, grid=grid, workers=args.workers, name=args.name)
+
+if __name__ == "__main__":
+    main()
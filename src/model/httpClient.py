@@ -0,0 +1,241 @@
+"""
+Shared HTTP client for every fetcher: pooled keep-alive connections and conditional GETs.
+
+Connections are kept open per host and reused across requests and threads. For every
+URL fetched, httpCache/index.json remembers the ETag, Last-Modified, content hash and
+size of the last body, and where that body is kept: the caller's body_file (a saved
+team page, a logo), httpCache/bodies/, or nowhere with keep_body=False (a caller like
+the page archive that keeps its own copy). Later requests for the URL send If-None-Match
+and If-Modified-Since, so an unchanged page comes back as a 304 with no body.
+Response.unchanged is set then, and also when a server without validators sends the
+same bytes again, so callers can skip rewriting and re-parsing the page.
+
+    client = httpClient.default_client()
+    response = client.get(url, headers={"Cookie": cookie}, body_file=page_path)
+    if not response.unchanged:
+        ...
+    client.report()
+"""
+import atexit
+import gzip
+import hashlib
+import http.client
+import json
+import os
+import ssl
+import threading
+import zlib
+from pathlib import Path
+from urllib.parse import urljoin, urlsplit
+
+CACHE_DIR = Path(__file__).resolve().parent / "httpCache"
+REDIRECT_STATUSES = {301, 302, 303, 307, 308}
+MAX_REDIRECTS = 5
+# errors a pooled connection gives when the server already closed it
+STALE_CONNECTION_ERRORS = (http.client.RemoteDisconnected, http.client.CannotSendRequest, BrokenPipeError, ConnectionResetError)
+
+class Response:
+    """A finished GET. body is loaded from the cached copy only when a 304 caller asks for it."""
+
+    def __init__(self, url, status, headers, body=None, body_path=None, unchanged=False):
+        self.url = url
+        self.status = status
+        self.headers = headers
+        self._body = body
+        self._body_path = body_path
+        self.unchanged = unchanged
+
+    @property
+    def content(self):
+        if self._body is None and self._body_path is not None:
+            self._body = Path(self._body_path).read_bytes()
+        return self._body
+
+    @property
+    def text(self):
+        charset = "utf-8"
+        for part in self.headers.get("Content-Type", "").split(";"):
+            if part.strip().lower().startswith("charset="):
+                charset = part.split("=", 1)[1].strip()
+        return self.content.decode(charset, errors="replace")
+
+    def json(self):
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        if self.status >= 400:
+            raise HTTPError(self.url, self.status)
+
+class HTTPError(Exception):
+    def __init__(self, url, status):
+        super().__init__(f"HTTP {status} for {url}")
+        self.url = url
+        self.status = status
+
+class HttpClient:
+    def __init__(self, cache_dir=CACHE_DIR, timeout=30.0, verify=False):
+        self.cache_dir = Path(cache_dir)
+        self.timeout = timeout
+        # the fetchers have always skipped certificate checks
+        self.ssl_context = ssl.create_default_context() if verify else ssl._create_unverified_context()
+        self._idle = {}
+        self._lock = threading.Lock()
+        self._index = None
+        self._dirty = False
+        self.stats = {"requests": 0, "connections": 0, "notModified": 0, "unchanged": 0, "bytesDownloaded": 0, "bytesSaved": 0}
+
+    @property
+    def index(self):
+        with self._lock:
+            if self._index is None:
+                index_file = self.cache_dir / "index.json"
+                self._index = json.loads(index_file.read_text(encoding="utf-8")) if index_file.exists() else {}
+            return self._index
+
+    def _count(self, **amounts):
+        with self._lock:
+            for key, amount in amounts.items():
+                self.stats[key] += amount
+
+    def _connection(self, scheme, host):
+        with self._lock:
+            idle = self._idle.get((scheme, host))
+            if idle:
+                return idle.pop(), True
+            self.stats["connections"] += 1
+        if scheme == "https":
+            return http.client.HTTPSConnection(host, timeout=self.timeout, context=self.ssl_context), False
+        return http.client.HTTPConnection(host, timeout=self.timeout), False
+
+    def _release(self, scheme, host, connection):
+        with self._lock:
+            self._idle.setdefault((scheme, host), []).append(connection)
+
+    def _request(self, url, headers):
+        split = urlsplit(url)
+        target = (split.path or "/") + (f"?{split.query}" if split.query else "")
+        while True:
+            connection, reused = self._connection(split.scheme, split.netloc)
+            try:
+                connection.request("GET", target, headers=headers)
+                response = connection.getresponse()
+                body = response.read()
+            except STALE_CONNECTION_ERRORS:
+                connection.close()
+                if reused:
+                    # the server dropped the idle connection: retry on a new one
+                    continue
+                raise
+            except Exception:
+                connection.close()
+                raise
+            if response.will_close:
+                connection.close()
+            else:
+                self._release(split.scheme, split.netloc, connection)
+            return response.status, response.headers, body
+
+    def get(self, url, headers=None, body_file=None, conditional=True, keep_body=True):
+        """
+        GET url, following redirects. body_file is where the caller keeps the body (it is
+        not written here); without one the body is kept in the cache for the next 304,
+        unless keep_body is False (a 304's content is then None).
+        """
+        entry = self.index.get(url) if conditional else None
+        cached_body = None
+        if entry is not None and entry.get("kept", True):
+            cached_body = Path(entry["bodyFile"]) if entry.get("bodyFile") else self.cache_dir / "bodies" / entry["sha256"]
+            if not cached_body.exists():
+                entry, cached_body = None, None
+
+        request_headers = {"Accept-Encoding": "gzip, deflate", "Connection": "keep-alive", **(headers or {})}
+        if entry is not None:
+            if entry.get("etag"):
+                request_headers["If-None-Match"] = entry["etag"]
+            if entry.get("lastModified"):
+                request_headers["If-Modified-Since"] = entry["lastModified"]
+
+        location = url
+        for _ in range(MAX_REDIRECTS + 1):
+            status, response_headers, body = self._request(location, request_headers)
+            self._count(requests=1, bytesDownloaded=len(body))
+            if status not in REDIRECT_STATUSES:
+                break
+            location = urljoin(location, response_headers["Location"])
+        else:
+            raise HTTPError(url, status)
+
+        if status == 304 and entry is not None:
+            self._count(notModified=1, bytesSaved=entry["size"])
+            return Response(url, 200, response_headers, body_path=cached_body, unchanged=True)
+
+        encoding = response_headers.get("Content-Encoding", "")
+        if encoding == "gzip":
+            body = gzip.decompress(body)
+        elif encoding == "deflate":
+            body = zlib.decompress(body)
+        if status != 200:
+            return Response(url, status, response_headers, body=body)
+
+        digest = hashlib.sha256(body).hexdigest()
+        unchanged = entry is not None and entry["sha256"] == digest
+        if unchanged:
+            self._count(unchanged=1)
+        self._remember(url, response_headers, digest, len(body), body, body_file, keep_body)
+        return Response(url, status, response_headers, body=body, unchanged=unchanged)
+
+    def _remember(self, url, headers, digest, size, body, body_file, keep_body):
+        if body_file is None and keep_body:
+            bodies_dir = self.cache_dir / "bodies"
+            bodies_dir.mkdir(parents=True, exist_ok=True)
+            if not (bodies_dir / digest).exists():
+                (bodies_dir / digest).write_bytes(body)
+        entry = {
+            "etag": headers.get("ETag"),
+            "lastModified": headers.get("Last-Modified"),
+            "sha256": digest,
+            "size": size,
+            "bodyFile": str(Path(body_file).resolve()) if body_file is not None else None,
+            "kept": body_file is not None or keep_body,
+        }
+        index = self.index
+        with self._lock:
+            index[url] = entry
+            self._dirty = True
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            tmp_file = self.cache_dir / "index.tmp"
+            tmp_file.write_text(json.dumps(self._index, indent=1), encoding="utf-8")
+            os.replace(tmp_file, self.cache_dir / "index.json")
+            self._dirty = False
+
+    def close(self):
+        self.save()
+        with self._lock:
+            for connections in self._idle.values():
+                for connection in connections:
+                    connection.close()
+            self._idle = {}
+
+    def report(self):
+        """Print this run's request statistics and save the validator index."""
+        self.save()
+        stats = self.stats
+        print(f"{stats['requests']} requests over {stats['connections']} connections, {stats['bytesDownloaded'] / 2**20:.1f} MB downloaded; "
+            f"{stats['notModified']} not modified ({stats['bytesSaved'] / 2**20:.1f} MB saved), {stats['unchanged']} re-sent unchanged")
+
+_default_client = None
+_default_lock = threading.Lock()
+
+def default_client():
+    """The process-wide client, saved and closed at exit."""
+    global _default_client
+    with _default_lock:
+        if _default_client is None:
+            _default_client = HttpClient()
+            atexit.register(_default_client.close)
+        return _default_client
@@ -1,20 +1,37 @@
-import requests
 import json
+import os
 
-url = "https://site.api.espn.com/apis/site/v2/sports/basketball/mens-college-basketball/teams?limit=400"
-response = requests.get(url, verify=False)
-data = response.json()
+ESPN_TEAMS_URL = "https://site.api.espn.com/apis/site/v2/sports/basketball/mens-college-basketball/teams?limit=400"
 
-teams = {}
-for team in data['sports'][0]['leagues'][0]['teams']:
-    t = team['team']
-    teams[t['displayName']] = {
-        'id': t['id'],
-        'logo': f"https://a.espncdn.com/i/teamlogos/ncaa/500/{t['id']}.png",
-        'abbreviation': t['abbreviation']
-    }
+def fetch_team_logos(output_file='team_logos.json'):
+    """Save every ESPN men's college basketball team's id, logo url and abbreviation."""
+    import httpClient
 
-with open('team_logos.json', 'w') as f:
-    json.dump(teams, f, indent=2)
+    client = httpClient.default_client()
+    response = client.get(ESPN_TEAMS_URL)
+    response.raise_for_status()
+    if response.unchanged and os.path.exists(output_file):
+        client.report()
+        print(f"Team list unchanged, keeping {output_file}")
+        with open(output_file, 'r') as f:
+            return json.load(f)
+    data = response.json()
 
-print(f"Found {len(teams)} teams")
\ No newline at end of file
+    teams = {}
+    for team in data['sports'][0]['leagues'][0]['teams']:
+        t = team['team']
+        teams[t['displayName']] = {
+            'id': t['id'],
+            'logo': f"https://a.espncdn.com/i/teamlogos/ncaa/500/{t['id']}.png",
+            'abbreviation': t['abbreviation']
+        }
+
+    with open(output_file, 'w') as f:
+        json.dump(teams, f, indent=2)
+
+    client.report()
+    print(f"Found {len(teams)} teams")
+    return teams
+
+if __name__ == "__main__":
+    fetch_team_logos()
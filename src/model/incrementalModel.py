@@ -0,0 +1,313 @@
+"""
+Warm-start incremental updates of a live upset model as in-season games arrive.
+
+The static model (model.train_model_artifacts) is refit from scratch on 2013 onward
+whenever any input changes. The live model here trains on every season through the
+current one and is updated in place, as games get appended to
+matchups/{year}.json (gameExtractor.process_year):
+
+1. The design matrix (raw features, targets, seasons) is kept on disk. A season is
+   only featurized again when its input files changed. When the games the matrix
+   already holds are still the start of the season's games (same teams, results and
+   ratings), only the rows past them are appended, so rows already in the matrix keep
+   the features they were built with. Otherwise the season's rows are rebuilt.
+   --rebuild starts over from scratch.
+2. The scaler is refit on the grown matrix. The previous logistic coefficients are
+   carried into the new scaled space, and lbfgs starts from them (warm_start), so it
+   converges in a few iterations.
+3. Every CALIBRATION_EVERY-th row is held out of the fit for an isotonic calibrator
+   on the decision values. The row positions are stable as the matrix grows. The
+   calibrator is fit on every other held-out row and scored on the rest, since
+   scoring it on the rows it was fit on would give about 0. Its error on the scoring
+   rows when it was fit is the baseline, and it is only refit once its error on those
+   rows (new games included) has drifted more than drift_threshold above that.
+
+Every update writes a new versioned compact artifact (see compactScorer) to
+liveModels/{cols}_{segment}/v{n}.npz and records it in that directory's state.json;
+a rebuild from scratch continues the numbering and is marked in its record.
+load_latest returns the newest one as predict_many/score_games artifacts.
+
+    python incrementalModel.py --cols advanced
+    python incrementalModel.py --cols advanced --drift-threshold 0.005
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+
+import compactScorer
+import featureCache
+import matchupStore
+import model
+import pipelineTrace
+from seasonStore import season_store
+
+LIVE_DIR = Path(__file__).resolve().parent / "liveModels"
+CALIBRATION_EVERY = 5
+ECE_BINS = 10
+DEFAULT_DRIFT_THRESHOLD = 0.01
+
+def live_dir(ratingSegment, colsToKeep):
+    return LIVE_DIR / f"{'_'.join(colsToKeep)}_{ratingSegment[0]:g}to{ratingSegment[1]:g}"
+
+def load_state(directory):
+    state_file = directory / "state.json"
+    if not state_file.exists():
+        return None
+    with open(state_file, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def save_state(directory, state):
+    tmp_file = directory / "state.tmp"
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_file, directory / "state.json")
+
+def entry_digest(entry, n):
+    """Identity of the season's first n featurized games: teams, result and ratings."""
+    rows = np.arange(n)
+    digest = hashlib.blake2b(digest_size=16)
+    for name in ("hiTeam", "loTeam"):
+        digest.update("\0".join(entry.team_names(name, rows)).encode("utf-8"))
+    for name in ("upset", "higherRating", "lowerRating"):
+        digest.update(np.ascontiguousarray(entry.arrays[name][:n]).tobytes())
+    return digest.hexdigest()
+
+def season_rows(entry, ratingSegment, colsToKeep, start=0):
+    """(X, y) for the usable games among the entry's rows from start on, as prepare_model_dataframe keeps them."""
+    frame = model.frame_from_features(entry, ratingSegment, 0, colsToKeep)
+    frame = frame[(frame.index >= start) & entry.arrays["complete"][frame.index]]
+    X = frame[colsToKeep].to_numpy(np.float64)
+    keep = ~np.isnan(X).any(axis=1)
+    return X[keep], frame["upset"].to_numpy(np.int8)[keep]
+
+def update_design(design, seasons, years, ratingSegment, colsToKeep):
+    """
+    Bring the design matrix up to date with the seasons' inputs. Returns the new design
+    and season records plus how many rows were appended and rebuilt.
+    """
+    X, y, year = design["X"], design["y"], design["year"]
+    appended, rebuilt = 0, 0
+    for season_year in years:
+        record = seasons.get(str(season_year))
+        digest = featureCache.input_hash(model.season_input_paths([season_year]))
+        if record is not None and record["inputHash"] == digest:
+            continue
+
+        entry = model.season_features(season_store.season(season_year))
+        start = 0
+        if record is not None and record["entryRows"] <= len(entry) and entry_digest(entry, record["entryRows"]) == record["entryDigest"]:
+            # the games already in the matrix are unchanged: only append the new ones
+            start = record["entryRows"]
+        elif record is not None:
+            kept = year != season_year
+            rebuilt += int((~kept).sum())
+            X, y, year = X[kept], y[kept], year[kept]
+
+        X_new, y_new = season_rows(entry, ratingSegment, colsToKeep, start)
+        X = np.concatenate([X, X_new])
+        y = np.concatenate([y, y_new])
+        year = np.concatenate([year, np.full(len(y_new), season_year, dtype=np.int16)])
+        appended += len(y_new)
+        seasons[str(season_year)] = {"inputHash": digest, "entryRows": len(entry), "entryDigest": entry_digest(entry, len(entry))}
+
+    # keep seasons together and in order, so held-out row positions don't depend on update history
+    order = np.argsort(year, kind="stable")
+    return {"X": X[order], "y": y[order], "year": year[order]}, seasons, appended, rebuilt
+
+def calibration_rows(n):
+    return np.arange(n) % CALIBRATION_EVERY == CALIBRATION_EVERY - 1
+
+def expected_calibration_error(probs, y, bins=ECE_BINS):
+    """Games-weighted gap between predicted and actual upset rate over equal-width bins."""
+    index = np.minimum((probs * bins).astype(np.int64), bins - 1)
+    counts = np.bincount(index, minlength=bins)
+    predicted = np.bincount(index, weights=probs, minlength=bins)
+    actual = np.bincount(index, weights=y, minlength=bins)
+    return float(np.abs(predicted - actual).sum() / max(len(y), 1))
+
+def warm_start_coef(previous, mean, scale):
+    """The previous model's coefficients re-expressed for a scaler with this mean/scale."""
+    raw_coef = previous.coef[0] / previous.scale
+    raw_intercept = previous.intercept[0] - raw_coef @ previous.mean
+    return raw_coef * scale, raw_intercept + raw_coef @ mean
+
+def fit_logistic(X_scaled, y, hyperparams, init=None):
+    from sklearn.linear_model import LogisticRegression
+
+    lr = LogisticRegression(
+        class_weight=None,
+        random_state=43,
+        max_iter=1000,
+        solver=hyperparams["solver"],
+        penalty=hyperparams["penalty"],
+        C=hyperparams["C"],
+        warm_start=init is not None,
+    )
+    if init is not None:
+        # fit starts lbfgs from these when warm_start is set
+        lr.coef_ = init[0][None, :].copy()
+        lr.intercept_ = np.array([init[1]])
+    with pipelineTrace.stage("fit_logistic", "fit", rows=len(y), warm=init is not None):
+        lr.fit(X_scaled, y)
+    return lr
+
+def fit_isotonic(decision, y):
+    from sklearn.isotonic import IsotonicRegression
+
+    with pipelineTrace.stage("fit_isotonic", "calibrate", rows=len(y)):
+        isotonic = IsotonicRegression(out_of_bounds="clip", y_min=0, y_max=1)
+        isotonic.fit(decision, y)
+    return isotonic.X_thresholds_.astype(np.float64), isotonic.y_thresholds_.astype(np.float64)
+
+def update_live_model(
+    ratingSegment,
+    colsToKeep,
+    firstYear=model.START_YEAR,
+    lastYear=model.END_YEAR,
+    drift_threshold=DEFAULT_DRIFT_THRESHOLD,
+    hyperparams=None,
+    rebuild=False,
+):
+    """
+    Append new games, warm-start the fit and write the next artifact version (the
+    first call, rebuild=True or changed settings train from scratch, still as the next
+    version). Returns the version's state record.
+    """
+    from sklearn.preprocessing import StandardScaler
+
+    start = time.time()
+    hyperparams = {**model.DEFAULT_HYPERPARAMS, **(hyperparams or {})}
+    directory = live_dir(ratingSegment, colsToKeep)
+    directory.mkdir(parents=True, exist_ok=True)
+    state = load_state(directory)
+    # every version stays listed (and on disk) across rebuilds, so numbering carries on
+    versions = state["versions"] if state is not None else []
+    settings = {"firstYear": firstYear, "columns": list(colsToKeep), "ratingSegment": list(ratingSegment), "hyperparams": hyperparams}
+    rebuild_reason = None
+    if state is not None and rebuild:
+        rebuild_reason = "requested"
+    elif state is not None and state["settings"] != settings:
+        print("Live model settings changed, rebuilding from scratch")
+        rebuild_reason = "settings changed"
+
+    if state is None or rebuild_reason is not None:
+        design = {"X": np.empty((0, len(colsToKeep))), "y": np.empty(0, dtype=np.int8), "year": np.empty(0, dtype=np.int16)}
+        seasons, previous = {}, None
+    else:
+        with np.load(directory / "design.npz") as arrays:
+            design = {name: arrays[name] for name in arrays.files}
+        seasons = state["seasons"]
+        previous = compactScorer.CompactScorer.load(directory / versions[-1]["artifact"])
+
+    years = [year for year in matchupStore.available_years() if firstYear <= year <= lastYear]
+    design, seasons, appended, rebuilt = update_design(design, seasons, years, ratingSegment, colsToKeep)
+    if previous is not None and appended == 0:
+        print(f"No new games since {versions[-1]['artifact']} ({time.time() - start:.1f}s)")
+        return versions[-1]
+
+    X, y = design["X"], design["y"]
+    held_out = calibration_rows(len(y))
+    scaler = StandardScaler().fit(X[~held_out])
+    init = warm_start_coef(previous, scaler.mean_, scaler.scale_) if previous is not None else None
+    lr = fit_logistic(scaler.transform(X[~held_out]), y[~held_out], hyperparams, init)
+
+    decision = lr.decision_function(scaler.transform(X[held_out]))
+    held_out_y = y[held_out]
+    # every other held-out row only scores the calibrator, so its error there is out of sample
+    scoring = np.arange(len(held_out_y)) % 2 == 1
+    scoring_error = lambda iso_x, iso_y: expected_calibration_error(np.interp(decision[scoring], iso_x, iso_y), held_out_y[scoring])
+    drift = None
+    if previous is not None and versions[-1].get("calibrationBaseline") is not None:
+        iso_x, iso_y = previous.iso[0]
+        current_error = scoring_error(iso_x, iso_y)
+        drift = current_error - versions[-1]["calibrationBaseline"]
+    if drift is None or drift > drift_threshold:
+        iso_x, iso_y = fit_isotonic(decision[~scoring], held_out_y[~scoring])
+        current_error = calibration_baseline = scoring_error(iso_x, iso_y)
+        calibrated = True
+    else:
+        # drift stays measured against the baseline from when the calibrator was fit
+        calibration_baseline = versions[-1]["calibrationBaseline"]
+        calibrated = False
+
+    on_disk = [int(path.stem[1:]) for path in directory.glob("v[0-9]*.npz") if path.stem[1:].isdigit()]
+    version = max([record["version"] for record in versions] + on_disk + [0]) + 1
+    artifact = f"v{version:04d}.npz"
+    compactScorer.write_compact({
+        "columns": np.array(colsToKeep, dtype=str),
+        "rating_segment": np.array(ratingSegment, dtype=np.float64),
+        "mean": scaler.mean_.astype(np.float64),
+        "scale": scaler.scale_.astype(np.float64),
+        # a single "fold" with its isotonic calibrator, in the layout compactScorer reads
+        "coef": lr.coef_.astype(np.float64),
+        "intercept": lr.intercept_.astype(np.float64),
+        "method": np.array("isotonic"),
+        "iso_x": iso_x,
+        "iso_y": iso_y,
+        "iso_offsets": np.array([0, len(iso_x)]),
+    }, directory / artifact)
+
+    tmp_design = directory / "design.tmp.npz"
+    with open(tmp_design, "wb") as f:
+        np.savez(f, **design)
+    os.replace(tmp_design, directory / "design.npz")
+
+    record = {
+        "version": version,
+        "artifact": artifact,
+        "createdAt": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "rows": int(len(y)),
+        "appendedRows": appended,
+        "rebuiltRows": rebuilt,
+        "warmStart": previous is not None,
+        "rebuild": rebuild_reason,
+        "iterations": int(lr.n_iter_[0]),
+        "calibrated": calibrated,
+        "calibrationError": current_error,
+        "calibrationBaseline": calibration_baseline,
+        "drift": drift,
+    }
+    save_state(directory, {"settings": settings, "seasons": seasons, "versions": versions + [record]})
+
+    drift_note = "" if drift is None else f", calibration drift {drift:+.4f}"
+    print(f"{'Warm' if previous is not None else 'Cold'} fit on {len(y)} games ({appended} new, {rebuilt} rebuilt) "
+        f"in {record['iterations']} lbfgs iterations{drift_note}")
+    print(f"{'Refit' if calibrated else 'Kept'} isotonic calibration (ECE {current_error:.4f}, baseline {calibration_baseline:.4f})")
+    print(f"Wrote {directory / artifact} ({time.time() - start:.1f}s)")
+    return record
+
+def load_latest(ratingSegment, colsToKeep):
+    """The newest live artifact as predict_many/score_games artifacts, or None if there is none yet."""
+    directory = live_dir(ratingSegment, colsToKeep)
+    state = load_state(directory)
+    if state is None:
+        return None
+    scorer = compactScorer.CompactScorer.load(directory / state["versions"][-1]["artifact"])
+    return {"compact": scorer, "colsToKeep": list(colsToKeep), "ratingSegment": list(ratingSegment)}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Warm-start update of the live model with new in-season games.")
+    parser.add_argument("--cols", choices=["base", "advanced"], default="advanced")
+    parser.add_argument("--segment", type=float, nargs=2, default=[model.RANK_DIFF_MIN, model.RANK_DIFF_MAX])
+    parser.add_argument("--first-year", type=int, default=model.START_YEAR)
+    parser.add_argument("--drift-threshold", type=float, default=DEFAULT_DRIFT_THRESHOLD,
+        help="refit the isotonic calibration when its expected calibration error exceeds its baseline by more than this")
+    parser.add_argument("--rebuild", action="store_true", help="rebuild the design matrix and fit from scratch")
+    args = parser.parse_args(argv)
+
+    colsToKeep = model.BASE_COLS if args.cols == "base" else model.ADVANCED_COLS
+    update_live_model(
+        args.segment,
+        colsToKeep,
+        firstYear=args.first_year,
+        drift_threshold=args.drift_threshold,
+        rebuild=args.rebuild
+    )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""
+Columnar binary copy of matchups/{year}.json.
+
+Each season is saved as an uncompressed .npz under matchupStore/ with one typed array
+per column and team names dictionary-encoded as int16 codes into a shared "teams"
+array. np.load only reads the members that are accessed, so readers pay for the
+columns they ask for, and the year/postseason/rating-diff predicates are applied
+before any row is materialized. Stores are rebuilt automatically whenever the
+source JSON changes.
+"""
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+
+import pipelineTrace
+
+MODEL_DIR = Path(__file__).resolve().parent
+MATCHUPS_DIR = MODEL_DIR / "matchups"
+STORE_DIR = MODEL_DIR / "matchupStore"
+
+TEAM_COLUMNS = ("hiTeam", "loTeam", "winningTeam", "homeTeam")
+# integer columns use these sentinels for "not present in the JSON"
+MISSING_INT = -1
+MISSING_DATE = 0
+
+def home_signs(hiTeams, homeTeams):
+    """+1 when the higher rated team is home, -1 when the other team is, 0 for neutral sites."""
+    return np.array([
+        0 if home is None or home == "null" or home == "" else (1 if home == hi else -1)
+        for hi, home in zip(hiTeams, homeTeams)
+    ], dtype=np.int8)
+
+def parse_date(date_str):
+    """MM/DD/YYYY -> YYYYMMDD int (0 if missing)."""
+    if not date_str:
+        return MISSING_DATE
+    month, day, year = date_str.split("/")
+    return int(year) * 10000 + int(month) * 100 + int(day)
+
+def format_date(date_int):
+    if date_int == MISSING_DATE:
+        return None
+    return f"{date_int // 100 % 100:02d}/{date_int % 100:02d}/{date_int // 10000}"
+
+def _int_column(matchups, key, dtype):
+    return np.array([MISSING_INT if m.get(key) is None else m[key] for m in matchups], dtype=dtype)
+
+def _float_column(matchups, key):
+    return np.array([np.nan if m.get(key) is None else m[key] for m in matchups], dtype=np.float64)
+
+def encode_matchups(matchups):
+    """Turn a list of matchup dicts into the typed column arrays saved in the store."""
+    raw_teams = {
+        "hiTeam": [m["higherSeedTeam"] for m in matchups],
+        "loTeam": [m["lowerSeedTeam"] for m in matchups],
+        "winningTeam": [m.get("winningTeam") for m in matchups],
+        "homeTeam": [m.get("homeTeam") for m in matchups],
+    }
+    names = sorted({name for values in raw_teams.values() for name in values if name is not None})
+    codes = {name: i for i, name in enumerate(names)}
+
+    locations = sorted({m["location"] for m in matchups if m.get("location") is not None})
+    location_codes = {name: i for i, name in enumerate(locations)}
+
+    columns = {
+        "year": np.array([int(m["year"]) for m in matchups], dtype=np.int16),
+        "date": np.array([parse_date(m.get("date")) for m in matchups], dtype=np.int32),
+        "higherRating": _float_column(matchups, "higherRating"),
+        "lowerRating": _float_column(matchups, "lowerRating"),
+        "higherRank": _int_column(matchups, "higherRank", np.int16),
+        "lowerRank": _int_column(matchups, "lowerRank", np.int16),
+        "higherSeed": _int_column(matchups, "higherSeed", np.int8),
+        "lowerSeed": _int_column(matchups, "lowerSeed", np.int8),
+        "higherSeedScore": _int_column(matchups, "higherSeedScore", np.int16),
+        "lowerSeedScore": _int_column(matchups, "lowerSeedScore", np.int16),
+        "round": _int_column(matchups, "round", np.int16),
+        "is_postseason": np.array(["round" in m for m in matchups], dtype=bool),
+        "homeSign": home_signs(raw_teams["hiTeam"], raw_teams["homeTeam"]),
+        "location": np.array(
+            [MISSING_INT if m.get("location") is None else location_codes[m["location"]] for m in matchups],
+            dtype=np.int16
+        ),
+        "teams": np.array(names, dtype=str),
+        "locations": np.array(locations, dtype=str),
+    }
+    for column, values in raw_teams.items():
+        columns[column] = np.array([MISSING_INT if name is None else codes[name] for name in values], dtype=np.int16)
+
+    return columns
+
+def store_path(year):
+    return STORE_DIR / f"{year}.npz"
+
+def build_store(year):
+    """(Re)write the columnar store for one season from matchups/{year}.json."""
+    source = MATCHUPS_DIR / f"{year}.json"
+    with pipelineTrace.stage("read_matchups_json", "load", year=year) as stage:
+        with open(source, "r") as f:
+            matchups = json.load(f)
+        stage.rows = len(matchups)
+        stage.read(pipelineTrace.file_size(source))
+
+    columns = encode_matchups(matchups)
+    stat = source.stat()
+    columns["source_mtime_ns"] = np.array(stat.st_mtime_ns, dtype=np.int64)
+    columns["source_size"] = np.array(stat.st_size, dtype=np.int64)
+
+    STORE_DIR.mkdir(exist_ok=True)
+    target = store_path(year)
+    tmp_target = target.with_suffix(".tmp")
+    with open(tmp_target, "wb") as f:
+        np.savez(f, **columns)
+    os.replace(tmp_target, target)
+    return target
+
+def is_stale(year):
+    target = store_path(year)
+    if not target.exists():
+        return True
+
+    stat = (MATCHUPS_DIR / f"{year}.json").stat()
+    with np.load(target) as store:
+        return int(store["source_mtime_ns"]) != stat.st_mtime_ns or int(store["source_size"]) != stat.st_size
+
+def ensure_store(year):
+    if is_stale(year):
+        build_store(year)
+    return store_path(year)
+
+def available_years():
+    return sorted(int(path.stem) for path in MATCHUPS_DIR.glob("*.json"))
+
+def read_matchups(
+    years=None,
+    columns=None,
+    postseason=None,
+    ratingDiff=None,
+    homeCourtAdvantage=0.0,
+    covidNeutral=False,
+):
+    """
+    Read matchups as a dict of column -> array, concatenated over the requested seasons.
+
+    years: (first, last) inclusive range, or None for every season on disk
+    columns: column names to materialize (default: all). Team columns come back as
+        object arrays of names (None where missing); "seed_diff" is derived from the
+        seed columns (NaN outside the postseason)
+    postseason: True/False to keep only tournament/regular season games
+    ratingDiff: (min, max) inclusive bounds on the higher-minus-lower rating after home
+        court adjustment (either bound may be None). Games without ratings never match
+    homeCourtAdvantage: rating points added to the home team (and taken from the road team)
+    covidNeutral: treat every 2021 game as neutral site, like the model does
+    """
+    if years is None:
+        selected = available_years()
+    else:
+        selected = [year for year in available_years() if years[0] <= year <= years[1]]
+
+    parts = []
+    for year in selected:
+        with np.load(ensure_store(year)) as store:
+            keep = np.ones(len(store["year"]), dtype=bool)
+            if postseason is not None:
+                keep &= store["is_postseason"] == postseason
+            if ratingDiff is not None:
+                sign = store["homeSign"].astype(np.float64)
+                if covidNeutral and year == 2021:
+                    sign[:] = 0
+                diff = store["higherRating"] - store["lowerRating"] + 2 * homeCourtAdvantage * sign
+                if ratingDiff[0] is not None:
+                    keep &= diff >= ratingDiff[0]
+                if ratingDiff[1] is not None:
+                    keep &= diff <= ratingDiff[1]
+
+            rows = np.flatnonzero(keep)
+            wanted = columns or [name for name in store.files if name not in ("teams", "locations", "source_mtime_ns", "source_size")]
+            part = {}
+            for name in wanted:
+                if name == "seed_diff":
+                    higher, lower = store["higherSeed"][rows], store["lowerSeed"][rows]
+                    part[name] = np.where(lower == MISSING_INT, np.nan, lower.astype(np.float64) - higher)
+                elif name in TEAM_COLUMNS:
+                    names = np.append(store["teams"].astype(object), None)
+                    part[name] = names[store[name][rows]]
+                elif name == "location":
+                    names = np.append(store["locations"].astype(object), None)
+                    part[name] = names[store[name][rows]]
+                else:
+                    part[name] = store[name][rows]
+            parts.append(part)
+
+    if not parts:
+        return {name: np.array([]) for name in (columns or [])}
+    return {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+
+if __name__ == "__main__":
+    for year in available_years():
+        build_store(year)
+        print(f"Built {store_path(year)}")
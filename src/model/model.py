@@ -5,13 +5,15 @@ import pandas as pd
 import numpy as np
 import math
 
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.linear_model import LogisticRegression
-from sklearn.model_selection import train_test_split
-from sklearn.calibration import CalibratedClassifierCV
-from sklearn.metrics import brier_score_loss
-from sklearn.preprocessing import StandardScaler
-from sklearn.metrics import log_loss
+import featureCache
+import matchupStore
+import modelCache
+import pipelineTrace
+from matchupStore import home_signs
+from seasonStore import season_store, TEAM_STATS_IGNORED_COLS
+
+# sklearn is only imported inside the functions that train/evaluate, so scoring with a
+# cached compact model (see compactScorer) never pays for importing it
 
 START_YEAR = 2013
 SPLIT_YEAR = 2022
@@ -36,164 +38,275 @@ roughSeedUpsetProbs = {
 # bc we want this number to represent vs neutral not vs road
 HOME_COURT_ADVANTAGE = 2.14 
 
-def load_json(path):
-    with open(path, "r") as f:
-        return json.load(f)
-    
-def build_team_stats(misc, four_factors):
-    misc_df = pd.DataFrame(misc)
-    ff_df = pd.DataFrame(four_factors)
-
-    df = misc_df.merge(ff_df, on="team", how="inner")
-    
-    # Convert numeric columns
-    for col in df.columns:
-        if col != "team" and col != "conf":
-            df[col] = pd.to_numeric(df[col], errors="coerce")
-
-    colsToIgnore = ["conf", "Stl_pct", "Blk_pct", "2P_pct",
-        "eFG_pct_off", "eFG_pct_def", "FTRate_off", "2P_Dist"]
-    return df.set_index("team").drop(columns=colsToIgnore, errors="ignore")
+# logistic regression + calibration settings (part of the model cache key)
+DEFAULT_HYPERPARAMS = {
+    "C": 0.5,   # try grid: [0.1, 0.3, 0.5, 1, 3]
+    "penalty": "l2",
+    "solver": "lbfgs",
+    "calibration": "isotonic",
+    "cv": 5,
+}
 
-def build_matchup_rows(matchups, team_stats, averages, ratingSegment, numBuckets):
-    rows = []
-    
-    # higherSeedTeam, higherRating
-    relevantMatchups = []
-
-    for m in matchups: 
-        adjustedHigherRating, adjustedLowerRating = m["higherRating"], m["lowerRating"]
-        # account for no home crowds in covid
-        if m["year"] == "2021" or "homeTeam" not in m or m["homeTeam"] == "null" or m["homeTeam"] == "" or m["homeTeam"] is None:
-            if(len(matchups) == 1):
-                print('yerRRr')
-            pass
-        elif(m["higherSeedTeam"] == m["homeTeam"]):
-            adjustedHigherRating += HOME_COURT_ADVANTAGE
-            adjustedLowerRating -= HOME_COURT_ADVANTAGE
+# matchup columns build_matchup_frame needs (see matchupStore.read_matchups)
+MATCHUP_COLUMNS = ["year", "hiTeam", "loTeam", "winningTeam", "higherRating", "lowerRating",
+    "homeSign", "is_postseason", "seed_diff"]
+
+# feature spec for the per-team stat columns (see featurize_matchups)
+NO_DELTA_COLS = ["3PA_pct", "3P_pct", "TO_pct_off", "TO_pct_def", "FT_pct", "adjTempo"]
+VS_AVERAGE_COLS = []#"adjTempo"]
+ADD_TOGETHER_COLS = ["3PA_pct", "adjTempo"]
+PAIRS_WITH_NAME = [["TO_pct_off", "TO_pct_def", "TO_freq"], ["adjDE", "adjOE", "OFF_LO"]]
+
+def adjusted_ratings(columns):
+    """Home-court adjusted (higher, lower) ratings for every game."""
+    # account for no home crowds in covid
+    sign = np.where(columns["year"] == 2021, 0, columns["homeSign"])
+    adjustment = sign * HOME_COURT_ADVANTAGE
+    return columns["higherRating"] + adjustment, columns["lowerRating"] - adjustment
+
+def featurize_matchups(hi_ids, lo_ids, team_stats, averages, index=None):
+    """
+    Build every stat feature for the given games in one batched pass.
+    hi_ids/lo_ids are row positions in team_stats, so the hi/lo stat arrays are
+    gathered with fancy indexing and each column costs a handful of vector ops.
+    """
+    stats = team_stats.to_numpy(dtype=np.float64)
+    hi_stats = stats[hi_ids]
+    lo_stats = stats[lo_ids]
+    col_pos = {col: i for i, col in enumerate(team_stats.columns)}
+
+    features = {}
+    for col, i in col_pos.items():
+        if(col in ADD_TOGETHER_COLS):
+            features[f"sum_{col}"] = lo_stats[:, i] + hi_stats[:, i]
+        elif(col in VS_AVERAGE_COLS):
+            features[f"vs_avg_{col}_hi"] = hi_stats[:, i] - averages[col]
+            features[f"vs_avg_{col}_lo"] = lo_stats[:, i] - averages[col]
         else:
-            adjustedHigherRating -= HOME_COURT_ADVANTAGE
-            adjustedLowerRating += HOME_COURT_ADVANTAGE
-        
-        if(adjustedHigherRating is None or adjustedLowerRating is None):
-            print("nan rating detected!")
-            return []
-        ratingDiff = adjustedHigherRating - adjustedLowerRating
-        
-        # skip if outside rating segment
-        if(ratingDiff < ratingSegment[0] or ratingDiff > ratingSegment[1]):
-            continue
+            for pair in PAIRS_WITH_NAME:
+                if pair[0] == col:
+                    features[pair[2]] = hi_stats[:, i] + lo_stats[:, col_pos[pair[1]]]
+                    break
 
-        # optionally create buckets (pass ratingSegment max of 29.99 instead of 30 to avoid one extra bucket for ratings of exactly 30)
-        if(numBuckets > 0):
-            ratingRange = ratingSegment[1] - ratingSegment[0]
-            bucketWidth = ratingRange / numBuckets
-            m["bucket"] = ((ratingDiff - ratingSegment[0]) // bucketWidth) + 1
+        if(col not in NO_DELTA_COLS):
+            features[f"delta_{col}"] = lo_stats[:, i] - hi_stats[:, i]
         else:
-            m["adjustedHigherRating"] = adjustedHigherRating
-            m["adjustedLowerRating"] = adjustedLowerRating
-        
-        relevantMatchups.append(m)
-          
-    for matchup in relevantMatchups:
-        is_postseason = "round" in matchup
-        hi = matchup["higherSeedTeam"]
-        lo = matchup["lowerSeedTeam"]
-
-        if hi not in team_stats.index or lo not in team_stats.index:
-            print(f"Missing stats for matchup: {hi} vs {lo} in {matchup['year']}")
-            continue
+            features[f"{col}_hi"] = hi_stats[:, i]
+            features[f"{col}_lo"] = lo_stats[:, i]
 
-        hi_stats = team_stats.loc[hi]
-        lo_stats = team_stats.loc[lo]
-
-        row = {}
-
-        noDeltaCols = ["3PA_pct", "3P_pct", "TO_pct_off", "TO_pct_def", "FT_pct", "adjTempo"]
-        vsAverageCols = []#"adjTempo"]
-        addTogetherCols = ["3PA_pct", "adjTempo"]
-        pairsWithName = [["TO_pct_off", "TO_pct_def", "TO_freq"], ["adjDE", "adjOE", "OFF_LO"]]
-
-        for col in team_stats.columns:
-            if(col in addTogetherCols):
-                row[f"sum_{col}"] = lo_stats[col] + hi_stats[col]
-            elif(col in vsAverageCols):
-                row[f"vs_avg_{col}_hi"] = hi_stats[col] - averages[col]
-                row[f"vs_avg_{col}_lo"] = lo_stats[col] - averages[col]
-            elif any(col in pair for pair in pairsWithName):
-                # find the pair
-                for pair in pairsWithName:
-                    if col in pair and pair[0] == col:
-                        other_col = pair[1]
-                        row[f"{pair[2]}"] = hi_stats[col] + lo_stats[other_col]
-                        break
-                
-            if(col not in noDeltaCols):
-                row[f"delta_{col}"] = lo_stats[col] - hi_stats[col]
-            else:
-                row[f"{col}_hi"] = hi_stats[col]
-                row[f"{col}_lo"] = lo_stats[col]
-
-        # Target: upset?
-        row["upset"] = int(matchup["winningTeam"] == lo)
-        
-        # metadata for visibility
-        row["hiTeam"] = hi
-        row["loTeam"] = lo
-        row["year"] = int(matchup["year"])
-        row["is_postseason"] = is_postseason
-        if("lowerSeed" in matchup):
-            row["seed_diff"] = matchup["lowerSeed"] - matchup["higherSeed"]
-            
-        if(numBuckets > 0):
-            row["bucket"] = matchup["bucket"]
-        else:
-            row["higherRating"] = matchup["adjustedHigherRating"]
-            row["lowerRating"] = matchup["adjustedLowerRating"]
-            row["rating_diff"] = matchup["adjustedHigherRating"] - matchup["adjustedLowerRating"]
-            row["rating_sum"] = matchup["adjustedHigherRating"] + matchup["adjustedLowerRating"]
-            #print('we here!!')
-        rows.append(row)
-        
-    return rows
-
-def prepare_model_dataframe(ratingSegment, numBuckets):
-    all_rows = []
-    fullRange = [year for year in range(START_YEAR, END_YEAR + 1)]
-    for year in fullRange:
-        misc = load_json(f"misc/{year}.json")
-        ff = load_json(f"fourFactors/{year}.json")
-        matchups = load_json(f"matchups/{year}.json")
-        averages = load_json(f"averages/{year}.json")
-
-        team_stats = build_team_stats(misc, ff)
-        rows = build_matchup_rows(matchups, team_stats, averages, ratingSegment, numBuckets)
-        all_rows.extend(rows)
-
-    df = pd.DataFrame(all_rows)
-
-    # Keep seed_diff separate since it's only present for postseason games
-    seed_diff_col = df["seed_diff"].copy() if "seed_diff" in df.columns else None
-
-    # Drop seed_diff before dropna so we don't lose regular season games
-    if "seed_diff" in df.columns:
+    return pd.DataFrame(
+        {name: values.astype(np.float32) for name, values in features.items()},
+        index=index
+    )
+
+def build_matchup_frame(columns, team_stats, averages, ratingSegment, numBuckets):
+    """
+    Featurize one season of matchup columns (see MATCHUP_COLUMNS).
+    The frame index is each game's position in the input, so callers can map rows back.
+    """
+    higherRating, lowerRating = adjusted_ratings(columns)
+    if np.isnan(higherRating).any() or np.isnan(lowerRating).any():
+        print("nan rating detected!")
+        return pd.DataFrame()
+
+    ratingDiff = higherRating - lowerRating
+    # skip if outside rating segment
+    rows = np.flatnonzero((ratingDiff >= ratingSegment[0]) & (ratingDiff <= ratingSegment[1]))
+
+    hi_ids = team_stats.index.get_indexer(columns["hiTeam"][rows])
+    lo_ids = team_stats.index.get_indexer(columns["loTeam"][rows])
+    missing = (hi_ids < 0) | (lo_ids < 0)
+    for row in rows[missing]:
+        print(f"Missing stats for matchup: {columns['hiTeam'][row]} vs {columns['loTeam'][row]} in {columns['year'][row]}")
+    rows = rows[~missing]
+
+    frame = featurize_matchups(hi_ids[~missing], lo_ids[~missing], team_stats, averages, index=rows)
+
+    # Target: upset?
+    frame["upset"] = (columns["winningTeam"][rows] == columns["loTeam"][rows]).astype(np.int8)
+
+    # metadata for visibility
+    frame["hiTeam"] = columns["hiTeam"][rows]
+    frame["loTeam"] = columns["loTeam"][rows]
+    frame["year"] = columns["year"][rows]
+    frame["is_postseason"] = columns["is_postseason"][rows]
+    frame["seed_diff"] = columns["seed_diff"][rows]
+
+    add_rating_columns(frame, higherRating[rows], lowerRating[rows], ratingSegment, numBuckets)
+    return frame
+
+def add_rating_columns(frame, higherRating, lowerRating, ratingSegment, numBuckets):
+    """Add the bucket or rating columns to a frame (or a dict of columns)."""
+    ratingDiff = higherRating - lowerRating
+    # optionally create buckets (pass ratingSegment max of 29.99 instead of 30 to avoid one extra bucket for ratings of exactly 30)
+    if(numBuckets > 0):
+        ratingRange = ratingSegment[1] - ratingSegment[0]
+        bucketWidth = ratingRange / numBuckets
+        frame["bucket"] = ((ratingDiff - ratingSegment[0]) // bucketWidth) + 1
+    else:
+        frame["higherRating"] = higherRating
+        frame["lowerRating"] = lowerRating
+        frame["rating_diff"] = ratingDiff
+        frame["rating_sum"] = higherRating + lowerRating
+
+# per-game metadata saved next to the feature matrix in the feature cache
+FEATURE_CACHE_META = ["upset", "hiTeam", "loTeam", "year", "is_postseason", "seed_diff", "higherRating", "lowerRating"]
+ALL_RATINGS = (-np.inf, np.inf)
+
+def feature_cache_params():
+    """Everything besides the source files that changes the cached feature matrices."""
+    return {
+        "homeCourtAdvantage": HOME_COURT_ADVANTAGE,
+        "noDeltaCols": NO_DELTA_COLS,
+        "vsAverageCols": VS_AVERAGE_COLS,
+        "addTogetherCols": ADD_TOGETHER_COLS,
+        "pairsWithName": PAIRS_WITH_NAME,
+        "ignoredCols": TEAM_STATS_IGNORED_COLS,
+    }
+
+def season_features(season):
+    """
+    The season's featurized games (every game with ratings) from the feature cache,
+    featurizing and saving them first if the cache is missing or stale.
+    """
+    params = feature_cache_params()
+    digest = featureCache.input_hash(season_input_paths([season.year]))
+    entry = featureCache.load_entry(season.year, params, digest)
+    if entry is not None:
+        return entry
+
+    matchups = matchupStore.read_matchups(
+        (season.year, season.year),
+        columns=MATCHUP_COLUMNS,
+        ratingDiff=ALL_RATINGS,
+        homeCourtAdvantage=HOME_COURT_ADVANTAGE,
+        covidNeutral=True
+    )
+    with pipelineTrace.stage("build_matchup_frame", "featurize", year=season.year) as stage:
+        frame = build_matchup_frame(matchups, season.team_stats, season.averages, ALL_RATINGS, numBuckets=0)
+        stage.rows = len(frame)
+    feature_cols = [col for col in frame.columns if col not in FEATURE_CACHE_META + ["rating_diff", "rating_sum"]]
+
+    teams = pd.Index(pd.unique(np.concatenate([frame["hiTeam"].to_numpy(), frame["loTeam"].to_numpy()]))).sort_values()
+    arrays = {
+        "upset": frame["upset"].to_numpy(np.int8),
+        "hiTeam": teams.get_indexer(frame["hiTeam"]).astype(np.int16),
+        "loTeam": teams.get_indexer(frame["loTeam"]).astype(np.int16),
+        "year": frame["year"].to_numpy(np.int16),
+        "is_postseason": frame["is_postseason"].to_numpy(bool),
+        "seed_diff": frame["seed_diff"].to_numpy(np.float64),
+        "higherRating": frame["higherRating"].to_numpy(np.float64),
+        "lowerRating": frame["lowerRating"].to_numpy(np.float64),
+        # games with every stat feature present (what dropna keeps)
+        "complete": frame[feature_cols].notna().all(axis=1).to_numpy(),
+    }
+    features = {col: frame[col].to_numpy() for col in feature_cols}
+    return featureCache.save_entry(season.year, params, digest, features, arrays, teams)
+
+def frame_from_features(entry, ratingSegment, numBuckets, columns=None):
+    """
+    Same frame build_matchup_frame returns for this segment, sliced out of a cached entry.
+    columns limits which stat features are read (default: all of them).
+    """
+    higherRating = entry.arrays["higherRating"]
+    lowerRating = entry.arrays["lowerRating"]
+    ratingDiff = higherRating - lowerRating
+    rows = np.flatnonzero((ratingDiff >= ratingSegment[0]) & (ratingDiff <= ratingSegment[1]))
+
+    if columns is not None:
+        columns = [col for col in entry.feature_columns if col in columns]
+    data = entry.feature_matrix(rows, columns)
+    data["upset"] = entry.arrays["upset"][rows]
+    data["hiTeam"] = entry.team_names("hiTeam", rows)
+    data["loTeam"] = entry.team_names("loTeam", rows)
+    data["year"] = entry.arrays["year"][rows]
+    data["is_postseason"] = entry.arrays["is_postseason"][rows]
+    data["seed_diff"] = entry.arrays["seed_diff"][rows]
+
+    add_rating_columns(data, higherRating[rows], lowerRating[rows], ratingSegment, numBuckets)
+    # build the frame in one go rather than inserting column by column
+    return pd.DataFrame(data, index=rows)
+
+def prepare_model_dataframe(ratingSegment, numBuckets, columns=None, startYear=START_YEAR, endYear=END_YEAR):
+    """
+    Training frame for every season from startYear through endYear, sliced from the
+    per-season feature cache. columns limits which stat features are materialized
+    (default: all of them).
+    """
+    with pipelineTrace.stage("prepare_model_dataframe", "featurize") as stage:
+        frames = []
+        complete = []
+        fullRange = [year for year in range(startYear, endYear + 1)]
+        for season in season_store.preload(fullRange):
+            entry = season_features(season)
+            frame = frame_from_features(entry, ratingSegment, numBuckets, columns)
+            frames.append(frame)
+            complete.append(entry.arrays["complete"][frame.index])
+
+        df = pd.concat(frames, ignore_index=True)
+
+        # store team names as categoricals sharing one set of categories
+        teams = pd.Index(pd.unique(np.concatenate([df["hiTeam"].to_numpy(), df["loTeam"].to_numpy()]))).sort_values()
+        df["hiTeam"] = pd.Categorical(df["hiTeam"], categories=teams)
+        df["loTeam"] = pd.Categorical(df["loTeam"], categories=teams)
+
+        # Keep seed_diff separate since it's only present for postseason games
+        seed_diff_col = df["seed_diff"].copy() if df["seed_diff"].notna().any() else None
+
+        # Drop seed_diff before dropna so we don't lose regular season games
         df = df.drop(columns=["seed_diff"])
 
-    df = df.dropna()
+        # drop games missing any stat feature, including ones not materialized
+        df = df[np.concatenate(complete)].dropna()
 
-    ratingDiffIdentifier = "rating_diff" if numBuckets == 0 else "bucket"
-    team_info = df[["hiTeam", "loTeam", "year", "is_postseason", ratingDiffIdentifier]].copy()
-    team_info["year"] = pd.to_numeric(team_info["year"])
+        ratingDiffIdentifier = "rating_diff" if numBuckets == 0 else "bucket"
+        team_info = df[["hiTeam", "loTeam", "year", "is_postseason", ratingDiffIdentifier]].copy()
 
-    # Re-attach seed_diff to team_info (will be NaN for regular season)
-    if seed_diff_col is not None:
-        team_info["seed_diff"] = seed_diff_col.loc[df.index]
+        # Re-attach seed_diff to team_info (will be NaN for regular season)
+        if seed_diff_col is not None:
+            team_info["seed_diff"] = seed_diff_col.loc[df.index]
 
-    return df, team_info
+        stage.rows = len(df)
+        return df, team_info
 
-def train_model_artifacts(ratingSegment, colsToKeep, numBuckets=0):
-    df, team_info = prepare_model_dataframe(ratingSegment, numBuckets)
+def season_input_paths(years):
+    """Every per-season file the training frame is built from."""
+    paths = []
+    for year in years:
+        sources = season_store.source_paths(year)
+        paths += [sources["misc"], sources["fourFactors"], matchupStore.MATCHUPS_DIR / f"{year}.json", sources["averages"]]
+    return paths
 
+def fit_calibrated_model(X_train_scaled, y_train, hyperparams):
+    from sklearn.calibration import CalibratedClassifierCV
+    from sklearn.linear_model import LogisticRegression
+
+    lr = LogisticRegression(
+        class_weight=None,
+        random_state=43,
+        max_iter=1000,
+        solver=hyperparams["solver"],
+        penalty=hyperparams["penalty"],
+        C=hyperparams["C"]
+    )
+
+    # Calibrate probabilities (critical)
+    calibrated_lr = CalibratedClassifierCV(
+        lr, method=hyperparams["calibration"], cv=hyperparams["cv"]
+    )
+    # fits the logistic model and its calibrator on each cv fold
+    with pipelineTrace.stage("fit_calibrated_model", "fit", rows=len(y_train), calibration=hyperparams["calibration"]):
+        calibrated_lr.fit(X_train_scaled, y_train)
+    return calibrated_lr
+
+def training_data(ratingSegment, colsToKeep, numBuckets=0):
+    """
+    Features and targets split by year, scaled with a StandardScaler fit on the
+    training years (see train_model_artifacts).
+    """
+    from sklearn.preprocessing import StandardScaler
+
+    df, team_info = prepare_model_dataframe(ratingSegment, numBuckets, columns=colsToKeep)
 
     X = df[colsToKeep].copy()
     y = df["upset"].copy()
@@ -206,8 +319,6 @@ def train_model_artifacts(ratingSegment, colsToKeep, numBuckets=0):
     X_test = X[test_mask]
     y_train = y[train_mask]
     y_test = y[test_mask]
-    
-    print(X_train.head(1))
 
     # Scale all numeric features
     scaler = StandardScaler()
@@ -222,40 +333,74 @@ def train_model_artifacts(ratingSegment, colsToKeep, numBuckets=0):
         index=X_test.index
     )
 
-    lr = LogisticRegression(
-        class_weight=None,
-        random_state=43,
-        max_iter=1000,
-        solver="lbfgs",
-        penalty="l2",
-        C=0.5   # try grid: [0.1, 0.3, 0.5, 1, 3]
+    return {
+        "X_train": X_train,
+        "X_test": X_test,
+        "y_train": y_train,
+        "y_test": y_test,
+        "X_train_scaled": X_train_scaled,
+        "X_test_scaled": X_test_scaled,
+        "scaler": scaler,
+        "team_info": team_info,
+    }
+
+def train_model_artifacts(ratingSegment, colsToKeep, numBuckets=0, hyperparams=None, useCache=True, compact=False):
+    """
+    Trained model, scaler and holdout data for a segment/column set, cached in modelCache.
+    compact=True returns {"compact": CompactScorer, ...} from the cache when it is there, which is
+    all predict_many needs and skips unpickling sklearn objects.
+    """
+    hyperparams = {**DEFAULT_HYPERPARAMS, **(hyperparams or {})}
+    cache_key = modelCache.artifact_key(
+        {
+            "ratingSegment": list(ratingSegment),
+            "colsToKeep": list(colsToKeep),
+            "numBuckets": numBuckets,
+            "years": [START_YEAR, SPLIT_YEAR, END_YEAR],
+            "homeCourtAdvantage": HOME_COURT_ADVANTAGE,
+            "hyperparams": hyperparams,
+        },
+        season_input_paths(range(START_YEAR, END_YEAR + 1))
     )
+    if useCache and compact:
+        scorer = modelCache.load_compact(cache_key)
+        if scorer is not None:
+            return {"compact": scorer, "colsToKeep": colsToKeep, "ratingSegment": list(ratingSegment)}
+    if useCache:
+        artifacts = modelCache.load_artifacts(cache_key)
+        if artifacts is not None:
+            return artifacts
 
-    lr.fit(X_train_scaled, y_train)
+    data = training_data(ratingSegment, colsToKeep, numBuckets)
+    print(data["X_train"].head(1))
 
-    # Calibrate probabilities (critical)
-    calibrated_lr = CalibratedClassifierCV(
-        lr, method="isotonic", cv=5
-    )
-    calibrated_lr.fit(X_train_scaled, y_train)
+    calibrated_lr = fit_calibrated_model(data["X_train_scaled"], data["y_train"], hyperparams)
 
-    return {
+    artifacts = {
         "model": calibrated_lr,
-        "scaler": scaler,
+        "scaler": data["scaler"],
         "colsToKeep": colsToKeep,
-        "X_test": X_test,
-        "X_test_scaled": X_test_scaled,
-        "y_test": y_test,
-        "team_info": team_info,
+        "ratingSegment": list(ratingSegment),
+        "X_test": data["X_test"],
+        "X_test_scaled": data["X_test_scaled"],
+        "y_test": data["y_test"],
+        "team_info": data["team_info"],
         "ratingDiffIdentifier": "rating_diff" if numBuckets == 0 else "bucket"
     }
+    if useCache:
+        modelCache.save_artifacts(cache_key, artifacts)
+    return artifacts
 
 def buildAndRunModel(
     ratingSegment = [0,50],
     colsToKeep=[],
-    numBuckets=0
+    numBuckets=0,
+    artifacts=None
 ):
-    artifacts = train_model_artifacts(ratingSegment, colsToKeep, numBuckets)
+    from sklearn.metrics import brier_score_loss, log_loss
+
+    if artifacts is None:
+        artifacts = train_model_artifacts(ratingSegment, colsToKeep, numBuckets)
     calibrated_lr = artifacts["model"]
     X_test = artifacts["X_test"]
     X_test_scaled = artifacts["X_test_scaled"]
@@ -264,7 +409,8 @@ def buildAndRunModel(
     ratingDiffIdentifier = artifacts["ratingDiffIdentifier"]
 
     # Evaluate
-    probs = calibrated_lr.predict_proba(X_test_scaled)[:, 1]
+    with pipelineTrace.stage("holdout_predict", "score", rows=len(X_test_scaled)):
+        probs = calibrated_lr.predict_proba(X_test_scaled)[:, 1]
 
     brier = brier_score_loss(y_test, probs)
     ll_base = log_loss(y_test, probs)
@@ -323,61 +469,185 @@ def _predict_game_upset_prob_from_artifacts(
     ratingSegment,
     homeTeam=None,
 ):
-    model = artifacts["model"]
-    scaler = artifacts["scaler"]
+    artifacts = {**artifacts, "colsToKeep": colsToKeep, "ratingSegment": ratingSegment}
+    prediction = predict_many([(teamA, teamB, homeTeam)], year, artifacts).iloc[0]
+    if prediction["error"] is not None:
+        raise ValueError(prediction["error"])
 
-    misc = load_json(f"misc/{year}.json")
-    ff = load_json(f"fourFactors/{year}.json")
-    averages = load_json(f"averages/{year}.json")
-    ratings = load_json(f"ratings/{year}.json")
-
-    team_stats = build_team_stats(misc, ff)
-    ratings_df = pd.DataFrame(ratings).set_index("team")
-
-    if teamA not in team_stats.index or teamB not in team_stats.index:
-        raise ValueError(f"Team stats missing for one or both teams: {teamA}, {teamB}")
+    upset_prob = float(prediction["upset_prob"])
+    print(
+        f"Upset probability ({prediction['lowerSeedTeam']} over {prediction['higherSeedTeam']}) in {year}: {upset_prob:.4f}"
+    )
+    return upset_prob
 
-    if teamA not in ratings_df.index or teamB not in ratings_df.index:
-        raise ValueError(f"Ratings missing for one or both teams: {teamA}, {teamB}")
 
-    ratingA = float(ratings_df.loc[teamA, "netRating"])
-    ratingB = float(ratings_df.loc[teamB, "netRating"])
+def load_prediction_season(year):
+    """Everything predict_many needs for one season: (team_stats, averages, ratings by team)."""
+    season = season_store.season(year)
+    return season.team_stats, season.averages, season.ratings["netRating"].astype(float)
+
+
+def score_games(game_df, artifacts):
+    """Upset probability for every row of a featurized frame (compact or sklearn artifacts)."""
+    X_games = game_df[artifacts["colsToKeep"]]
+    with pipelineTrace.stage("score_games", "score", rows=len(X_games), compact="compact" in artifacts):
+        if "compact" in artifacts:
+            # score() takes the lookup table when the model has an accurate one
+            return artifacts["compact"].score(X_games.to_numpy(np.float64))
+
+        X_games_scaled = pd.DataFrame(
+            artifacts["scaler"].transform(X_games),
+            columns=X_games.columns,
+            index=X_games.index
+        )
+        return artifacts["model"].predict_proba(X_games_scaled)[:, 1]
+
+def featurize_pairs(pairs, year, ratingSegment, season=None):
+    """
+    Featurize many hypothetical games from one season in one batch (see predict_many).
+    Returns (info, game_df, scored): one info row per pair with the higher/lower rated
+    team and error (None if the pair was featurized), the featurized frame, and the
+    pair positions of game_df's rows.
+    """
+    year = int(year)
+    if season is None:
+        season = load_prediction_season(year)
+    team_stats, averages, ratings_by_team = season
+
+    pairs = [tuple(pair) for pair in pairs]
+    teamA = np.array([pair[0] for pair in pairs], dtype=object)
+    teamB = np.array([pair[1] for pair in pairs], dtype=object)
+    homeTeam = [pair[2] if len(pair) > 2 else None for pair in pairs]
+
+    ratingA = ratings_by_team.reindex(teamA).to_numpy(dtype=np.float64)
+    ratingB = ratings_by_team.reindex(teamB).to_numpy(dtype=np.float64)
+    a_is_higher = ~(ratingA < ratingB)
+    higherSeedTeam = np.where(a_is_higher, teamA, teamB)
+    lowerSeedTeam = np.where(a_is_higher, teamB, teamA)
+
+    errors = np.full(len(pairs), None, dtype=object)
+    has_stats = team_stats.index.get_indexer(teamA) >= 0
+    has_stats &= team_stats.index.get_indexer(teamB) >= 0
+    has_ratings = ~np.isnan(ratingA) & ~np.isnan(ratingB)
+    for i in np.flatnonzero(~has_stats):
+        errors[i] = f"Team stats missing for one or both teams: {teamA[i]}, {teamB[i]}"
+    for i in np.flatnonzero(has_stats & ~has_ratings):
+        errors[i] = f"Ratings missing for one or both teams: {teamA[i]}, {teamB[i]}"
+
+    # higher/lower is only meaningful once both ratings are known
+    higherSeedTeam[~has_ratings] = None
+    lowerSeedTeam[~has_ratings] = None
+
+    valid = np.flatnonzero(has_stats & has_ratings)
+    columns = {
+        "year": np.full(len(valid), year, dtype=np.int16),
+        "hiTeam": higherSeedTeam[valid],
+        "loTeam": lowerSeedTeam[valid],
+        "winningTeam": higherSeedTeam[valid],
+        "higherRating": np.fmax(ratingA, ratingB)[valid],
+        "lowerRating": np.fmin(ratingA, ratingB)[valid],
+        "homeSign": home_signs(higherSeedTeam[valid], [homeTeam[i] for i in valid]),
+        "is_postseason": np.zeros(len(valid), dtype=bool),
+        "seed_diff": np.full(len(valid), np.nan),
+    }
 
-    if ratingA >= ratingB:
-        higherSeedTeam, lowerSeedTeam = teamA, teamB
-        higherRating, lowerRating = ratingA, ratingB
-    else:
-        higherSeedTeam, lowerSeedTeam = teamB, teamA
-        higherRating, lowerRating = ratingB, ratingA
+    with pipelineTrace.stage("featurize_pairs", "featurize", rows=len(valid)):
+        game_df = build_matchup_frame(columns, team_stats, averages, ratingSegment, numBuckets=0) if len(valid) else pd.DataFrame()
+    scored = valid[game_df.index.to_numpy()] if len(game_df) else np.array([], dtype=np.int64)
+    for i in np.setdiff1d(valid, scored):
+        errors[i] = "Game could not be featurized (likely outside rating segment or missing inputs)."
 
-    synthetic_matchup = {
-        "year": str(year),
+    # object columns, so missing teams and errors stay None (pandas 3 would infer a string dtype and make them NaN)
+    info = pd.DataFrame({
+        "teamA": teamA,
+        "teamB": teamB,
+        "homeTeam": homeTeam,
         "higherSeedTeam": higherSeedTeam,
         "lowerSeedTeam": lowerSeedTeam,
-        "higherRating": higherRating,
-        "lowerRating": lowerRating,
-        "winningTeam": higherSeedTeam,
-        "homeTeam": homeTeam,
-    }
+        "error": errors,
+    }, dtype=object)
+    return info, game_df, scored
+
+def predict_many(pairs, year, artifacts, season=None):
+    """
+    Score many hypothetical games from one season in a single predict_proba call.
+
+    pairs holds (teamA, teamB) or (teamA, teamB, homeTeam) tuples. The season is loaded
+    once (or passed in via season=load_prediction_season(year)) and all pairs are
+    featurized together. Returns one row per pair, in input order, with the
+    higher/lower rated team, upset_prob (NaN if the pair could not be scored) and error.
+    """
+    info, game_df, scored = featurize_pairs(pairs, year, artifacts["ratingSegment"], season=season)
+
+    upset_prob = np.full(len(info), np.nan)
+    if len(scored):
+        upset_prob[scored] = score_games(game_df, artifacts)
+
+    info.insert(len(info.columns) - 1, "upset_prob", upset_prob)
+    return info
+
+
+def predict_jsonl(input_file, output_file, artifacts, year=None, chunkSize=5000):
+    """
+    Stream JSONL matchups in, JSONL predictions out (same order).
+
+    Each input line is {"teamA": ..., "teamB": ..., "year"?: ..., "homeTeam"?: ...};
+    year falls back to the year argument. Lines are scored chunkSize at a time with one
+    predict_many call per season in the chunk, and each season is only loaded once.
+    """
+    seasons = {}
+
+    def flush(records):
+        by_year = {}
+        for i, record in enumerate(records):
+            by_year.setdefault(int(record.get("year", year)), []).append(i)
+
+        results = [None] * len(records)
+        for record_year, indices in by_year.items():
+            if record_year not in seasons:
+                seasons[record_year] = load_prediction_season(record_year)
+            pairs = [(records[i]["teamA"], records[i]["teamB"], records[i].get("homeTeam")) for i in indices]
+            predictions = predict_many(pairs, record_year, artifacts, season=seasons[record_year])
+            for i, prediction in zip(indices, predictions.itertuples(index=False)):
+                results[i] = {
+                    **records[i],
+                    "higherSeedTeam": None if pd.isna(prediction.higherSeedTeam) else prediction.higherSeedTeam,
+                    "lowerSeedTeam": None if pd.isna(prediction.lowerSeedTeam) else prediction.lowerSeedTeam,
+                    "upset_prob": None if np.isnan(prediction.upset_prob) else round(float(prediction.upset_prob), 6),
+                }
+                if not pd.isna(prediction.error):
+                    results[i]["error"] = prediction.error
+
+        with pipelineTrace.stage("write_predictions", "write-json", rows=len(results)) as stage:
+            # a stray NaN would make the line invalid JSON, so fail instead of writing it
+            lines = "".join(json.dumps(result, allow_nan=False) + "\n" for result in results)
+            output_file.write(lines)
+            stage.wrote(len(lines))
+
+    count = 0
+    records = []
+    for line in input_file:
+        line = line.strip()
+        if not line:
+            continue
+        records.append(json.loads(line))
+        if len(records) >= chunkSize:
+            flush(records)
+            count += len(records)
+            records = []
+    if records:
+        flush(records)
+        count += len(records)
 
-    game_rows = build_matchup_rows([synthetic_matchup], team_stats, averages, ratingSegment, numBuckets=0)
-    if len(game_rows) == 0:
-        raise ValueError("Game could not be featurized (likely outside rating segment or missing inputs).")
+    return count
 
-    game_df = pd.DataFrame(game_rows)
-    X_game = game_df[colsToKeep]
-    X_game_scaled = pd.DataFrame(
-        scaler.transform(X_game),
-        columns=X_game.columns,
-        index=X_game.index
-    )
 
-    upset_prob = float(model.predict_proba(X_game_scaled)[0][1])
-    print(
-        f"Upset probability ({lowerSeedTeam} over {higherSeedTeam}) in {year}: {upset_prob:.4f}"
-    )
-    return upset_prob
+def segment_to_json(ratingSegment):
+    """[low, high] with an open end as None, since JSON (and the frontend's parser) has no Infinity."""
+    return [None if np.isinf(bound) else float(bound) for bound in ratingSegment]
 
+def segment_from_json(bounds):
+    return [-np.inf if bounds[0] is None else bounds[0], np.inf if bounds[1] is None else bounds[1]]
 
 def write_upset_data_from_matchups(
     year=2026,
@@ -402,50 +672,47 @@ def write_upset_data_from_matchups(
     with open(matchups_path, "r", encoding="utf-8") as f:
         regions = json.load(f)
 
-    # Run both model variants for consistency with existing workflow.
-    buildAndRunModel(ratingSegment, BASE_COLS, 0)
-    buildAndRunModel(ratingSegment, ADVANCED_COLS, 0)
-
     base_artifacts = train_model_artifacts(ratingSegment, BASE_COLS, numBuckets=0)
     advanced_artifacts = train_model_artifacts(ratingSegment, ADVANCED_COLS, numBuckets=0)
 
-    matchup_map = {}
+    # Report both model variants for consistency with existing workflow.
+    buildAndRunModel(ratingSegment, BASE_COLS, 0, artifacts=base_artifacts)
+    buildAndRunModel(ratingSegment, ADVANCED_COLS, 0, artifacts=advanced_artifacts)
+
+    pairs = []
     for region_matchups in regions.values():
         for matchup in region_matchups:
             teams = matchup.split("_", 1)
             if len(teams) != 2:
                 raise ValueError(f"Invalid matchup format: {matchup}")
+            pairs.append((matchup, *teams))
+
+    season = load_prediction_season(year)
+    team_pairs = [(team_a, team_b) for _, team_a, team_b in pairs]
+    base_probs = predict_many(team_pairs, year, base_artifacts, season=season)
+    advanced_probs = predict_many(team_pairs, year, advanced_artifacts, season=season)
+    for predictions in (base_probs, advanced_probs):
+        failed = predictions[predictions["error"].notna()]
+        if len(failed):
+            raise ValueError(failed["error"].iloc[0])
 
-            team_a, team_b = teams
-            base_prob = _predict_game_upset_prob_from_artifacts(
-                team_a,
-                team_b,
-                year,
-                base_artifacts,
-                BASE_COLS,
-                ratingSegment,
-            )
-            advanced_prob = _predict_game_upset_prob_from_artifacts(
-                team_a,
-                team_b,
-                year,
-                advanced_artifacts,
-                ADVANCED_COLS,
-                ratingSegment,
-            )
-
-            matchup_map[matchup] = {
-                "upset": round((base_prob + advanced_prob) / 2.0, 2)
-            }
+    matchup_map = {}
+    for (matchup, _, _), base_prob, advanced_prob in zip(pairs, base_probs["upset_prob"], advanced_probs["upset_prob"]):
+        matchup_map[matchup] = {
+            "upset": round((base_prob + advanced_prob) / 2.0, 2)
+        }
 
     upset_data = {
         "columns": ["Rebounding", "Turnovers", "3Pt Volume", "Dawg 3P%", "Dawg Pace"],
         "matchups": matchup_map,
         "regions": regions,
+        "ratingSegment": segment_to_json(ratingSegment),
     }
 
-    with open(output_path, "w", encoding="utf-8") as f:
-        json.dump(upset_data, f, indent=2)
+    with pipelineTrace.stage("write_upset_data", "write-json", rows=len(matchup_map)) as stage:
+        with open(output_path, "w", encoding="utf-8") as f:
+            json.dump(upset_data, f, indent=2)
+        stage.wrote(pipelineTrace.file_size(output_path))
 
     return upset_data
 
@@ -455,14 +722,15 @@ RANK_DIFF_MIN = 8
 RANK_DIFF_MAX = 24
 TEAM_ONE = "Michigan"
 TEAM_TWO = "UC San Diego"
-#'''
-# Sort by upset probability (descending) to see top upset picks
-#baseResults = buildAndRunModel([RANK_DIFF_MIN,RANK_DIFF_MAX], BASE_COLS, 0)
-#baseResults.to_json("v2outputs/13to26lr_base.json", orient="records", indent=2)
-#print('BASED: ')
-#base_prob = predict_game_upset_prob(TEAM_ONE, TEAM_TWO, 2025, [RANK_DIFF_MIN, RANK_DIFF_MAX], BASE_COLS)
-
-advancedResults = buildAndRunModel([RANK_DIFF_MIN,RANK_DIFF_MAX], ADVANCED_COLS, 0)
-advancedResults.to_json("v2outputs/13to26lr_Rs3PLoThreeTo.json", orient="records", indent=2)
-#print('ADVANCED: ')
-#advanced_prob = predict_game_upset_prob(TEAM_ONE, TEAM_TWO, 2025, [RANK_DIFF_MIN, RANK_DIFF_MAX], ADVANCED_COLS)
\ No newline at end of file
+
+def main(argv=None):
+    """`python model.py` trains the advanced model; every other subcommand lives in cli.py."""
+    import sys
+
+    import cli
+
+    argv = sys.argv[1:] if argv is None else argv
+    cli.main(argv or ["train"])
+
+if __name__ == "__main__":
+    main()
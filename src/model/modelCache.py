@@ -0,0 +1,77 @@
+import hashlib
+import json
+import os
+import pickle
+from pathlib import Path
+
+import compactScorer
+import pipelineTrace
+
+CACHE_DIR = Path(__file__).resolve().parent / "modelCache"
+# bump when the featurizer or artifact layout changes so old pickles are ignored
+CACHE_VERSION = 2
+
+def content_hash(paths):
+    """Hash the bytes of every file in paths (missing files hash as empty)."""
+    digest = hashlib.blake2b(digest_size=16)
+    with pipelineTrace.stage("content_hash", "load", rows=len(paths)) as stage:
+        for path in paths:
+            digest.update(str(path).encode("utf-8"))
+            digest.update(b"\0")
+            if os.path.exists(path):
+                with open(path, "rb") as f:
+                    data = f.read()
+                digest.update(data)
+                stage.read(len(data))
+            digest.update(b"\0")
+    return digest.hexdigest()
+
+def artifact_key(params, input_paths):
+    """Cache key for a trained model: the training params plus the content of its inputs."""
+    payload = json.dumps({"version": CACHE_VERSION, "params": params}, sort_keys=True, default=str)
+    digest = hashlib.blake2b(payload.encode("utf-8"), digest_size=16)
+    digest.update(content_hash(input_paths).encode("utf-8"))
+    return digest.hexdigest()
+
+def load_artifacts(key):
+    """Return the cached artifacts for key, or None if nothing usable is cached."""
+    cache_file = CACHE_DIR / f"{key}.pkl"
+    if not cache_file.exists():
+        return None
+
+    try:
+        with pipelineTrace.stage("load_artifacts", "load") as stage, open(cache_file, "rb") as f:
+            stage.read(pipelineTrace.file_size(cache_file))
+            return pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError) as e:
+        print(f"Ignoring unreadable model cache {cache_file}: {e}")
+        return None
+
+def save_artifacts(key, artifacts):
+    CACHE_DIR.mkdir(exist_ok=True)
+    cache_file = CACHE_DIR / f"{key}.pkl"
+    tmp_file = cache_file.with_suffix(".tmp")
+    with open(tmp_file, "wb") as f:
+        pickle.dump(artifacts, f, protocol=pickle.HIGHEST_PROTOCOL)
+    # atomic so an interrupted run never leaves a half-written artifact behind
+    os.replace(tmp_file, cache_file)
+
+    # numpy-only copy, so cached predictions don't need to unpickle (and import) sklearn
+    compact_file = CACHE_DIR / f"{key}.npz"
+    compactScorer.export_compact(artifacts, compact_file.with_suffix(".tmp.npz"))
+    os.replace(compact_file.with_suffix(".tmp.npz"), compact_file)
+    return cache_file
+
+def load_compact(key):
+    """Return the cached CompactScorer for key, or None if there isn't one."""
+    compact_file = CACHE_DIR / f"{key}.npz"
+    if not compact_file.exists():
+        return None
+
+    try:
+        with pipelineTrace.stage("load_compact", "load") as stage:
+            stage.read(pipelineTrace.file_size(compact_file))
+            return compactScorer.CompactScorer.load(compact_file)
+    except (OSError, KeyError, ValueError) as e:
+        print(f"Ignoring unreadable compact model cache {compact_file}: {e}")
+        return None
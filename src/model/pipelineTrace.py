@@ -0,0 +1,186 @@
+"""
+Stage-level timing and memory instrumentation for the pipeline.
+
+Nothing is recorded unless MADNESS_TRACE is set. When it is, every stage wrapped in
+stage() or traced() appends one event per run to a JSONL trace: MADNESS_TRACE itself,
+or traces/trace-{time}.jsonl when it is just "1". The event records the stage's wall
+time and whatever the stage reports about itself: rows processed, bytes read and
+written. The tracemalloc peak is recorded too, unless MADNESS_TRACE_MEMORY=0 (tracing
+allocations slows allocation-heavy stages down).
+
+Each line is a Chrome trace "complete" event (ph "X", microsecond ts/dur, pid/tid),
+and worker processes append to the same file. So a run's trace can be summarized here
+or converted and opened in chrome://tracing or Perfetto:
+
+    MADNESS_TRACE=trace.jsonl python cli.py train --cols advanced
+    python pipelineTrace.py trace.jsonl
+    python pipelineTrace.py trace.jsonl --chrome trace.json
+
+Categories: load, featurize, fit, calibrate, score, parse-html, write-json.
+Memory peaks of stages that run threads (season preloads) include the other threads'
+allocations.
+"""
+import argparse
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+TRACE_DIR = Path(__file__).resolve().parent / "traces"
+
+def _trace_path():
+    setting = os.environ.get("MADNESS_TRACE", "")
+    if setting in ("", "0"):
+        return None
+    if setting == "1":
+        # resolve once and export it, so worker processes append to the same file
+        setting = str(TRACE_DIR / f"trace-{time.strftime('%Y%m%d-%H%M%S')}.jsonl")
+        os.environ["MADNESS_TRACE"] = setting
+    return Path(setting)
+
+TRACE_PATH = _trace_path()
+TRACE_MEMORY = os.environ.get("MADNESS_TRACE_MEMORY", "1") != "0"
+_local = threading.local()
+
+class Stage:
+    """What a running stage knows about its work; the with block fills these in."""
+
+    def __init__(self, rows=None, **args):
+        self.rows = rows
+        self.bytes_read = None
+        self.bytes_written = None
+        self.args = args
+        self.peak = 0
+
+    def read(self, nbytes):
+        self.bytes_read = (self.bytes_read or 0) + nbytes
+
+    def wrote(self, nbytes):
+        self.bytes_written = (self.bytes_written or 0) + nbytes
+
+def enabled():
+    return TRACE_PATH is not None
+
+def file_size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+def _write_event(event):
+    TRACE_PATH.parent.mkdir(parents=True, exist_ok=True)
+    line = (json.dumps(event) + "\n").encode("utf-8")
+    # one O_APPEND write per event, so processes writing the same trace don't interleave
+    fd = os.open(TRACE_PATH, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, line)
+    finally:
+        os.close(fd)
+
+@contextlib.contextmanager
+def stage(name, category, rows=None, **args):
+    """
+    Time the with block as one stage. Yields a Stage whose rows, read() and wrote() the
+    block can use to report its work; extra keyword args are recorded as they are.
+    """
+    record = Stage(rows, **args)
+    if TRACE_PATH is None:
+        yield record
+        return
+
+    import tracemalloc
+
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    if TRACE_MEMORY:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        current, peak = tracemalloc.get_traced_memory()
+        # the parent's peak so far survives the reset below
+        if stack:
+            stack[-1].peak = max(stack[-1].peak, peak)
+        tracemalloc.reset_peak()
+        start_memory = current
+    stack.append(record)
+
+    start = time.time()
+    try:
+        yield record
+    finally:
+        duration = time.time() - start
+        stack.pop()
+        event_args = {"rows": record.rows, "bytesRead": record.bytes_read, "bytesWritten": record.bytes_written}
+        if TRACE_MEMORY:
+            record.peak = max(record.peak, tracemalloc.get_traced_memory()[1])
+            event_args["peakBytes"] = record.peak - start_memory
+            if stack:
+                stack[-1].peak = max(stack[-1].peak, record.peak)
+        event_args.update(record.args)
+        _write_event({
+            "name": name,
+            "cat": category,
+            "ph": "X",
+            "ts": round(start * 1e6),
+            "dur": round(duration * 1e6),
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+            "args": {key: value for key, value in event_args.items() if value is not None},
+        })
+
+def traced(category, name=None):
+    """Decorator form of stage() for a whole function (no rows or bytes)."""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if TRACE_PATH is None:
+                return func(*args, **kwargs)
+            with stage(name or func.__name__, category):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+def read_trace(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def summarize(events):
+    """Totals per (category, stage), slowest first."""
+    totals = {}
+    for event in events:
+        key = (event["cat"], event["name"])
+        row = totals.setdefault(key, {"category": key[0], "stage": key[1], "calls": 0, "seconds": 0.0,
+            "rows": 0, "bytesRead": 0, "bytesWritten": 0, "peakBytes": 0})
+        row["calls"] += 1
+        row["seconds"] += event["dur"] / 1e6
+        for field in ("rows", "bytesRead", "bytesWritten"):
+            row[field] += event["args"].get(field, 0)
+        row["peakBytes"] = max(row["peakBytes"], event["args"].get("peakBytes", 0))
+    return sorted(totals.values(), key=lambda row: -row["seconds"])
+
+def write_chrome_trace(events, path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Summarize a MADNESS_TRACE trace by stage.")
+    parser.add_argument("trace", help="JSONL trace written with MADNESS_TRACE set")
+    parser.add_argument("--chrome", default=None, help="also write it as a Chrome trace JSON file")
+    parser.add_argument("--top", type=int, default=30)
+    args = parser.parse_args(argv)
+
+    events = read_trace(args.trace)
+    print(f"{'Category':<11} {'Stage':<34} {'Calls':>6} {'Seconds':>9} {'Rows':>10} {'MB read':>8} {'MB written':>10} {'Peak MB':>8}")
+    for row in summarize(events)[:args.top]:
+        print(f"{row['category']:<11} {row['stage']:<34} {row['calls']:>6} {row['seconds']:>9.3f} {row['rows']:>10} "
+            f"{row['bytesRead'] / 2**20:>8.1f} {row['bytesWritten'] / 2**20:>10.1f} {row['peakBytes'] / 2**20:>8.1f}")
+
+    if args.chrome:
+        write_chrome_trace(events, args.chrome)
+        print(f"Chrome trace written to {args.chrome}")
+
+if __name__ == "__main__":
+    main()
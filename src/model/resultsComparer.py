@@ -1,4 +1,11 @@
 import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# key that lines up the same game across result files; game numbers repeat meetings
+GAME_KEY = ["year", "hiTeam", "loTeam", "game"]
 
 def print_detailed_stats(enhancedFile, baseFile, upper_threshold=0.05):
     """
@@ -221,14 +228,16 @@ def test_enhanced_signal_symmetrically(enhancedFile, baseFile, bin_size=0.05, th
     
     print(f"\n{'='*90}\n")
 
-def test_enhanced_signal_asymmetrically(enhancedFile, baseFile, bin_size=0.05, threshold=0.05, year=0):
-    # Load both result files
-    with open(baseFile, 'r') as f:
-        base_results = json.load(f)
-    
-    with open(enhancedFile, 'r') as f:
-        enhanced_results = json.load(f)
+def asymmetric_signal_summary(base_results, enhanced_results, bin_size=0.05, threshold=0.05, year=0):
+    """
+    Bin games by base model probability and, for the games where the enhanced model is
+    at least threshold (relative) more upset-prone than base, compare the actual upset
+    rate with what each model guessed. Returns {'bins': [...], 'overall': {...} or None}.
     
+    Args:
+        base_results/enhanced_results: game records in the same order, each with
+            upset_prob, actual_upset and year (as written by buildAndRunModel)
+    """
     # Create bins from 0 to 0.5
     bins = {}
     max_prob = 0.35
@@ -272,17 +281,7 @@ def test_enhanced_signal_asymmetrically(enhancedFile, baseFile, bin_size=0.05, t
                     if actual_upset == 1:
                         bin_data['enhanced_higher']['upsets'] += 1
     
-    # Print results
-    year_str = f" for {year}" if year > 0 else ""
-    print(f"\n{'='*68}")
-    print(f"ENHANCED MODEL SIGNAL TEST {year_str}  (Bin Size: {bin_size*100:.0f}%, threshold: {threshold*100:.1f}%)")
-    print(f"{'='*68}\n")
-    print(f"{'Base Bin':<12} {'Enh>Base':<12} {'Rate':<10} {'Base Avg':<12} {'Enh Avg':<12} {'Enh Diff':<12} {'Diff':<8} {'Signal'}")
-    print(f"{'-'*68}")
-    
-    total_positive_signal_bins = 0
-    total_bins_with_data = 0
-    
+    summary_bins = []
     for bin_key, bin_data in sorted(bins.items()):
         higher = bin_data['enhanced_higher']
         base_averages = bin_data['base_average_prob']
@@ -290,29 +289,20 @@ def test_enhanced_signal_asymmetrically(enhancedFile, baseFile, bin_size=0.05, t
         if higher['total'] == 0:
             continue
         
-        total_bins_with_data += 1
-        
         # Calculate upset rates
         higher_rate = (higher['upsets'] / higher['total'])
         base_average_rate = (base_averages['sum_probs'] / base_averages['total'])
         enh_average_rate = (enh_averages['sum_probs'] / enh_averages['total'])
-        diff = higher_rate - base_average_rate
-        enh_diff = higher_rate - enh_average_rate
-        
-        # Check if enhanced provides positive signal
-        has_signal = '✓' if diff > 0 else '✗'
-        if diff > 0:
-            total_positive_signal_bins += 1
-        
-        higher_str = f"{higher['total']}"
-        higher_rate_str = f"{higher_rate*100:>6.1f}%"
-        diff_str = f"{diff*100:>+6.1f}%"
-        enh_diff_str = f"{enh_diff*100:>+6.1f}%"
-        
-        print(f"{bin_key:<12} {higher_str:<10} {higher_rate_str:<8} "
-              f"{base_average_rate*100:>12f}% {enh_average_rate*100:>12f}% {enh_diff_str:<12} {diff_str:<12} {has_signal}")
-    
-    print(f"{'-'*68}")
+        summary_bins.append({
+            'bin': bin_key,
+            'games': higher['total'],
+            'upsets': higher['upsets'],
+            'upsetRate': higher_rate,
+            'baseAverage': base_average_rate,
+            'enhAverage': enh_average_rate,
+            'diff': higher_rate - base_average_rate,
+            'enhDiff': higher_rate - enh_average_rate,
+        })
     
     # Overall weighted difference
     total_higher_upsets = 0
@@ -325,22 +315,190 @@ def test_enhanced_signal_asymmetrically(enhancedFile, baseFile, bin_size=0.05, t
         total_higher_games += bin_data['enhanced_higher']['total']
         total_base_probs += bin_data['base_average_prob']['sum_probs']
         total_enh_probs += bin_data['enh_average_prob']['sum_probs']
-        
+    
+    overall = None
     if total_higher_games > 0:
         overall_higher_rate = total_higher_upsets / total_higher_games
         overall_base_rate = total_base_probs / total_higher_games
         overall_enh_rate = total_enh_probs / total_higher_games
-        overall_diff = overall_higher_rate - overall_base_rate
-        overall_enh_diff = overall_enh_rate - overall_higher_rate
+        overall = {
+            'games': total_higher_games,
+            'upsets': total_higher_upsets,
+            'upsetRate': overall_higher_rate,
+            'baseRate': overall_base_rate,
+            'enhRate': overall_enh_rate,
+            'baseProbSum': total_base_probs,
+            'enhProbSum': total_enh_probs,
+            'diff': overall_higher_rate - overall_base_rate,
+            'enhDiff': overall_enh_rate - overall_higher_rate,
+            'positiveBins': sum(1 for b in summary_bins if b['diff'] > 0),
+            'binsWithData': len(summary_bins),
+        }
+    
+    return {'bins': summary_bins, 'overall': overall}
+
+def test_enhanced_signal_asymmetrically(enhancedFile, baseFile, bin_size=0.05, threshold=0.05, year=0):
+    # Load both result files
+    with open(baseFile, 'r') as f:
+        base_results = json.load(f)
+    
+    with open(enhancedFile, 'r') as f:
+        enhanced_results = json.load(f)
+    
+    summary = asymmetric_signal_summary(base_results, enhanced_results, bin_size, threshold, year)
+    
+    # Print results
+    year_str = f" for {year}" if year > 0 else ""
+    print(f"\n{'='*68}")
+    print(f"ENHANCED MODEL SIGNAL TEST {year_str}  (Bin Size: {bin_size*100:.0f}%, threshold: {threshold*100:.1f}%)")
+    print(f"{'='*68}\n")
+    print(f"{'Base Bin':<12} {'Enh>Base':<12} {'Rate':<10} {'Base Avg':<12} {'Enh Avg':<12} {'Enh Diff':<12} {'Diff':<8} {'Signal'}")
+    print(f"{'-'*68}")
+    
+    for bin_summary in summary['bins']:
+        # Check if enhanced provides positive signal
+        has_signal = '✓' if bin_summary['diff'] > 0 else '✗'
         
+        higher_str = f"{bin_summary['games']}"
+        higher_rate_str = f"{bin_summary['upsetRate']*100:>6.1f}%"
+        diff_str = f"{bin_summary['diff']*100:>+6.1f}%"
+        enh_diff_str = f"{bin_summary['enhDiff']*100:>+6.1f}%"
+        
+        print(f"{bin_summary['bin']:<12} {higher_str:<10} {higher_rate_str:<8} "
+              f"{bin_summary['baseAverage']*100:>12f}% {bin_summary['enhAverage']*100:>12f}% {enh_diff_str:<12} {diff_str:<12} {has_signal}")
+    
+    print(f"{'-'*68}")
+    
+    overall = summary['overall']
+    if overall is not None:
         print(f"\nOVERALL (across all bins):")
-        print(f"  When enhanced > base: {overall_higher_rate*100:.2f}% upset rate ({total_higher_upsets}/{total_higher_games})")
-        print(f"  Avg based guessed rate: {overall_base_rate*100:.2f}% upset rate ({round(total_base_probs)}/{total_higher_games})")
-        print(f"  Avg enhanced guessed rate: {overall_enh_rate*100:.2f}% upset rate ({round(total_enh_probs)}/{total_higher_games})")
-        print(f"  Difference: {overall_diff*100:+.2f} percentage points")
-        print(f"  Enhanced Difference: {overall_enh_diff*100:+.2f} percentage points")
+        print(f"  When enhanced > base: {overall['upsetRate']*100:.2f}% upset rate ({overall['upsets']}/{overall['games']})")
+        print(f"  Avg based guessed rate: {overall['baseRate']*100:.2f}% upset rate ({round(overall['baseProbSum'])}/{overall['games']})")
+        print(f"  Avg enhanced guessed rate: {overall['enhRate']*100:.2f}% upset rate ({round(overall['enhProbSum'])}/{overall['games']})")
+        print(f"  Difference: {overall['diff']*100:+.2f} percentage points")
+        print(f"  Enhanced Difference: {overall['enhDiff']*100:+.2f} percentage points")
         
 
+def load_outputs(files):
+    """
+    Line up any number of result files (name -> path, as written by buildAndRunModel)
+    by GAME_KEY, where game counts repeat meetings of the same teams within a season in
+    file order. Returns one row per game found in every file, in the first file's order,
+    with actual_upset, is_postseason, rating_diff and each file's upset_prob under its name.
+    """
+    games = None
+    for name, path in files.items():
+        with open(path, 'r') as f:
+            frame = pd.DataFrame(json.load(f)).rename(columns={'higher_seed': 'hiTeam', 'lower_seed': 'loTeam', 'upset_prob': name})
+        frame['game'] = frame.groupby(GAME_KEY[:-1]).cumcount()
+        if games is None:
+            games = frame[GAME_KEY + ['actual_upset', 'is_postseason', 'rating_diff', name]]
+        else:
+            games = games.merge(frame[GAME_KEY + [name]], on=GAME_KEY, how='inner')
+    return games
+
+def bin_edges(bin_size, max_prob=0.35):
+    """Bin edges built exactly like the signal tests' bins (float steps and all)."""
+    edges = [0]
+    current = 0
+    while current < max_prob:
+        current += bin_size
+        edges.append(current)
+    return np.array(edges, dtype=np.float64)
+
+def signal_grid(games, base, models=None, bin_sizes=(0.05,), thresholds=(0.05,), years=(0,), max_prob=0.35):
+    """
+    The signal test for every model against base over a grid of bin sizes, thresholds and
+    years (0 = every season), without a loop over games. Games are binned on the base
+    probability with np.digitize and counted per (threshold, year, bin) with one bincount
+    per model, bin size and side.
+
+    Returns a tidy DataFrame, one row per model/year/binSize/threshold/side/bin with games
+    in it, where side is "higher" (model >= base * (1 + threshold)) or "lower" (model <=
+    base * (1 - threshold)) and bin "all" is the total over bins. With side "higher" the
+    numbers match asymmetric_signal_summary's bins and overall.
+    """
+    probability_cols = [col for col in games.columns if col not in GAME_KEY + ['actual_upset', 'is_postseason', 'rating_diff']]
+    models = models or [col for col in probability_cols if col != base]
+    thresholds = np.asarray(thresholds, dtype=np.float64)
+    years = list(years)
+
+    base_prob = games[base].to_numpy(np.float64)
+    upsets = games['actual_upset'].to_numpy(np.float64)
+    # group 0 pools every season; specific seasons are counted on a second copy of the games
+    game_year = games['year'].to_numpy()
+    rows = np.arange(len(games))
+    group = np.zeros(len(games), dtype=np.int64)
+    group_of_year = {0: 0}
+    if any(years):
+        seasons = np.unique(game_year)
+        group_of_year.update({int(season): i + 1 for i, season in enumerate(seasons)})
+        rows = np.concatenate([rows, rows])
+        group = np.concatenate([group, np.searchsorted(seasons, game_year) + 1])
+    n_groups = len(group_of_year)
+    selected = [group_of_year.get(year) for year in years]
+
+    columns = {name: [] for name in ['model', 'year', 'binSize', 'threshold', 'side', 'bin', 'games', 'upsets', 'baseProbSum', 'modelProbSum']}
+    for bin_size in bin_sizes:
+        edges = bin_edges(bin_size, max_prob)
+        n_bins = len(edges) - 1
+        labels = np.array([f"{low:.2f}-{high:.2f}" for low, high in zip(edges[:-1], edges[1:])] + ['all'], dtype=object)
+        game_bin = np.digitize(base_prob, edges) - 1
+        counted = (base_prob != 0) & (game_bin >= 0) & (game_bin < n_bins)
+        cell = (group * n_bins + game_bin[rows])[counted[rows]]
+        cell_rows = rows[counted[rows]]
+        n_cells = len(thresholds) * n_groups * n_bins
+
+        for name in models:
+            prob = games[name].to_numpy(np.float64)
+            ratio = prob[cell_rows] / base_prob[cell_rows]
+
+            sums = {}
+            for side, picked in (('higher', ratio >= 1 + thresholds[:, None]), ('lower', ratio <= 1 - thresholds[:, None])):
+                threshold_idx, position = np.nonzero(picked)
+                index = threshold_idx * (n_groups * n_bins) + cell[position]
+                picked_rows = cell_rows[position]
+                side_sums = [
+                    np.bincount(index, weights=weights, minlength=n_cells).reshape(len(thresholds), n_groups, n_bins)
+                    for weights in (None, upsets[picked_rows], base_prob[picked_rows], prob[picked_rows])
+                ]
+                # totals over bins go in an extra "all" bin
+                sums[side] = [np.concatenate([values, values.sum(axis=2, keepdims=True)], axis=2) for values in side_sums]
+
+            for side, (games_count, upset_count, base_sum, model_sum) in sums.items():
+                for year, group_idx in zip(years, selected):
+                    if group_idx is None:
+                        continue
+                    size = len(thresholds) * (n_bins + 1)
+                    columns['model'].append(np.full(size, name, dtype=object))
+                    columns['year'].append(np.full(size, year))
+                    columns['binSize'].append(np.full(size, bin_size))
+                    columns['threshold'].append(np.repeat(thresholds, n_bins + 1))
+                    columns['side'].append(np.full(size, side, dtype=object))
+                    columns['bin'].append(np.tile(labels, len(thresholds)))
+                    columns['games'].append(games_count[:, group_idx].ravel().astype(np.int64))
+                    columns['upsets'].append(upset_count[:, group_idx].ravel().astype(np.int64))
+                    columns['baseProbSum'].append(base_sum[:, group_idx].ravel())
+                    columns['modelProbSum'].append(model_sum[:, group_idx].ravel())
+
+    grid = pd.DataFrame({name: np.concatenate(values) if values else [] for name, values in columns.items()})
+    grid.insert(1, 'base', base)
+    grid = grid[grid['games'] > 0].reset_index(drop=True)
+    grid['upsetRate'] = grid['upsets'] / grid['games']
+    grid['baseAverage'] = grid['baseProbSum'] / grid['games']
+    grid['modelAverage'] = grid['modelProbSum'] / grid['games']
+    grid['diff'] = grid['upsetRate'] - grid['baseAverage']
+    grid['modelDiff'] = grid['upsetRate'] - grid['modelAverage']
+    return grid
+
+def compare_grid(files, base, bin_sizes=(0.05,), thresholds=(0.05,), years=(0,), output_file=None):
+    """signal_grid over result files (name -> path) with every other file compared to base; optionally saved as CSV."""
+    grid = signal_grid(load_outputs(files), base, bin_sizes=bin_sizes, thresholds=thresholds, years=years)
+    if output_file:
+        Path(output_file).parent.mkdir(parents=True, exist_ok=True)
+        grid.to_csv(output_file, index=False)
+    return grid
+
 if __name__ == "__main__":
     test_enhanced_signal_asymmetrically(enhancedFile='v2outputs/13to26lr_Rs3PLoThreeTo.json', 
         baseFile='v2outputs/13to26lr_base.json', bin_size=0.05, threshold=0.06)#, year=2026)
\ No newline at end of file
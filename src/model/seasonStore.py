@@ -0,0 +1,180 @@
+"""
+One cached, typed loader for the per-season misc/fourFactors/averages/ratings files.
+
+Every season is read once (files are fetched concurrently on a thread pool), its stat
+columns are converted to numbers once, and the result is kept in an LRU cache bounded
+by memory. Entries are reloaded automatically when any of their source files change
+on disk, so writers (rankingExtractor, averageExtractor, ...) never leave stale data
+behind.
+"""
+import json
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+
+import pipelineTrace
+
+MODEL_DIR = Path(__file__).resolve().parent
+SOURCES = ("misc", "fourFactors", "averages", "ratings")
+TEXT_COLUMNS = ("team", "conf")
+# stats the model never uses, dropped from team_stats
+TEAM_STATS_IGNORED_COLS = ["conf", "Stl_pct", "Blk_pct", "2P_pct",
+    "eFG_pct_off", "eFG_pct_def", "FTRate_off", "2P_Dist"]
+
+class Season:
+    """Parsed data for one year. Any source file that does not exist is None."""
+
+    def __init__(self, year, misc, four_factors, averages, ratings, mtimes):
+        self.year = year
+        self.misc = misc
+        self.four_factors = four_factors
+        self.averages = averages
+        self.ratings = ratings
+        self.mtimes = mtimes
+        self.team_stats = build_team_stats(misc, four_factors)
+        self.nbytes = sum(
+            frame.memory_usage(deep=True).sum()
+            for frame in (misc, four_factors, ratings, self.team_stats)
+            if frame is not None
+        )
+
+def _numeric_frame(records):
+    df = pd.DataFrame(records)
+    for col in df.columns:
+        if col not in TEXT_COLUMNS:
+            df[col] = pd.to_numeric(df[col], errors="coerce")
+    return df
+
+def build_team_stats(misc, four_factors):
+    """Merged misc + four factors stats indexed by team, without the ignored columns."""
+    if misc is None or four_factors is None:
+        return None
+
+    df = misc.merge(four_factors, on="team", how="inner")
+    return df.set_index("team").drop(columns=TEAM_STATS_IGNORED_COLS, errors="ignore")
+
+class SeasonStore:
+    def __init__(self, base_dir=MODEL_DIR, max_bytes=256 * 1024 * 1024, max_workers=8):
+        self.base_dir = Path(base_dir)
+        self.max_bytes = max_bytes
+        self.max_workers = max_workers
+        self._seasons = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def source_paths(self, year):
+        return {source: self.base_dir / source / f"{year}.json" for source in SOURCES}
+
+    def _mtimes(self, year):
+        mtimes = {}
+        for source, path in self.source_paths(year).items():
+            try:
+                mtimes[source] = path.stat().st_mtime_ns
+            except FileNotFoundError:
+                mtimes[source] = None
+        return mtimes
+
+    def _pool(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="season-io")
+        return self._executor
+
+    @staticmethod
+    def _read_json(path):
+        if not os.path.exists(path):
+            return None
+        with open(path, "r") as f:
+            return json.load(f)
+
+    def _cached(self, year):
+        """The cached season if its files are unchanged since it was loaded, else None."""
+        with self._lock:
+            season = self._seasons.get(year)
+            if season is None:
+                return None
+            if season.mtimes != self._mtimes(year):
+                del self._seasons[year]
+                return None
+            self._seasons.move_to_end(year)
+            return season
+
+    def preload(self, years):
+        """Load every missing or stale season in years, reading all their files concurrently."""
+        years = [int(year) for year in years]
+        stale = [year for year in years if self._cached(year) is None]
+        if stale:
+            with pipelineTrace.stage("load_seasons", "load", rows=len(stale)) as stage:
+                mtimes = {year: self._mtimes(year) for year in stale}
+                futures = {
+                    (year, source): self._pool().submit(self._read_json, path)
+                    for year in stale
+                    for source, path in self.source_paths(year).items()
+                }
+                for year in stale:
+                    raw = {source: futures[(year, source)].result() for source in SOURCES}
+                    season = Season(
+                        year,
+                        _numeric_frame(raw["misc"]) if raw["misc"] is not None else None,
+                        _numeric_frame(raw["fourFactors"]) if raw["fourFactors"] is not None else None,
+                        raw["averages"],
+                        pd.DataFrame(raw["ratings"]).set_index("team") if raw["ratings"] is not None else None,
+                        mtimes[year],
+                    )
+                    self._store(season)
+                    stage.read(sum(pipelineTrace.file_size(path) for path in self.source_paths(year).values()))
+        return [self.season(year) for year in years]
+
+    def _store(self, season):
+        with self._lock:
+            self._seasons[season.year] = season
+            self._seasons.move_to_end(season.year)
+            # evict least recently used seasons, always keeping the newest one
+            while len(self._seasons) > 1 and sum(s.nbytes for s in self._seasons.values()) > self.max_bytes:
+                self._seasons.popitem(last=False)
+
+    def season(self, year):
+        year = int(year)
+        season = self._cached(year)
+        if season is None:
+            season = self.preload([year])[0]
+        return season
+
+    def invalidate(self, year=None):
+        with self._lock:
+            if year is None:
+                self._seasons.clear()
+            else:
+                self._seasons.pop(int(year), None)
+
+    def misc(self, year):
+        return self.season(year).misc
+
+    def four_factors(self, year):
+        return self.season(year).four_factors
+
+    def averages(self, year):
+        return self.season(year).averages
+
+    def ratings(self, year):
+        """Ratings indexed by team with netRating and rank columns (None if no ratings file)."""
+        return self.season(year).ratings
+
+    def team_stats(self, year):
+        return self.season(year).team_stats
+
+    def ratings_dict(self, year):
+        """{team: {'netRating': ..., 'rank': ...}}, empty if the season has no ratings file."""
+        ratings = self.ratings(year)
+        if ratings is None:
+            return {}
+        return {
+            team: {"netRating": net_rating, "rank": rank}
+            for team, net_rating, rank in zip(ratings.index, ratings["netRating"].tolist(), ratings["rank"].tolist())
+        }
+
+# shared instance every module reads through
+season_store = SeasonStore()
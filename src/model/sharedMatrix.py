@@ -0,0 +1,29 @@
+"""
+Share read-only numpy arrays with worker processes through .npy files.
+
+The parent publishes the arrays once into a (temp) directory and every worker attaches
+them with mmap_mode="r", so pool workers read the same page-cached bytes instead of each
+receiving a pickled copy.
+"""
+from pathlib import Path
+
+import numpy as np
+
+# arrays attached in this process (see attach_shared)
+shared = {}
+
+def publish(arrays, directory):
+    """Save arrays as .npy files in directory, returning {name: path} for attach."""
+    paths = {}
+    for name, values in arrays.items():
+        paths[name] = str(Path(directory) / f"{name}.npy")
+        np.save(paths[name], np.ascontiguousarray(values))
+    return paths
+
+def attach(paths):
+    """Open published arrays read-only without copying them into this process."""
+    return {name: np.load(path, mmap_mode="r") for name, path in paths.items()}
+
+def attach_shared(paths):
+    """Pool initializer: attach the published arrays into the module level shared dict."""
+    shared.update(attach(paths))
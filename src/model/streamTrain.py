@@ -0,0 +1,188 @@
+"""
+Out-of-core training over every season with inputs (1997 onward).
+
+Instead of concatenating every season into one DataFrame (prepare_model_dataframe), the
+seasons are streamed one at a time from the per-season feature cache and cut into
+shuffled minibatches, so memory stays at roughly one season no matter how many years
+are used. Training takes three passes:
+
+1. A StandardScaler fit with running statistics (partial_fit).
+2. A logistic model (SGDClassifier with log loss) updated one minibatch at a time over
+   a few epochs. The seasons are visited in a different order every epoch.
+3. Isotonic calibration on a held-out stream of every calibration_every-th game. The
+   decision values go into a fixed histogram, so this pass is constant memory as well.
+
+The result is written as a compact artifact (see compactScorer), so it scores through
+the same path as cached models. Games after SPLIT_YEAR are streamed once more for the
+holdout Brier score and log loss.
+
+    python streamTrain.py --cols advanced --first-year 1997 --epochs 5
+"""
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+
+import compactScorer
+import matchupStore
+import model
+import pipelineTrace
+from seasonStore import season_store
+
+OUTPUT_DIR = Path(__file__).resolve().parent / "streamModels"
+# calibration histogram over the logistic decision value (log odds)
+DECISION_RANGE = 15.0
+DECISION_BINS = 3000
+
+def season_games(year, ratingSegment, colsToKeep):
+    """One season's (X, y) for the segment, with the same rows prepare_model_dataframe keeps."""
+    entry = model.season_features(season_store.season(year))
+    frame = model.frame_from_features(entry, ratingSegment, 0, colsToKeep)
+    frame = frame[entry.arrays["complete"][frame.index]]
+    X = frame[colsToKeep].to_numpy(np.float64)
+    keep = ~np.isnan(X).any(axis=1)
+    return X[keep], frame["upset"].to_numpy()[keep]
+
+def stream_batches(years, ratingSegment, colsToKeep, batch_size, stream="train", calibration_every=5, rng=None):
+    """
+    Yield (X, y) minibatches season by season. stream is "train" or "calibration" (a
+    deterministic split of every calibration_every-th game) or "all". With rng, the
+    seasons and each season's games are shuffled.
+    """
+    years = list(years)
+    if rng is not None:
+        years = [years[i] for i in rng.permutation(len(years))]
+
+    for year in years:
+        X, y = season_games(year, ratingSegment, colsToKeep)
+        if stream != "all":
+            held_out = np.arange(len(y)) % calibration_every == calibration_every - 1
+            rows = np.flatnonzero(held_out if stream == "calibration" else ~held_out)
+            X, y = X[rows], y[rows]
+        order = rng.permutation(len(y)) if rng is not None else np.arange(len(y))
+        for start in range(0, len(y), batch_size):
+            batch = order[start:start + batch_size]
+            yield X[batch], y[batch]
+
+def calibration_histogram(decision, y, counts, positives):
+    """Accumulate held-out decision values into the fixed calibration histogram."""
+    bins = np.clip(((decision + DECISION_RANGE) / (2 * DECISION_RANGE) * DECISION_BINS).astype(np.int64), 0, DECISION_BINS - 1)
+    counts += np.bincount(bins, minlength=DECISION_BINS)
+    positives += np.bincount(bins, weights=y, minlength=DECISION_BINS)
+
+def train_streaming(
+    ratingSegment,
+    colsToKeep,
+    firstYear=None,
+    lastTrainYear=model.SPLIT_YEAR,
+    lastTestYear=model.END_YEAR,
+    epochs=5,
+    batch_size=2048,
+    alpha=1e-4,
+    calibration_every=5,
+    seed=0,
+    output_path=None,
+):
+    """Train on every season from firstYear (default: the first with inputs) through lastTrainYear."""
+    from sklearn.isotonic import IsotonicRegression
+    from sklearn.linear_model import SGDClassifier
+    from sklearn.preprocessing import StandardScaler
+
+    available = matchupStore.available_years()
+    firstYear = firstYear or available[0]
+    train_years = [year for year in available if firstYear <= year <= lastTrainYear]
+    test_years = [year for year in available if lastTrainYear < year <= lastTestYear]
+    print(f"Streaming {len(train_years)} training seasons ({train_years[0]}-{train_years[-1]}), "
+        f"testing on {test_years[0]}-{test_years[-1]}")
+    start = time.time()
+
+    scaler = StandardScaler()
+    games = 0
+    with pipelineTrace.stage("scaler_partial_fit", "fit") as stage:
+        for X, y in stream_batches(train_years, ratingSegment, colsToKeep, batch_size, "train", calibration_every):
+            scaler.partial_fit(X)
+            games += len(y)
+        stage.rows = games
+    print(f"Scaler fit on {games} games ({time.time() - start:.1f}s)")
+
+    rng = np.random.default_rng(seed)
+    sgd = SGDClassifier(loss="log_loss", penalty="l2", alpha=alpha, random_state=seed)
+    for epoch in range(epochs):
+        with pipelineTrace.stage("sgd_epoch", "fit", rows=games, epoch=epoch + 1):
+            for X, y in stream_batches(train_years, ratingSegment, colsToKeep, batch_size, "train", calibration_every, rng):
+                sgd.partial_fit(scaler.transform(X), y, classes=[0, 1])
+        print(f"Epoch {epoch + 1}/{epochs} ({time.time() - start:.1f}s)")
+
+    counts = np.zeros(DECISION_BINS)
+    positives = np.zeros(DECISION_BINS)
+    with pipelineTrace.stage("isotonic_calibration", "calibrate") as stage:
+        for X, y in stream_batches(train_years, ratingSegment, colsToKeep, batch_size, "calibration", calibration_every):
+            calibration_histogram(sgd.decision_function(scaler.transform(X)), y, counts, positives)
+        filled = counts > 0
+        centers = -DECISION_RANGE + (np.arange(DECISION_BINS) + 0.5) * (2 * DECISION_RANGE / DECISION_BINS)
+        isotonic = IsotonicRegression(out_of_bounds="clip", y_min=0, y_max=1)
+        isotonic.fit(centers[filled], positives[filled] / counts[filled], sample_weight=counts[filled])
+        stage.rows = int(counts.sum())
+    print(f"Calibrated on {int(counts.sum())} held-out games")
+
+    output_path = Path(output_path) if output_path else OUTPUT_DIR / f"{'_'.join(colsToKeep)}_{firstYear}to{lastTrainYear}.npz"
+    scorer = compactScorer.write_compact({
+        "columns": np.array(colsToKeep, dtype=str),
+        "rating_segment": np.array(ratingSegment, dtype=np.float64),
+        "mean": scaler.mean_.astype(np.float64),
+        "scale": scaler.scale_.astype(np.float64),
+        # a single "fold" with its isotonic calibrator, in the layout compactScorer reads
+        "coef": sgd.coef_.astype(np.float64),
+        "intercept": sgd.intercept_.astype(np.float64),
+        "method": np.array("isotonic"),
+        "iso_x": isotonic.X_thresholds_.astype(np.float64),
+        "iso_y": isotonic.y_thresholds_.astype(np.float64),
+        "iso_offsets": np.array([0, len(isotonic.X_thresholds_)]),
+    }, output_path)
+
+    # holdout metrics, accumulated batch by batch
+    n, brier, log_loss = 0, 0.0, 0.0
+    with pipelineTrace.stage("holdout_score", "score") as stage:
+        for X, y in stream_batches(test_years, ratingSegment, colsToKeep, batch_size, "all"):
+            probs = scorer.predict(X)
+            clipped = np.clip(probs, 1e-15, 1 - 1e-15)
+            n += len(y)
+            brier += ((probs - y) ** 2).sum()
+            log_loss -= (y * np.log(clipped) + (1 - y) * np.log(1 - clipped)).sum()
+        stage.rows = n
+    print(f"\nHoldout ({len(test_years)} seasons, {n} games) Brier score: {brier / n:.4f}")
+    print(f"Log loss: {log_loss / n:.4f}")
+    print(f"Model written to {output_path} ({time.time() - start:.1f}s)")
+    return scorer
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train the upset model season by season in constant memory.")
+    parser.add_argument("--cols", choices=["base", "advanced"], default="advanced")
+    parser.add_argument("--segment", type=float, nargs=2, default=[model.RANK_DIFF_MIN, model.RANK_DIFF_MAX])
+    parser.add_argument("--first-year", type=int, default=None, help="first training season (default: the earliest with inputs)")
+    parser.add_argument("--last-train-year", type=int, default=model.SPLIT_YEAR)
+    parser.add_argument("--epochs", type=int, default=5)
+    parser.add_argument("--batch-size", type=int, default=2048)
+    parser.add_argument("--alpha", type=float, default=1e-4, help="L2 regularization strength")
+    parser.add_argument("--calibration-every", type=int, default=5, help="hold out every nth game for calibration")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="compact model path (default: streamModels/{cols}_{years}.npz)")
+    args = parser.parse_args(argv)
+
+    colsToKeep = model.BASE_COLS if args.cols == "base" else model.ADVANCED_COLS
+    train_streaming(
+        args.segment,
+        colsToKeep,
+        firstYear=args.first_year,
+        lastTrainYear=args.last_train_year,
+        epochs=args.epochs,
+        batch_size=args.batch_size,
+        alpha=args.alpha,
+        calibration_every=args.calibration_every,
+        seed=args.seed,
+        output_path=args.output
+    )
+
+if __name__ == "__main__":
+    main()
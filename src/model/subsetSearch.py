@@ -0,0 +1,241 @@
+"""
+Feature-subset search for the calibrated logistic model.
+
+Instead of a full run per hand-picked subset (the v2outputs/13to26lr_* files), the scaled
+design matrix for a whole candidate pool is built once from the feature cache, shared
+read-only with a process pool (see sharedMatrix), and candidate subsets are fit in
+parallel as column slices of it. Every subset is scored on the > SPLIT_YEAR holdout by
+Brier score and log loss, plus resultsComparer's asymmetric signal summary against the
+base model (BASE_COLS), and written to one ranked leaderboard.
+
+    python subsetSearch.py --method forward --max-size 6
+    python subsetSearch.py --method exhaustive --pool rating_diff rating_sum sum_3PA_pct 3P_pct_lo TO_freq OFF_LO --max-size 3
+"""
+import argparse
+import itertools
+import json
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+from sklearn.metrics import brier_score_loss, log_loss
+
+import model
+from resultsComparer import asymmetric_signal_summary
+from sharedMatrix import attach_shared, publish, shared
+
+OUTPUT_DIR = Path(__file__).resolve().parent / "subsetSearch"
+# prepare_model_dataframe columns that are never model inputs
+META_COLUMNS = ["upset", "hiTeam", "loTeam", "year", "is_postseason"]
+
+def candidate_columns(ratingSegment, numBuckets=0):
+    """Every model input prepare_model_dataframe can produce (stat features + rating columns)."""
+    df, _ = model.prepare_model_dataframe(ratingSegment, numBuckets)
+    return [col for col in df.columns if col not in META_COLUMNS]
+
+def evaluate_subset(col_ids, hyperparams):
+    """Fit one subset (column positions in the shared matrices) and return its holdout probabilities."""
+    start = time.time()
+    calibrated_lr = model.fit_calibrated_model(shared["X_train"][:, col_ids], shared["y_train"], hyperparams)
+    probs = calibrated_lr.predict_proba(shared["X_test"][:, col_ids])[:, 1]
+    return {
+        "brier": float(brier_score_loss(shared["y_test"], probs)),
+        "logLoss": float(log_loss(shared["y_test"], probs)),
+        "seconds": round(time.time() - start, 3),
+        "probs": probs.astype(np.float32),
+    }
+
+class SubsetEvaluator:
+    """Fits subsets on the pool, remembering every result so no subset is fit twice."""
+
+    def __init__(self, executor, columns, hyperparams):
+        self.executor = executor
+        self.columns = columns
+        self.col_ids = {col: i for i, col in enumerate(columns)}
+        self.hyperparams = hyperparams
+        self.results = {}
+
+    def key(self, subset):
+        return frozenset(subset)
+
+    def evaluate(self, subsets):
+        """Results for every subset (in order), fitting the new ones in parallel."""
+        subsets = [sorted(subset, key=self.col_ids.get) for subset in subsets]
+        todo = {}
+        for subset in subsets:
+            if self.key(subset) not in self.results and self.key(subset) not in todo:
+                ids = [self.col_ids[col] for col in subset]
+                todo[self.key(subset)] = (subset, self.executor.submit(evaluate_subset, ids, self.hyperparams))
+
+        for key, (subset, future) in todo.items():
+            self.results[key] = {"columns": subset, **future.result()}
+            print(f"  brier {self.results[key]['brier']:.5f} log loss {self.results[key]['logLoss']:.5f} {subset}")
+        return [self.results[self.key(subset)] for subset in subsets]
+
+def best(results):
+    return min(results, key=lambda result: (result["brier"], result["logLoss"]))
+
+def forward_selection(evaluator, pool, start, max_size):
+    """Greedily add the column that most improves Brier until nothing helps (or max_size)."""
+    current = best(evaluator.evaluate([start]))
+    while len(current["columns"]) < max_size:
+        remaining = [col for col in pool if col not in current["columns"]]
+        if not remaining:
+            break
+        print(f"Adding one of {len(remaining)} columns to {current['columns']}")
+        candidate = best(evaluator.evaluate([current["columns"] + [col] for col in remaining]))
+        if candidate["brier"] >= current["brier"]:
+            break
+        current = candidate
+    return current
+
+def backward_elimination(evaluator, pool, min_size):
+    """Start from the whole pool and greedily drop the column whose removal most improves Brier."""
+    current = best(evaluator.evaluate([list(pool)]))
+    while len(current["columns"]) > min_size:
+        print(f"Dropping one of {current['columns']}")
+        candidate = best(evaluator.evaluate([
+            [other for other in current["columns"] if other != col] for col in current["columns"]
+        ]))
+        if candidate["brier"] >= current["brier"]:
+            break
+        current = candidate
+    return current
+
+def exhaustive_search(evaluator, pool, max_size, required):
+    """Every subset of pool with up to max_size columns (always including required)."""
+    optional = [col for col in pool if col not in required]
+    subsets = [
+        list(required) + list(combo)
+        for size in range(max(0, 1 - len(required)), max_size - len(required) + 1)
+        for combo in itertools.combinations(optional, size)
+    ]
+    print(f"Fitting {len(subsets)} subsets")
+    return best(evaluator.evaluate(subsets))
+
+def summarize(evaluator, base_cols, y_test, years, bin_size, threshold):
+    """Leaderboard rows for every evaluated subset, ranked by Brier then log loss."""
+    base = evaluator.evaluate([base_cols])[0]
+    base_records = [
+        {"upset_prob": prob, "actual_upset": upset, "year": year}
+        for prob, upset, year in zip(base["probs"].tolist(), y_test.tolist(), years.tolist())
+    ]
+
+    board = []
+    for result in evaluator.results.values():
+        records = [
+            {"upset_prob": prob, "actual_upset": upset, "year": year}
+            for prob, upset, year in zip(result["probs"].tolist(), y_test.tolist(), years.tolist())
+        ]
+        board.append({
+            "columns": result["columns"],
+            "size": len(result["columns"]),
+            "brier": result["brier"],
+            "logLoss": result["logLoss"],
+            "signal": asymmetric_signal_summary(base_records, records, bin_size, threshold)["overall"],
+        })
+    return sorted(board, key=lambda row: (row["brier"], row["logLoss"]))
+
+def run_subset_search(
+    ratingSegment,
+    method="forward",
+    pool=None,
+    start=None,
+    max_size=None,
+    numBuckets=0,
+    hyperparams=None,
+    workers=None,
+    bin_size=0.05,
+    threshold=0.06,
+    name=None
+):
+    """
+    Search feature subsets of pool (default: every candidate column) and return the leaderboard,
+    also written to subsetSearch/{name}.json.
+    method: "forward" (from start, default BASE_COLS), "backward" (from the whole pool) or
+        "exhaustive" (every subset up to max_size that contains start, if given)
+    """
+    hyperparams = {**model.DEFAULT_HYPERPARAMS, **(hyperparams or {})}
+    pool = pool or candidate_columns(ratingSegment, numBuckets)
+    base_cols = list(model.BASE_COLS)
+    columns = pool + [col for col in base_cols + (start or []) if col not in pool]
+
+    data = model.training_data(ratingSegment, columns, numBuckets)
+    # StandardScaler scales each column on its own, so slicing the scaled pool is the
+    # same as scaling each subset separately
+    y_test = data["y_test"].to_numpy()
+    years = data["team_info"].loc[data["X_test"].index, "year"].to_numpy()
+
+    with tempfile.TemporaryDirectory(prefix="subsetSearch-") as shared_dir:
+        paths = publish({
+            "X_train": data["X_train_scaled"].to_numpy(np.float64),
+            "y_train": data["y_train"].to_numpy(),
+            "X_test": data["X_test_scaled"].to_numpy(np.float64),
+            "y_test": y_test,
+        }, shared_dir)
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=attach_shared, initargs=(paths,)) as executor:
+            evaluator = SubsetEvaluator(executor, columns, hyperparams)
+            if method == "forward":
+                winner = forward_selection(evaluator, pool, start or base_cols, max_size or len(pool))
+            elif method == "backward":
+                winner = backward_elimination(evaluator, pool, max(1, len(start or [])))
+            elif method == "exhaustive":
+                winner = exhaustive_search(evaluator, pool, max_size or 2, start or [])
+            else:
+                raise ValueError(f"Unknown subset search method: {method}")
+
+            board = summarize(evaluator, base_cols, y_test, years, bin_size, threshold)
+
+    name = name or f"{method}_{ratingSegment[0]}to{ratingSegment[1]}"
+    OUTPUT_DIR.mkdir(exist_ok=True)
+    output_file = OUTPUT_DIR / f"{name}.json"
+    with open(output_file, "w") as f:
+        json.dump({
+            "method": method,
+            "ratingSegment": list(ratingSegment),
+            "hyperparams": hyperparams,
+            "baseColumns": base_cols,
+            "best": winner["columns"],
+            "leaderboard": board,
+        }, f, indent=2)
+
+    print(f"\nBest subset ({method}): {winner['columns']}")
+    print(f"{'Brier':<9} {'LogLoss':<9} {'Enh>Base':<9} {'Rate':<8} {'Diff':<8} Columns")
+    for row in board[:15]:
+        signal = row["signal"]
+        signal_str = (f"{signal['games']:<9} {signal['upsetRate']*100:>6.1f}% {signal['diff']*100:>+6.1f}% "
+            if signal else f"{'-':<9} {'-':<8} {'-':<8} ")
+        print(f"{row['brier']:<9.5f} {row['logLoss']:<9.5f} {signal_str}{', '.join(row['columns'])}")
+    print(f"Leaderboard written to {output_file}")
+    return board
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Search feature subsets for the upset model.")
+    parser.add_argument("--method", choices=["forward", "backward", "exhaustive"], default="forward")
+    parser.add_argument("--pool", nargs="+", default=None, help="candidate columns (default: every feature)")
+    parser.add_argument("--start", nargs="+", default=None, help="forward: starting columns, exhaustive: required columns")
+    parser.add_argument("--max-size", type=int, default=None)
+    parser.add_argument("--segment", type=float, nargs=2, default=[model.RANK_DIFF_MIN, model.RANK_DIFF_MAX])
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: one per core)")
+    parser.add_argument("--bin-size", type=float, default=0.05)
+    parser.add_argument("--threshold", type=float, default=0.06)
+    parser.add_argument("--name", default=None, help="leaderboard file name")
+    args = parser.parse_args(argv)
+
+    run_subset_search(
+        args.segment,
+        method=args.method,
+        pool=args.pool,
+        start=args.start,
+        max_size=args.max_size,
+        workers=args.workers,
+        bin_size=args.bin_size,
+        threshold=args.threshold,
+        name=args.name
+    )
+
+if __name__ == "__main__":
+    main()
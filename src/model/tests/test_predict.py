@@ -0,0 +1,31 @@
+import io
+import json
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+import model
+
+def test_predict_jsonl_mixed_chunk_is_strict_json():
+    """A pair that scores and one that fails in the same chunk: both lines stay valid JSON with null, not NaN."""
+    artifacts = model.train_model_artifacts([model.RANK_DIFF_MIN, model.RANK_DIFF_MAX], model.BASE_COLS, numBuckets=0, compact=True)
+    input_file = io.StringIO(
+        json.dumps({"teamA": "Louisville", "teamB": "Creighton"}) + "\n"
+        + json.dumps({"teamA": "Duke", "teamB": "Nowhere State"}) + "\n"
+    )
+    output_file = io.StringIO()
+
+    assert model.predict_jsonl(input_file, output_file, artifacts, year=2026) == 2
+
+    def reject_constant(name):
+        raise ValueError(f"{name} is not valid JSON")
+
+    good, failed = [json.loads(line, parse_constant=reject_constant) for line in output_file.getvalue().splitlines()]
+    assert good["higherSeedTeam"] == "Louisville"
+    assert good["lowerSeedTeam"] == "Creighton"
+    assert 0 <= good["upset_prob"] <= 1
+    assert "error" not in good
+    assert failed["higherSeedTeam"] is None
+    assert failed["lowerSeedTeam"] is None
+    assert failed["upset_prob"] is None
+    assert failed["error"].startswith("Team stats missing")
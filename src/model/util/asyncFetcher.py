@@ -0,0 +1,331 @@
+"""
+Concurrent, rate-limited page fetching with parse-as-you-fetch.
+
+fetch_pages downloads a list of PageJobs with at most `concurrency` requests in flight,
+and a token bucket per host that allows `rate` requests per second (bursts of `burst`).
+Failed requests are retried: connection errors, timeouts, 429 and 5xx. The wait
+before each retry is a jittered exponential backoff, or the server's Retry-After.
+Requests go through the shared httpClient, over pooled keep-alive connections.
+Pages are written atomically, so an interrupted run leaves no partial files and a
+rerun resumes by skipping pages already on disk. Given a pageArchive.PageArchive,
+pages are read from and appended to it instead of the loose files (keyed by the
+output file's stem), and it is saved at the end. With refresh=True, saved pages are
+requested again conditionally instead. A page the server reports unchanged is
+neither rewritten nor handed to on_page, and is listed in the stats as "unchanged".
+
+Every other page, fetched or already on disk, goes through a queue to on_page(job, html).
+on_page runs in a worker thread, so parsing overlaps the network wait of the other
+requests. Its return values come back in the stats as "parsed".
+
+The replay command checks all of this offline. It serves the saved team pages from a
+local stand-in server, with optional latency and injected failures. It fetches them
+into a scratch directory, parsing as it goes, and checks the pages and the extracted
+stats against the saved ones:
+
+    python asyncFetcher.py replay --year 2026
+    python asyncFetcher.py replay --year 2026 --quads --latency 0.3 --fail-rate 0.2
+"""
+import argparse
+import asyncio
+import hashlib
+import http.client
+import os
+import random
+import sys
+import threading
+import time
+from pathlib import Path
+from urllib.parse import urlsplit
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+import httpClient
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+MAX_BACKOFF = 30.0
+
+class PageJob:
+    """One page to download: who it's for, where it comes from and where it is saved."""
+
+    def __init__(self, name, url, output_file, headers=None):
+        self.name = name
+        self.url = url
+        self.output_file = Path(output_file)
+        self.headers = headers or {}
+
+class TokenBucket:
+    """Allows rate acquires per second on average, and up to burst at once."""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.capacity = max(burst, 1)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+class RetryableError(Exception):
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+def http_get(job, client, archive=None):
+    """Blocking conditional GET of a job's page. Raises RetryableError for failures worth retrying."""
+    try:
+        if archive is None:
+            response = client.get(job.url, job.headers, body_file=job.output_file)
+        else:
+            # the archive keeps the body, so the client only needs the validators
+            response = client.get(job.url, job.headers, conditional=archive.has(job.output_file.stem), keep_body=False)
+    except (OSError, http.client.HTTPException) as e:
+        raise RetryableError(str(e) or type(e).__name__)
+    if response.status in RETRY_STATUSES:
+        retry_after = response.headers.get("Retry-After")
+        raise RetryableError(f"HTTP {response.status}", float(retry_after) if retry_after and retry_after.isdigit() else None)
+    response.raise_for_status()
+    return response
+
+def write_page(path, html):
+    """Write through a temp file, so an interrupted run never leaves a partial page behind."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + ".part")
+    tmp_path.write_text(html, encoding="utf-8")
+    os.replace(tmp_path, path)
+
+async def fetch_pages(jobs, on_page=None, rate=2.0, burst=2, concurrency=4, retries=4, backoff=1.0, refresh=False, client=None, archive=None):
+    """
+    Download every job whose output file doesn't exist yet (every job with refresh) and
+    hand every job's page that isn't unchanged to on_page. Returns stats: fetched/skipped
+    counts, unchanged job names, retries, bytes downloaded, the failed job names with
+    their errors, and on_page's results by job name.
+    """
+    client = client or httpClient.default_client()
+    buckets = {}
+    semaphore = asyncio.Semaphore(concurrency)
+    queue = asyncio.Queue(maxsize=concurrency * 2)
+    rng = random.Random()
+    stats = {"fetched": 0, "skipped": 0, "unchanged": [], "retries": 0, "bytes": 0, "failed": {}, "parsed": {}}
+
+    async def download(job):
+        bucket = buckets.setdefault(urlsplit(job.url).netloc, TokenBucket(rate, burst))
+        for attempt in range(retries + 1):
+            await bucket.acquire()
+            try:
+                return await asyncio.to_thread(http_get, job, client, archive)
+            except RetryableError as e:
+                if attempt == retries:
+                    raise
+                stats["retries"] += 1
+                # full jitter, so workers that failed together don't retry together
+                delay = e.retry_after if e.retry_after is not None else rng.uniform(0, min(MAX_BACKOFF, backoff * 2 ** attempt))
+                print(f"Retrying {job.name} in {delay:.1f}s ({e})")
+                await asyncio.sleep(delay)
+
+    def saved(job):
+        return archive.has(job.output_file.stem) if archive is not None else job.output_file.exists()
+
+    def read_saved(job):
+        if archive is not None:
+            return archive.get(job.output_file.stem)
+        return job.output_file.read_text(encoding="utf-8", errors="ignore")
+
+    def save(job, html):
+        if archive is not None:
+            archive.add(job.output_file.stem, html)
+        else:
+            write_page(job.output_file, html)
+
+    async def produce(job):
+        if saved(job) and not refresh:
+            stats["skipped"] += 1
+            if on_page is None:
+                return
+            html = await asyncio.to_thread(read_saved, job)
+        else:
+            async with semaphore:
+                try:
+                    response = await download(job)
+                except Exception as e:
+                    stats["failed"][job.name] = str(e)
+                    print(f"Error fetching page for {job.name}: {e}")
+                    return
+            if response.unchanged:
+                stats["unchanged"].append(job.name)
+                return
+            html = response.text
+            await asyncio.to_thread(save, job, html)
+            stats["fetched"] += 1
+            stats["bytes"] += len(html.encode("utf-8"))
+            print(f"Saved {job.name}" if archive is not None else f"Saved to {job.output_file}")
+        if on_page is not None:
+            await queue.put((job, html))
+
+    async def consume():
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            job, html = item
+            try:
+                stats["parsed"][job.name] = await asyncio.to_thread(on_page, job, html)
+            except Exception as e:
+                stats["failed"][job.name] = f"parse error: {e}"
+                print(f"Error parsing page for {job.name}: {e}")
+
+    consumer = asyncio.create_task(consume()) if on_page is not None else None
+    await asyncio.gather(*(produce(job) for job in jobs))
+    if consumer is not None:
+        await queue.put(None)
+        await consumer
+    if archive is not None:
+        archive.save()
+    return stats
+
+def run(jobs, client=None, **kwargs):
+    """fetch_pages from synchronous code."""
+    start = time.time()
+    client = client or httpClient.default_client()
+    stats = asyncio.run(fetch_pages(jobs, client=client, **kwargs))
+    print(f"Fetched {stats['fetched']} pages ({stats['bytes'] / 2**20:.1f} MB), skipped {stats['skipped']} already saved, "
+        f"{len(stats['unchanged'])} unchanged, {stats['retries']} retries, {len(stats['failed'])} failed ({time.time() - start:.1f}s)")
+    client.report()
+    return stats
+
+def serve_pages(routes, latency=0.0, fail_rate=0.0, seed=0):
+    """
+    Start a local stand-in server (in a daemon thread) that answers GET path?query with
+    the page bytes routes[path?query] after latency seconds, or with a 503 for a
+    fail_rate share of requests. Pages carry their content hash as ETag and matching
+    If-None-Match requests get a 304. Returns the server; see base_url(server).
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    rng = random.Random(seed)
+    rng_lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        # keep-alive, so the client's connection pooling is exercised too
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            time.sleep(latency)
+            with rng_lock:
+                fail = rng.random() < fail_rate
+            body = routes.get(self.path)
+            if fail or body is None:
+                self.send_response(503 if fail else 404)
+                if fail:
+                    self.send_header("Retry-After", "0")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def base_url(server):
+    return f"http://127.0.0.1:{server.server_address[1]}"
+
+def replay(year, quads=False, latency=0.1, fail_rate=0.0, rate=20.0, burst=4, concurrency=8, use_archive=False):
+    """
+    Fetch the saved team pages back through a local server (into loose files, or a
+    scratch archive with use_archive) and check pages and stats match, then refresh them
+    and check every page comes back unchanged.
+    """
+    import json
+    import tempfile
+
+    import kpFetcher
+    import pageArchive
+    import quadAndOvrExtractor
+
+    source = kpFetcher.page_source(quads)
+    saved = {team: html for team, html, _ in pageArchive.season_pages(source, year)}
+    with tempfile.TemporaryDirectory(prefix="replay-") as scratch:
+        jobs = [
+            job for job in kpFetcher.team_page_jobs(kpFetcher.top_team_names(kpFetcher.tournament_teams[year], year, True), year, Path(scratch), quads)
+            if job.output_file.stem in saved
+        ]
+        archive = None
+        if use_archive:
+            archive = pageArchive.PageArchive(source, year, base_dir=Path(scratch) / "pageArchive")
+            saved_archive = pageArchive.PageArchive(source, year)
+            archive.create({}, dictionary=saved_archive.dictionary if saved_archive.exists() else b"")
+        routes = {}
+        for job in jobs:
+            split = urlsplit(job.url)
+            routes[split.path + (f"?{split.query}" if split.query else "")] = saved[job.output_file.stem].encode("utf-8")
+        server = serve_pages(routes, latency=latency, fail_rate=fail_rate)
+        for job in jobs:
+            split = urlsplit(job.url)
+            job.url = base_url(server) + split.path + (f"?{split.query}" if split.query else "")
+
+        parse = quadAndOvrExtractor.parse_quad_page if quads else quadAndOvrExtractor.parse_kp_ovr_page
+        client = httpClient.HttpClient(cache_dir=Path(scratch) / "httpCache")
+        settings = {"rate": rate, "burst": burst, "concurrency": concurrency, "backoff": 0.1, "client": client, "archive": archive}
+        stats = run(jobs, on_page=lambda job, html: parse(html), **settings)
+        refreshed = run(jobs, on_page=lambda job, html: parse(html), refresh=True, **settings)
+        client.close()
+        server.shutdown()
+
+        def fetched_page(job):
+            if archive is not None:
+                return archive.get(job.output_file.stem) if archive.has(job.output_file.stem) else None
+            return job.output_file.read_text(encoding="utf-8") if job.output_file.exists() else None
+
+        mismatched = [job.name for job in jobs if fetched_page(job) not in (None, saved[job.output_file.stem])]
+        extracted = json.loads((Path(quadAndOvrExtractor.__file__).parent / f"{'quadStats' if quads else 'kpOvrStats'}{year}.json").read_text(encoding="utf-8"))
+        stat_mismatches = [
+            job.name for job in jobs
+            if job.name in stats["parsed"] and stats["parsed"][job.name] != extracted.get(job.output_file.stem.replace("_", " "))
+        ]
+    print(f"{len(jobs) - len(mismatched) - len(stats['failed'])}/{len(jobs)} pages identical, "
+        f"{len(stats['parsed']) - len(stat_mismatches)}/{len(stats['parsed'])} parsed stats match the saved extraction, "
+        f"{len(refreshed['unchanged'])}/{len(jobs)} unchanged on refresh")
+    return not mismatched and not stat_mismatches and not stats["failed"] and len(refreshed["unchanged"]) == len(jobs)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check the concurrent fetcher against a local server replaying the saved team pages.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    replay_parser = subparsers.add_parser("replay")
+    replay_parser.add_argument("--year", type=int, default=2026)
+    replay_parser.add_argument("--quads", action="store_true", help="bballnet quad pages instead of kenpom pages")
+    replay_parser.add_argument("--latency", type=float, default=0.1, help="seconds the server waits before each response")
+    replay_parser.add_argument("--fail-rate", type=float, default=0.0, help="share of requests answered with a 503")
+    replay_parser.add_argument("--rate", type=float, default=20.0)
+    replay_parser.add_argument("--concurrency", type=int, default=8)
+    replay_parser.add_argument("--archive", action="store_true", help="fetch into a page archive instead of loose files")
+    args = parser.parse_args(argv)
+
+    ok = replay(args.year, args.quads, args.latency, args.fail_rate, rate=args.rate, concurrency=args.concurrency, use_archive=args.archive)
+    if not ok:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
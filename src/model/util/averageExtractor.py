@@ -1,67 +1,39 @@
 import json
 import os
+import sys
 from pathlib import Path
 
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+import matchupStore
+import pipelineTrace
+from seasonStore import season_store
+
 HOME_COURT_ADVANTAGE = 4.29
 
 def count_upsets_by_year():
     """Count upsets for each year based on rating differentials >= 6."""
     base_path = Path(__file__).parent.parent
-    matchups_dir = base_path / 'matchups'
-    
-    # Get all years from matchups directory
-    years = sorted([f.stem for f in matchups_dir.glob('*.json')])
     
     upset_data = {}
     
-    for year in years:
-        matchups_file = matchups_dir / f'{year}.json'
-        
-        with open(matchups_file, 'r') as f:
-            matchups = json.load(f)
+    for year in matchupStore.available_years():
+        # Only games where an upset was possible (home-adjusted rating diff >= 6);
+        # games missing either rating are skipped by the store
+        matchups = matchupStore.read_matchups(
+            (year, year),
+            columns=["winningTeam", "loTeam"],
+            ratingDiff=(6, None),
+            homeCourtAdvantage=HOME_COURT_ADVANTAGE
+        )
         
-        upsets = 0
-        total_chances = 0
-        
-        for matchup in matchups:
-            # Get base ratings
-            higher_rating = matchup.get('higherRating')
-            lower_rating = matchup.get('lowerRating')
-            home_team = matchup.get('homeTeam')
-            higher_seed_team = matchup.get('higherSeedTeam')
-            winning_team = matchup.get('winningTeam')
-            lower_seed_team = matchup.get('lowerSeedTeam')
-            
-            # Skip if missing required data
-            if higher_rating is None or lower_rating is None:
-                continue
-            
-            # Apply home court advantage adjustments
-            adjusted_higher = higher_rating
-            adjusted_lower = lower_rating
-            
-            if home_team and home_team != "null" and home_team != "":
-                if higher_seed_team == home_team:
-                    adjusted_higher += HOME_COURT_ADVANTAGE
-                    adjusted_lower -= HOME_COURT_ADVANTAGE
-                else:
-                    adjusted_higher -= HOME_COURT_ADVANTAGE
-                    adjusted_lower += HOME_COURT_ADVANTAGE
-            
-            # Calculate rating differential
-            rating_diff = adjusted_higher - adjusted_lower
-            
-            # Count games where upset was possible (rating diff >= 6)
-            if rating_diff >= 6:
-                total_chances += 1
-                # Count actual upsets (lower seed won)
-                if winning_team == lower_seed_team:
-                    upsets += 1
+        total_chances = len(matchups["loTeam"])
+        # Count actual upsets (lower seed won)
+        upsets = int((matchups["winningTeam"] == matchups["loTeam"]).sum())
         
         # Calculate percentage
         upset_pct = (upsets / total_chances * 100) if total_chances > 0 else 0
         
-        upset_data[year] = {
+        upset_data[str(year)] = {
             "upsets": upsets,
             "total_chances": total_chances,
             "upset_percentage": round(upset_pct, 2)
@@ -81,27 +53,19 @@ def count_upsets_by_year():
 
 def compute_year_averages(year):
     """Compute averages for a given year from misc and fourFactors data."""
-    base_path = Path(__file__).parent.parent
-    misc_file = base_path / 'misc' / f'{year}.json'
-    ff_file = base_path / 'fourFactors' / f'{year}.json'
+    misc_data = season_store.misc(year)
+    ff_data = season_store.four_factors(year)
     
     # Check if both files exist
-    if not misc_file.exists() or not ff_file.exists():
+    if misc_data is None or ff_data is None:
         return None
     
-    # Load data
-    with open(misc_file, 'r') as f:
-        misc_data = json.load(f)
-    
-    with open(ff_file, 'r') as f:
-        ff_data = json.load(f)
-    
-    # Compute averages for misc stats
+    # Compute averages for misc stats (blank values are skipped; zeros count, as the raw "0.0" strings always did)
     misc_stats = ['3P_pct', '2P_pct', 'FT_pct', 'Blk_pct', 'Stl_pct', 'A_pct', '3PA_pct']
     misc_averages = {}
     
     for stat in misc_stats:
-        values = [float(team[stat]) for team in misc_data if stat in team and team[stat]]
+        values = misc_data[stat].dropna().tolist() if stat in misc_data else []
         if values:
             misc_averages[stat] = round(sum(values) / len(values), 2)
     
@@ -110,7 +74,7 @@ def compute_year_averages(year):
     ff_averages = {}
     
     for stat in ff_stats:
-        values = [float(team[stat]) for team in ff_data if stat in team and team[stat]]
+        values = ff_data[stat].dropna().tolist() if stat in ff_data else []
         if values:
             ff_averages[stat] = round(sum(values) / len(values), 2)
     
@@ -123,7 +87,7 @@ def compute_year_averages(year):
     
     return year_averages
 
-def main():
+def main(years=None):
     """Process all years and create average files."""
     base_path = Path(__file__).parent.parent
     misc_dir = base_path / 'misc'
@@ -134,7 +98,7 @@ def main():
     
     # Get all years from misc directory
     # years = sorted([f.stem for f in misc_dir.glob('*.json')])
-    years = [2026]  # --- IGNORE ---
+    years = years or [2026]  # --- IGNORE ---
     
     print(f"Processing {len(years)} years...")
     
@@ -143,8 +107,10 @@ def main():
         
         if averages:
             output_file = output_dir / f'{year}.json'
-            with open(output_file, 'w') as f:
-                json.dump(averages, f, indent=2)
+            with pipelineTrace.stage('write_averages', 'write-json', year=int(year)) as stage:
+                with open(output_file, 'w') as f:
+                    json.dump(averages, f, indent=2)
+                stage.wrote(pipelineTrace.file_size(output_file))
             print(f"Created {year}.json with {len(averages) - 1} stats")
         else:
             print(f"Skipped {year} - missing data")
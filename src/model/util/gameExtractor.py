@@ -1,10 +1,22 @@
+import hashlib
+import io
 import json
 import os
+import sys
 from datetime import datetime
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+import pipelineTrace
+from matchupStore import MODEL_DIR, MATCHUPS_DIR
+from seasonStore import season_store
+
+# per-year record of what process_year has already ingested (see load_ingest_state)
+INGEST_STATE_DIR = MODEL_DIR / 'ingestState'
 
 def load_mismatched_names():
     """Load the mismatched names mapping."""
-    with open('/home/tmoran/personal/madness/src/model/util/mismatchedNames.json', 'r') as f:
+    with open(Path(__file__).resolve().parent / 'mismatchedNames.json', 'r') as f:
         return json.load(f)
 
 def normalize_team_name(team_name, mismatched_names):
@@ -13,26 +25,15 @@ def normalize_team_name(team_name, mismatched_names):
 
 def load_ratings(year):
     """Load team ratings for a given year."""
-    ratings_file = f'/home/tmoran/personal/madness/src/model/ratings/{year}.json'
-    if not os.path.exists(ratings_file):
-        print(f"Warning: Ratings file not found for {year}")
-        return {}
-    
-    with open(ratings_file, 'r') as f:
-        ratings_data = json.load(f)
-    
     # Create a dictionary mapping team name to {netRating, rank}
-    ratings_dict = {}
-    for entry in ratings_data:
-        ratings_dict[entry['team']] = {
-            'netRating': entry['netRating'],
-            'rank': entry['rank']
-        }
+    ratings_dict = season_store.ratings_dict(year)
+    if not ratings_dict:
+        print(f"Warning: Ratings file not found for {year}")
     
     return ratings_dict
 
-def parse_game_line(line, year, ratings_dict, mismatched_names, gameCtr):
-    """Parse a single game line from the txt file."""
+def parse_game_line(line, year, ratings_dict, mismatched_names, gameCtr, unrated=None):
+    """Parse a single game line from the txt file. Lines skipped for a missing rating are added to unrated."""
     parts = line.split()
     
     # Parse date (MM/DD/YYYY format)
@@ -98,6 +99,8 @@ def parse_game_line(line, year, ratings_dict, mismatched_names, gameCtr):
     
     if rating_info1 is None or rating_info2 is None:
         # Skip games where we don't have ratings for both teams
+        if unrated is not None:
+            unrated.append(line)
         return None
     
     rating1 = rating_info1['netRating']
@@ -147,10 +150,97 @@ def parse_game_line(line, year, ratings_dict, mismatched_names, gameCtr):
         "location": location if isNeutral else team2
     }
 
+def game_key(game):
+    """Identify a regular season game by its date and (unordered) team pair."""
+    return (game['date'],) + tuple(sorted((game['higherSeedTeam'], game['lowerSeedTeam'])))
+
+def ingest_state_file(year):
+    return INGEST_STATE_DIR / f'{year}.json'
+
+def file_signature(path):
+    stat = os.stat(path)
+    return {'size': stat.st_size, 'mtimeNs': stat.st_mtime_ns}
+
+def load_ingest_state(year, matchups_file):
+    """
+    Load the ingest state for a year: how many bytes of the regular season file were
+    consumed (plus a hash of them), the consumed lines skipped for a missing rating, and
+    the keys of every regular season game already in the matchups file. If the matchups
+    file changed behind our back (or there is no state yet) the keys are rebuilt from it
+    and the whole regular season file is rescanned.
+    """
+    state_file = ingest_state_file(year)
+    signature = file_signature(matchups_file) if os.path.exists(matchups_file) else None
+    if state_file.exists():
+        with open(state_file, 'r') as f:
+            state = json.load(f)
+        if state['matchups'] == signature:
+            return {'offset': state['offset'], 'prefixHash': state['prefixHash'], 'unrated': state.get('unrated', []),
+                'keys': {tuple(key) for key in state['keys']}}
+
+    keys = set()
+    if signature is not None:
+        with open(matchups_file, 'r') as f:
+            keys = {game_key(m) for m in json.load(f) if 'date' in m and 'higherRating' in m}
+    return {'offset': 0, 'prefixHash': None, 'unrated': [], 'keys': keys}
+
+def save_ingest_state(year, matchups_file, offset, prefix_hash, unrated, keys):
+    INGEST_STATE_DIR.mkdir(exist_ok=True)
+    state_file = ingest_state_file(year)
+    tmp_file = state_file.with_suffix('.tmp')
+    with open(tmp_file, 'w') as f:
+        json.dump({
+            'offset': offset,
+            'prefixHash': prefix_hash,
+            'unrated': unrated,
+            'matchups': file_signature(matchups_file),
+            'keys': sorted(keys),
+        }, f)
+    os.replace(tmp_file, state_file)
+
+def clear_ingest_state(year):
+    ingest_state_file(year).unlink(missing_ok=True)
+
+def append_matchups(matchups_file, games):
+    """
+    Append games to a matchups JSON list in place. The result is byte for byte what
+    json.dump(existing + games, f, indent=2) would write, without reading the existing games.
+    """
+    if not os.path.exists(matchups_file) or os.path.getsize(matchups_file) < 64:
+        # missing or too small to hold a game (e.g. "[]"), so just write the whole list
+        existing = []
+        if os.path.exists(matchups_file):
+            with open(matchups_file, 'r') as f:
+                existing = json.load(f)
+        with open(matchups_file, 'w') as f:
+            json.dump(existing + games, f, indent=2)
+        return
+
+    if not games:
+        return
+
+    # each game exactly as json.dump renders a list element at indent=2
+    entries = ',\n'.join(json.dumps([game], indent=2)[2:-2] for game in games)
+    with open(matchups_file, 'r+b') as f:
+        f.seek(-64, os.SEEK_END)
+        tail = f.read()
+        # overwrite the closing bracket (and the newline before it) with the new games
+        last_game_end = len(tail[:tail.rindex(b']')].rstrip())
+        f.seek(last_game_end - len(tail), os.SEEK_END)
+        f.truncate()
+        f.write((',\n' + entries + '\n]').encode('utf-8'))
+
 def process_year(reg_season_dir, year):
-    """Process all regular season games for a given year."""
+    """
+    Ingest regular season games for a given year into its matchups file.
+    Only lines added to the regular season file since the last run are parsed, games
+    already in the matchups file are skipped, and new games are appended in place, so
+    rerunning (e.g. nightly during the season) is cheap and never duplicates games.
+    A last line without a newline yet (a download still being written) is parsed but
+    read again next run, and lines skipped for a missing rating are kept and retried.
+    """
     reg_season_file = f'{reg_season_dir}/{year}.txt'
-    matchups_file = f'/home/tmoran/personal/madness/src/model/matchups/{year}.json'
+    matchups_file = str(MATCHUPS_DIR / f'{year}.json')
     
     if not os.path.exists(reg_season_file):
         print(f"Skipping {year}: No regular season file found")
@@ -165,39 +255,60 @@ def process_year(reg_season_dir, year):
         print(f"Skipping {year}: No ratings found")
         return
     
-    # Load existing matchups
-    if os.path.exists(matchups_file):
-        with open(matchups_file, 'r') as f:
-            matchups = json.load(f)
-    else:
-        matchups = []
-    
+    state = load_ingest_state(year, matchups_file)
+    keys = state['keys']
+    unrated = state['unrated']
+
+    with open(reg_season_file, 'rb') as f:
+        # resume after the last consumed line, unless the file was rewritten since
+        offset = state['offset']
+        prefix_hash = hashlib.blake2b(f.read(offset), digest_size=16)
+        if offset == 0 or prefix_hash.hexdigest() != state['prefixHash']:
+            print(f"Scanning all of {reg_season_file}")
+            offset = 0
+            prefix_hash = hashlib.blake2b(digest_size=16)
+            unrated = []
+            f.seek(0)
+        consumed = f.read()
+    # only whole lines count as consumed; the unterminated tail is read again next run
+    complete = consumed.rfind(b'\n') + 1
+    prefix_hash.update(consumed[:complete])
+
     # Parse regular season games
     new_games = []
-    with open(reg_season_file, 'r') as f:
-        gameCtr = 0
-        for line in f:
+    gameCtr = 0
+    still_unrated = []
+    with pipelineTrace.stage('parse_regular_season', 'load', year=int(year)) as stage:
+        stage.read(len(consumed))
+        # same universal newline handling as iterating over the file in text mode
+        lines = [(line, still_unrated) for line in unrated]
+        lines += [(line, still_unrated) for line in io.StringIO(consumed[:complete].decode('utf-8'), newline=None)]
+        lines += [(line, None) for line in io.StringIO(consumed[complete:].decode('utf-8'), newline=None)]
+        for line, skipped in lines:
             line = line.strip()
             if not line or line.startswith('/*') or line.startswith('*/'):
                 continue
             
-            game = parse_game_line(line, year, ratings_dict, mismatched_names, gameCtr)
-            if game:
+            game = parse_game_line(line, year, ratings_dict, mismatched_names, gameCtr, skipped)
+            if game and game_key(game) not in keys:
+                keys.add(game_key(game))
                 new_games.append(game)
                 gameCtr += 1
+        stage.rows = len(new_games)
     
     # Append new games to matchups
-    matchups.extend(new_games)
-    
-    # Save updated matchups
-    with open(matchups_file, 'w') as f:
-        json.dump(matchups, f, indent=2)
+    with pipelineTrace.stage('append_matchups', 'write-json', rows=len(new_games)) as stage:
+        size_before = pipelineTrace.file_size(matchups_file)
+        append_matchups(matchups_file, new_games)
+        stage.wrote(pipelineTrace.file_size(matchups_file) - size_before)
+
+    save_ingest_state(year, matchups_file, offset + complete, prefix_hash.hexdigest(), still_unrated, keys)
     
     print(f"Processed {year}: Added {len(new_games)} regular season games to {matchups_file}")
 
 def delete_regular_season_games():
     """Delete all regular season games (those with higherRating field) from matchups files."""
-    matchups_dir = '/home/tmoran/personal/madness/src/model/matchups'
+    matchups_dir = str(MATCHUPS_DIR)
     
     if not os.path.exists(matchups_dir):
         print(f"Directory not found: {matchups_dir}")
@@ -227,6 +338,9 @@ def delete_regular_season_games():
         with open(matchups_file, 'w') as f:
             json.dump(matchups, f, indent=2)
         
+        # regular season games have to be ingested from scratch again
+        clear_ingest_state(year)
+        
         if deleted_count > 0:
             print(f"{year}: Deleted {deleted_count} regular season games")
         else:
@@ -234,9 +348,9 @@ def delete_regular_season_games():
     
     print("\nDone deleting regular season games from all matchups files!")
 
-def main():    
+def main(years=None):    
     """Process all years with regular season game files."""
-    reg_season_dir = '/home/tmoran/personal/madness/src/model/regSeasonGames'
+    reg_season_dir = str(MODEL_DIR / 'regSeasonGames')
     
     if not os.path.exists(reg_season_dir):
         print(f"Directory not found: {reg_season_dir}")
@@ -249,7 +363,8 @@ def main():
     #         years.append(year)
     
     # years.sort()
-    years = ['2026']
+    # matchup files store the year as a string
+    years = [str(year) for year in years or ['2026']]
     
     for year in years:
         process_year(reg_season_dir, year)
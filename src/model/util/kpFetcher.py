@@ -1,14 +1,19 @@
-from bs4 import BeautifulSoup
 import json
 import os
 import glob
 import csv
-import requests
-import time
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+import matchupStore
+from seasonStore import season_store
 
 teams_data = []
 
 def readKenPomHtml():
+    from bs4 import BeautifulSoup
+
     # Read the HTML from the saved response file
     with open('/home/tmoran/personal/madness/src/model/response.txt', 'r') as f:
         html_content = f.read()
@@ -151,21 +156,10 @@ def parseTeamNames():
 
 def load_ratings(year):
     """Load team ratings for a given year."""
-    ratings_file = f'/home/tmoran/personal/madness/src/model/ratings/{year}.json'
-    if not os.path.exists(ratings_file):
-        print(f"Warning: Ratings file not found for {year}")
-        return {}
-    
-    with open(ratings_file, 'r') as f:
-        ratings_data = json.load(f)
-    
     # Create a dictionary mapping team name to {netRating, rank}
-    ratings_dict = {}
-    for entry in ratings_data:
-        ratings_dict[entry['team']] = {
-            'netRating': entry['netRating'],
-            'rank': entry['rank']
-        }
+    ratings_dict = season_store.ratings_dict(year)
+    if not ratings_dict:
+        print(f"Warning: Ratings file not found for {year}")
     
     return ratings_dict
 
@@ -324,44 +318,29 @@ def parseTournamentMatchups(yearsToAvoid=[], appendMode=False):
     '''
 
 def extractUpsets():
-    # Path to the matchups folder
-    matchups_dir = '/home/tmoran/personal/madness/src/model/matchups/'
+    # Only tournament games carry seeds, so read just those columns from the matchup store
+    columns = ["hiTeam", "loTeam", "winningTeam", "higherSeed", "lowerSeed",
+        "higherSeedScore", "lowerSeedScore", "round"]
     
-    # Get all JSON files in the matchups folder
-    json_files = glob.glob(os.path.join(matchups_dir, '*.json'))
-    
-    # Process each JSON file
-    for json_file in sorted(json_files):
-        # Extract year from filename (e.g., matchups2024.json -> 2024)
-        year = os.path.basename(json_file).replace('matchups', '').replace('.json', '')
+    for year in matchupStore.available_years():
+        matchups = matchupStore.read_matchups((year, year), columns=columns, postseason=True)
         
-        with open(json_file, 'r') as f:
-            matchups = json.load(f)
+        # Check if it's an upset (lower seed won and seed difference >= 5)
+        is_upset = (matchups["winningTeam"] == matchups["loTeam"]) & \
+            (matchups["lowerSeed"].astype(int) - matchups["higherSeed"] >= 5)
         
         upsets = []
-        
-        for matchup in matchups:
-            higher_seed = matchup['higherSeed']
-            lower_seed = matchup['lowerSeed']
-            higher_seed_team = matchup['higherSeedTeam']
-            lower_seed_team = matchup['lowerSeedTeam']
-            higher_seed_score = matchup['higherSeedScore']
-            lower_seed_score = matchup['lowerSeedScore']
-            winning_team = matchup['winningTeam']
-            round_num = matchup['round']
-            
-            # Check if it's an upset (lower seed won and seed difference >= 5)
-            if winning_team == lower_seed_team and (lower_seed - higher_seed) >= 5:
-                upset_entry = {
-                    "winningTeam": lower_seed_team,
-                    "winningSeed": lower_seed,
-                    "losingTeam": higher_seed_team,
-                    "losingSeed": higher_seed,
-                    "winningScore": lower_seed_score,
-                    "losingScore": higher_seed_score,
-                    "round": round_num
-                }
-                upsets.append(upset_entry)
+        for i in is_upset.nonzero()[0]:
+            upset_entry = {
+                "winningTeam": matchups["loTeam"][i],
+                "winningSeed": int(matchups["lowerSeed"][i]),
+                "losingTeam": matchups["hiTeam"][i],
+                "losingSeed": int(matchups["higherSeed"][i]),
+                "winningScore": int(matchups["lowerSeedScore"][i]),
+                "losingScore": int(matchups["higherSeedScore"][i]),
+                "round": int(matchups["round"][i])
+            }
+            upsets.append(upset_entry)
         
         # Save upsets to JSON file if there are any
         if upsets:
@@ -461,40 +440,23 @@ def extractOlderMatchups():
         
         print(f"Saved {len(matchups)} matchups for {year} to {output_file}")
 
-def fetchTeamPage(team, cookie_value, year, cookie_name='PHPSESSID'):
-    
-    # Create cookie dictionary
-    cookies = {cookie_name: cookie_value}
-    
-    # Make the GET request with the cookie
-    url = f"https://kenpom.com/team.php?team={team}&y={year}"
-    response = requests.get(url, verify=False, cookies=cookies)
-    
-    return response
-
-def fetchTeamQuadPage(team, cookie_value):
-    # Create headers with cookie string
-    headers = {
-        'Cookie': cookie_value
-    }
-    
-    # Make the GET request with the cookie header
-    url = f"https://bballnet.com/teams/{team}"
-    response = requests.get(url, headers=headers, verify=False)
-    
-    return response
-
 def fetchWabRankingsPage(year):
-    """Fetch NCAA WAB rankings page HTML and save it to wabRankings{year}.txt."""
+    """Fetch NCAA WAB rankings page HTML and save it to wabRankings{year}.txt, unless it hasn't changed."""
+    import httpClient
+
+    client = httpClient.default_client()
+    output_file = Path(__file__).resolve().parent / f"wabRankings{year}.txt"
     url = "https://www.ncaa.com/rankings/basketball-men/d1/wab-ranking"
-    response = requests.get(url, verify=False)
+    response = client.get(url, body_file=output_file)
     response.raise_for_status()
 
-    output_file = f"/home/tmoran/personal/madness/src/model/util/wabRankings{year}.txt"
-    with open(output_file, 'w', encoding='utf-8') as f:
-        f.write(response.text)
-
-    print(f"Saved WAB rankings HTML to {output_file}")
+    if response.unchanged and output_file.exists():
+        print(f"WAB rankings unchanged since {output_file} was saved")
+    else:
+        with open(output_file, 'w', encoding='utf-8') as f:
+            f.write(response.text)
+        print(f"Saved WAB rankings HTML to {output_file}")
+    client.report()
     return response
 
 namesToReplace = { 
@@ -519,62 +481,93 @@ namesToReplace = {
     "Cal Baptist": "california-baptist",
     "UMBC": "maryland-baltimore-county",
 }
-def fetchTopTeams(given_top_teams, year, andRank=False, quads=False):
-    """Fetch team pages for certain teams + year"""
-    
-    # Load ratings data
-    ratings_file = f'/home/tmoran/personal/madness/src/model/ratings/{year}.json'
-    with open(ratings_file, 'r') as f:
+# page cookies for fetchTopTeams
+KP_COOKIE_VALUE = "8c4ee60332aa59f9702ee907e4c13265; kenpomuser=timthemoran%40gmail.com; kenpomid=e737b70d840eb9550ec0af116336e51d; _ga_6DKK0E2CDM=GS2.1.s1771279291$o50$g1$t1771279291$j60$l0$h0; cf_clearance=779MHWii_xqDW8EmiH0_5zr5M.6Dl_YBlHecN.AwReU-1771279291-1.2.1.1-Et1_o4wjfV0Xp4aMSrqiC_PpZekkmrYLofp1cushTAMKmCMUA_Nlnb4hIaEsALg6d54XGAb26fqvH3rGel3rm2kRv4NbpcFhol4W4lLQq0xYhdhqPgMSoim8m8vqbLZJdmiFGMSN1AzK0DAGOAiFvAzkDDI0LvKE4EHSNbRjYkjvr_jIzzqLnM8HgIb5h5060nKtLYys20ayZyHELb2uJpkVC5DN_UJdNxp0fmXFKzc"
+QUAD_COOKIE_VALUE = "_ga=GA1.1.1416474417.1771279390; _ga_Y86RJEMBDJ=GS2.1.s1771282213$o2$g1$t1771282213$j60$l0$h0; FCCDCF=%5Bnull%2Cnull%2Cnull%2Cnull%2Cnull%2Cnull%2C%5B%5B32%2C%22%5B%5C%22e0aa732c-d60b-4e82-a9a1-330abf1c839b%5C%22%2C%5B1771279391%2C201000000%5D%5D%22%5D%5D%5D; FCNEC=%5B%5B%22AKsRol85bHpwr-6Ifp9T2AaJuP7UKyaq5r2lm2j1T4rRrKAktSCzx5u2RRUwXB1_IRxyQ85eQeyhp25y3dqshVmqxFderK5FAA4Tqkd9HxSnSudv7eq6ZfBPzbGrXa89pgUZx-VVfVCqYTyvAcUwLtEdZhUnv5Mxzg%3D%3D%22%5D%5D; __gads=ID=3a4467c739d5d30f:T=1771279401:RT=1771282214:S=ALNI_MZ8xMLeS0OnZ1bKT7WfDVW5dBKWIw; __gpi=UID=000013392ee6b96b:T=1771279401:RT=1771282214:S=ALNI_MaF5mOiuoclzxWuaWFd0YnhNydRkw; __eoi=ID=2f7212625bab4b32:T=1771279401:RT=1771282214:S=AA-AfjY3LfwI27veAixkxlKTi7FJ"
+KENPOM_URL = "https://kenpom.com"
+BBALLNET_URL = "https://bballnet.com"
+
+def team_pages_dir(year, quads=False):
+    import pageArchive
+
+    return pageArchive.loose_dir(page_source(quads), year)
+
+def page_source(quads=False):
+    """The pageArchive source name of the team pages"""
+    return 'bballnet' if quads else 'kenpom'
+
+def top_team_names(given_top_teams, year, andRank=False):
+    """The given teams, plus every team ranked 55 or better when andRank is set"""
+    if not andRank:
+        return given_top_teams
+    with open(Path(__file__).resolve().parent.parent / 'ratings' / f'{year}.json', 'r') as f:
         ratings_data = json.load(f)
-    
-    # Filter teams with rank <= x
-    if(andRank):
-        top_teams = list(dict.fromkeys(given_top_teams + [team['team'] for team in ratings_data if team['rank'] <= 55]))
-    else:
-        top_teams = given_top_teams
-    
-    # Create output directory
-    pageType = 'TeamQuads' if quads else 'TeamPhps'
-    output_dir = f'/home/tmoran/personal/madness/src/model/util/temp{pageType}/{year}'
-    os.makedirs(output_dir, exist_ok=True)
-    
-    # Cookie value (same as in the example)
-    kp_cookie_value = "8c4ee60332aa59f9702ee907e4c13265; kenpomuser=timthemoran%40gmail.com; kenpomid=e737b70d840eb9550ec0af116336e51d; _ga_6DKK0E2CDM=GS2.1.s1771279291$o50$g1$t1771279291$j60$l0$h0; cf_clearance=779MHWii_xqDW8EmiH0_5zr5M.6Dl_YBlHecN.AwReU-1771279291-1.2.1.1-Et1_o4wjfV0Xp4aMSrqiC_PpZekkmrYLofp1cushTAMKmCMUA_Nlnb4hIaEsALg6d54XGAb26fqvH3rGel3rm2kRv4NbpcFhol4W4lLQq0xYhdhqPgMSoim8m8vqbLZJdmiFGMSN1AzK0DAGOAiFvAzkDDI0LvKE4EHSNbRjYkjvr_jIzzqLnM8HgIb5h5060nKtLYys20ayZyHELb2uJpkVC5DN_UJdNxp0fmXFKzc"
-    cookie_value = "_ga=GA1.1.1416474417.1771279390; _ga_Y86RJEMBDJ=GS2.1.s1771282213$o2$g1$t1771282213$j60$l0$h0; FCCDCF=%5Bnull%2Cnull%2Cnull%2Cnull%2Cnull%2Cnull%2C%5B%5B32%2C%22%5B%5C%22e0aa732c-d60b-4e82-a9a1-330abf1c839b%5C%22%2C%5B1771279391%2C201000000%5D%5D%22%5D%5D%5D; FCNEC=%5B%5B%22AKsRol85bHpwr-6Ifp9T2AaJuP7UKyaq5r2lm2j1T4rRrKAktSCzx5u2RRUwXB1_IRxyQ85eQeyhp25y3dqshVmqxFderK5FAA4Tqkd9HxSnSudv7eq6ZfBPzbGrXa89pgUZx-VVfVCqYTyvAcUwLtEdZhUnv5Mxzg%3D%3D%22%5D%5D; __gads=ID=3a4467c739d5d30f:T=1771279401:RT=1771282214:S=ALNI_MZ8xMLeS0OnZ1bKT7WfDVW5dBKWIw; __gpi=UID=000013392ee6b96b:T=1771279401:RT=1771282214:S=ALNI_MaF5mOiuoclzxWuaWFd0YnhNydRkw; __eoi=ID=2f7212625bab4b32:T=1771279401:RT=1771282214:S=AA-AfjY3LfwI27veAixkxlKTi7FJ"
+    return list(dict.fromkeys(given_top_teams + [team['team'] for team in ratings_data if team['rank'] <= 55]))
 
-    print(f"Fetching team pages for {len(top_teams)} teams...")
-    
-    # Fetch each team's page
-    for name in top_teams:
-        phpName = name.replace('&', '%26')
-        if name in namesToReplace:
-            quadName = namesToReplace[name]
+def team_page_jobs(teams, year, output_dir, quads=False):
+    """One asyncFetcher.PageJob per team page, saved as {output_dir}/{safe name}.txt"""
+    from urllib.parse import quote
+
+    import asyncFetcher
+
+    jobs = []
+    for name in teams:
+        safe_filename = name.replace(' ', '_').replace('.', '').replace("'", '')
+        output_file = Path(output_dir) / f'{safe_filename}.txt'
+        if quads:
+            if name in namesToReplace:
+                quadName = namesToReplace[name]
+            else:
+                quadName = name.replace(' ', '-').replace('&', '').replace('.', '').replace("'", '').replace("St", "state")
+            jobs.append(asyncFetcher.PageJob(name, f"{BBALLNET_URL}/teams/{quadName}", output_file, {'Cookie': QUAD_COOKIE_VALUE}))
         else:
-            quadName = name.replace(' ', '-').replace('&', '').replace('.', '').replace("'", '').replace("St", "state") 
-        
-        try:
-            safe_filename = name.replace(' ', '_').replace('.', '').replace("'", '')
-            output_file = os.path.join(output_dir, f'{safe_filename}.txt')
+            # what requests did to the name: spaces and & escaped
+            phpName = quote(name, safe="'")
+            jobs.append(asyncFetcher.PageJob(name, f"{KENPOM_URL}/team.php?team={phpName}&y={year}", output_file,
+                {'Cookie': f'PHPSESSID={KP_COOKIE_VALUE}'}))
+    return jobs
+
+def fetchTopTeams(given_top_teams, year, andRank=False, quads=False, extract=False, rate=2.0, concurrency=4, refresh=False):
+    """
+    Fetch team pages for certain teams + year, a few at a time (see asyncFetcher).
+    Pages already saved are skipped, so a rerun picks up where a failed one stopped;
+    with refresh they are requested again conditionally and only rewritten if changed.
+    With extract, each page is parsed as soon as it arrives and the season's
+    quadStats/kpOvrStats JSON is written at the end by quadAndOvrExtractor, which
+    reuses those results and its manifest's for every other page rather than parsing.
+    Once the season's pages are archived (see pageArchive), new pages go to the archive.
+    """
+    import asyncFetcher
+    import pageArchive
+
+    top_teams = top_team_names(given_top_teams, year, andRank)
+    output_dir = team_pages_dir(year, quads)
+    archive = pageArchive.PageArchive(page_source(quads), year)
+    if not archive.exists():
+        archive = None
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+    print(f"Fetching team pages for {len(top_teams)} teams...")
+    jobs = team_page_jobs(top_teams, year, output_dir, quads)
+    on_page = None
+    if extract:
+        import kpPageParser
+        import quadAndOvrExtractor
+
+        # kenpom pages are parsed whole, so the manifest can serve kpGames from them too
+        parse = quadAndOvrExtractor.parse_quad_page if quads else kpPageParser.parse_team_page
+        on_page = lambda job, html: (quadAndOvrExtractor.page_digest(html), parse(html))
+    stats = asyncFetcher.run(jobs, on_page=on_page, rate=rate, concurrency=concurrency, refresh=refresh, archive=archive)
 
-            if os.path.exists(output_file):
-                print(f"Skipping {name}; file already exists")
-                continue
-            
-            response = fetchTeamQuadPage(quadName, cookie_value, year) if quads else fetchTeamPage(phpName, kp_cookie_value, year)
-            # Save response to file
-            # Replace spaces and special characters in filename
-            
-            with open(output_file, 'w', encoding='utf-8') as f:
-                f.write(response.text)
-            
-            print(f"Saved to {output_file}")
-            
-        except Exception as e:
-            print(f"Error fetching page for {name}: {e}")
-        
-        time.sleep(1) # avoid constant requests
-    
     print(f"\nCompleted fetching {len(top_teams)} team pages")
+    if extract:
+        # pages from earlier runs that aren't in this team list are extracted too
+        parsed = dict(stats["parsed"].values())
+        if quads:
+            quadAndOvrExtractor.extractQuadStats(year, parsed=parsed)
+        else:
+            quadAndOvrExtractor.extractKpOvrStats(year, parsed=parsed)
+    return stats
 
 teams_2025 = [
     "Wisconsin",
@@ -649,7 +642,12 @@ teams_2025 = [
 bids_2026 = ["North Dakota St.", "Tennessee St.", "LIU", "Northern Iowa", 
 "Siena", "Wright St.", "Hofstra", "Queens", "VCU", "Idaho", "High Point", "Hawaii", 
 "Howard", "Utah St.", "Lehigh", "Furman", "Prairie View A&M", "Troy", "Cal Baptist", "UMBC", "Miami OH"]
+tournament_teams = {2025: teams_2025, 2026: bids_2026}
+
+def main(year=2026):
+    fetchTopTeams(tournament_teams[year], year, True, False)
+    fetchTopTeams(tournament_teams[year], year, True, True)
+    fetchWabRankingsPage(year)
 
-fetchTopTeams(bids_2026, 2026, True, False)
-fetchTopTeams(bids_2026, 2026, True, True)
-fetchWabRankingsPage(2026)
\ No newline at end of file
+if __name__ == "__main__":
+    main()
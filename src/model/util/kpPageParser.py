@@ -0,0 +1,308 @@
+"""
+Single-pass parser for saved kenpom team.php pages.
+
+BeautifulSoup with html.parser builds a full tree of every page (~130ms a page), and
+the extractors used to build it twice per page, once for the ratings and once for the
+schedule, plus a soup for every stat cell and script fragment. Here one HTMLParser pass
+builds a bare tree of only the part of the page the extractors read: the title,
+report table and schedule, between content-header and the players table. One compiled
+regex pulls every stat fragment out of the tableStart() script, and the fragments go
+through the same small tree. parse_team_page returns the kpOvrStats entry and the
+kpGames rows together. The text and attribute handling copies BeautifulSoup's
+get_text(" ", strip=True), select and find_all, so both outputs come out the same.
+"""
+import re
+from html import unescape
+from html.parser import HTMLParser
+
+NUM_TEAMS = 365
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "param", "source", "track", "wbr"}
+# get_text leaves out script and style contents
+SKIPPED_TEXT_TAGS = {"script", "style"}
+REGION_START = '<div id="content-header"'
+REGION_END = '<div id="players"'
+TABLE_START_PATTERN = re.compile(r"function\s+tableStart\(\)\s*\{(.*?)\}\s*function\s+dechex", re.DOTALL)
+SCRIPT_HTML_PATTERN = re.compile(r'\$\(\s*"td#(?P<id>[^"]+)"\s*\)\.html\(\s*"(?P<html>(?:\\.|[^"\\])*)"\s*\);', re.DOTALL)
+DIGITS = re.compile(r"\d+")
+WHITESPACE = re.compile(r"\s+")
+CONFERENCE_PARAM = re.compile(r"[?&]c=([^&]+)")
+
+KP_STAT_ID_MAP = {
+    "Off Efficiency": "OE",
+    "Def Efficiency": "DE",
+    "Off TO%": "TOPct",
+    "Def TO%": "DTOPct",
+    "Off OR%": "ORPct",
+    "Def OR%": "DORPct",
+    "Off FT%": "FTPct",
+    "Off 3PA": "3PARate",
+    "Off 3P%": "3Pct",
+    "Tempo": "Tempo",
+    "A/FGM": "ARate",
+    "Off Avg. Poss. Length": "APLO",
+    "Def Avg. Poss. Length": "APLD",
+}
+ROW_STAT_LABEL_MAP = {
+    "Average Height": "Average Height",
+    "Overall": "SOS Overall",
+    "Non-conference": "SOS Non-conference",
+    "D-1 Experience": "D-1 Experience",
+    "Minutes Continuity": "Minutes Continuity",
+    "Bench Minutes": "Bench Minutes",
+}
+CONFERENCE_MAP = {
+    "A10": "Atlantic 10",
+    "AE": "Am East",
+    "B10": "B1G",
+    "BSth": "Big South",
+    "NEC": "NE",
+    "PL": "Patriot",
+    "SB": "Sun Belt",
+}
+KP_OVR_OUTPUT_ORDER = (
+    "KenPom Ovr.",
+    "Off Efficiency",
+    "Def Efficiency",
+    "Off TO%",
+    "Def TO%",
+    "Off OR%",
+    "Def OR%",
+    "Off FT%",
+    "Off 3PA",
+    "Off 3P%",
+    "Tempo",
+    "Average Height",
+    "A/FGM",
+    "Off Avg. Poss. Length",
+    "Def Avg. Poss. Length",
+    "SOS Overall",
+    "SOS Non-conference",
+    "D-1 Experience",
+    "Minutes Continuity",
+    "Bench Minutes",
+)
+
+class Node:
+    __slots__ = ("tag", "attrs", "children")
+
+    def __init__(self, tag, attrs):
+        self.tag = tag
+        self.attrs = attrs
+        self.children = []
+
+    def has_class(self, name):
+        return name in self.attrs.get("class", "").split()
+
+    def descendants(self):
+        stack = list(reversed(self.children))
+        while stack:
+            child = stack.pop()
+            if isinstance(child, Node):
+                yield child
+                stack.extend(reversed(child.children))
+
+    def find(self, tag, class_=None):
+        for node in self.descendants():
+            if node.tag == tag and (class_ is None or node.has_class(class_)):
+                return node
+        return None
+
+    def find_all(self, tag, class_=None):
+        return [node for node in self.descendants() if node.tag == tag and (class_ is None or node.has_class(class_))]
+
+    def find_id(self, element_id):
+        for node in self.descendants():
+            if node.attrs.get("id") == element_id:
+                return node
+        return None
+
+    def strings(self, skip=None):
+        for child in self.children:
+            if isinstance(child, str):
+                yield child
+            elif child is not skip and child.tag not in SKIPPED_TEXT_TAGS:
+                yield from child.strings(skip)
+
+    def text(self, skip=None):
+        """get_text(" ", strip=True), leaving out the skip subtree."""
+        return " ".join(stripped for stripped in (string.strip() for string in self.strings(skip)) if stripped)
+
+class TreeBuilder(HTMLParser):
+    """Builds Nodes the way BeautifulSoup's html.parser builder nests tags."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.root = Node("[document]", {})
+        self.stack = [self.root]
+
+    def handle_starttag(self, tag, attrs):
+        node = Node(tag, {name: value if value is not None else "" for name, value in attrs})
+        self.stack[-1].children.append(node)
+        if tag not in VOID_TAGS:
+            self.stack.append(node)
+
+    def handle_startendtag(self, tag, attrs):
+        self.stack[-1].children.append(Node(tag, {name: value if value is not None else "" for name, value in attrs}))
+
+    def handle_endtag(self, tag):
+        # close everything up to the nearest open tag of this name; stray end tags are ignored
+        for depth in range(len(self.stack) - 1, 0, -1):
+            if self.stack[depth].tag == tag:
+                del self.stack[depth:]
+                return
+
+    def handle_data(self, data):
+        children = self.stack[-1].children
+        if children and isinstance(children[-1], str):
+            children[-1] += data
+        else:
+            children.append(data)
+
+def parse_tree(html):
+    builder = TreeBuilder()
+    builder.feed(html)
+    builder.close()
+    return builder.root
+
+def page_region(html):
+    """The part of the page the extractors read, or all of it when the markers are missing."""
+    start = html.find(REGION_START)
+    end = html.find(REGION_END, start)
+    if start < 0 or end < 0:
+        return html
+    return html[start:end]
+
+def clean_cell_text(node):
+    text = unescape(node.text()).replace("\xa0", " ")
+    return WHITESPACE.sub(" ", text).strip()
+
+def rank_value(node):
+    """(rank from span.seed, value from the first link or else the rest of the text), as kenpom cells hold them."""
+    rank = None
+    rank_node = node.find("span", "seed")
+    if rank_node is not None:
+        rank_match = DIGITS.search(rank_node.text())
+        if rank_match:
+            rank = int(rank_match.group(0))
+
+    value_anchor = None
+    for candidate in node.descendants():
+        if candidate.tag == "a" and not (rank_node is not None and _inside(candidate, rank_node)):
+            value_anchor = candidate
+            break
+    if value_anchor is not None:
+        return rank, value_anchor.text()
+    return rank, node.text(skip=rank_node) or None
+
+def _inside(node, ancestor):
+    return any(descendant is node for descendant in ancestor.descendants())
+
+def unescape_fragment(fragment):
+    return (
+        fragment
+        .replace(r'\"', '"')
+        .replace(r"\'", "'")
+        .replace(r"\\/", "/")
+        .replace(r"\\n", " ")
+        .replace(r"\\t", " ")
+    )
+
+def script_stats(html):
+    """{stat id: (rank, value)} for every stat tableStart() fills in, first assignment winning."""
+    table_start = TABLE_START_PATTERN.search(html)
+    if table_start is None:
+        return None
+    fragments = {}
+    for match in SCRIPT_HTML_PATTERN.finditer(table_start.group(1)):
+        fragments.setdefault(match.group("id"), match.group("html"))
+    return {stat_id: rank_value(parse_tree(unescape_fragment(fragment))) for stat_id, fragment in fragments.items()}
+
+def overall_rank_value(title):
+    h5 = title.find("h5") if title is not None else None
+    rank_nodes = h5.find_all("span", "rank") if h5 is not None else []
+    if not rank_nodes:
+        return None, None
+    match = DIGITS.search(rank_nodes[0].text())
+    rank = int(match.group(0)) if match else None
+    value = None
+    if len(rank_nodes) > 1:
+        record_text = rank_nodes[1].text()
+        value = record_text.strip("()") if record_text else None
+    return rank, value
+
+def conference(title):
+    if title is None:
+        return None
+    for link in title.find_all("a"):
+        href = link.attrs.get("href", "")
+        if "conf.php?c=" in href:
+            match = CONFERENCE_PARAM.search(href)
+            if not match:
+                return None
+            name = unescape(match.group(1)).strip()
+            return CONFERENCE_MAP.get(name, name)
+    return None
+
+def row_stats(report_table):
+    stats = {output_key: [None, None] for output_key in ROW_STAT_LABEL_MAP.values()}
+    if report_table is None:
+        return stats
+    for row in report_table.find_all("tr"):
+        cells = row.find_all("td")
+        if len(cells) < 2:
+            continue
+        label = cells[0].text().replace(":", "").strip()
+        output_key = ROW_STAT_LABEL_MAP.get(label)
+        if output_key is not None:
+            stats[output_key] = list(rank_value(cells[1]))
+    return stats
+
+def schedule_opponent(cell):
+    link = cell.find("a")
+    if link is None:
+        return clean_cell_text(cell)
+    title = link.attrs.get("title")
+    if title:
+        return unescape(title).strip()
+    return clean_cell_text(link)
+
+def games(schedule_table):
+    if schedule_table is None:
+        return []
+    rows = []
+    for row in schedule_table.find_all("tr"):
+        if not (row.has_class("w") or row.has_class("l")):
+            continue
+        cells = row.find_all("td")
+        if len(cells) < 10:
+            continue
+        rows.append({
+            "date": clean_cell_text(cells[0]),
+            "opponentRank": clean_cell_text(cells[2]),
+            "opponent": schedule_opponent(cells[3]),
+            "result": clean_cell_text(cells[4]),
+            "location": clean_cell_text(cells[7]),
+            "record": clean_cell_text(cells[8]),
+            "conferenceRecord": clean_cell_text(cells[9]),
+        })
+    return rows
+
+def parse_team_page(html):
+    """(kpOvrStats entry, kpGames rows) for one team page."""
+    root = parse_tree(page_region(html))
+    title = root.find_id("title-container")
+
+    stats = {"KenPom Ovr.": list(overall_rank_value(title))}
+    from_script = script_stats(html)
+    for output_key, stat_id in KP_STAT_ID_MAP.items():
+        rank, value = (None, None)
+        if from_script is not None:
+            rank, value = from_script.get(stat_id, (None, None))
+        if output_key == "Def Avg. Poss. Length" and rank is not None:
+            rank = NUM_TEAMS - rank
+        stats[output_key] = [rank, value]
+    stats.update(row_stats(root.find_id("report-table")))
+
+    ordered_stats = {key: stats.get(key, [None, None]) for key in KP_OVR_OUTPUT_ORDER}
+    ordered_stats["conference"] = conference(title)
+    return ordered_stats, games(root.find_id("schedule-table"))
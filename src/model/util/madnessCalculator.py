@@ -1,6 +1,10 @@
 import json
+import sys
 from pathlib import Path
 
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+import pipelineTrace
+
 # need to update if more teams are added otherwise will fail 
 RANK_MIN = 1
 RANK_MAX = 365
@@ -171,8 +175,10 @@ def add_madness_data_to_upset_file(
 	upset_data["regions"] = regions
 	upset_data["matchups"] = matchup_data
 
-	with open(upset_data_path, "w", encoding="utf-8") as f:
-		json.dump(upset_data, f, indent=2)
+	with pipelineTrace.stage("write_madness_data", "write-json", rows=len(matchup_data)) as stage:
+		with open(upset_data_path, "w", encoding="utf-8") as f:
+			json.dump(upset_data, f, indent=2)
+		stage.wrote(pipelineTrace.file_size(upset_data_path))
 
 	return upset_data
 
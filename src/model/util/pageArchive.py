@@ -0,0 +1,241 @@
+"""
+Compressed, indexed archive of scraped team pages.
+
+A season's pages from one source (kenpom team.php pages, bballnet quad pages) live
+in pageArchive/{source}/{year}.pages. Every page is its own zlib stream, compressed
+with a preset dictionary of the boilerplate the pages share: scripts, headers, nav,
+CSS links. That dictionary is built once from the pages the archive is created with
+and saved as {year}.dict. {year}.index.json maps each record to its team, fetch time,
+offset, length and content hash. The archive is append-only: re-fetching a page that
+changed appends a new snapshot, an identical page adds nothing, and old snapshots
+stay readable by fetch time.
+
+The extractors read pages through season_pages. It streams the latest snapshot of
+every team in file-name order from the archive when the season has one, and falls
+back to the loose .txt files otherwise. Archiving a season and then removing its
+loose files:
+
+    python pageArchive.py import --source kenpom --year 2026 --prune
+    python pageArchive.py stats --source kenpom --year 2026
+    python pageArchive.py export --source kenpom --year 2026
+"""
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+import zlib
+from collections import Counter
+from pathlib import Path
+
+UTIL_DIR = Path(__file__).resolve().parent
+ARCHIVE_DIR = UTIL_DIR / "pageArchive"
+# loose page directory of each source (util/{dir}/{year}/{team}.txt)
+SOURCE_DIRS = {"kenpom": "tempTeamPhps", "bballnet": "tempTeamQuads"}
+# zlib only looks back 32KB, so a longer dictionary would be wasted
+MAX_DICTIONARY = 32 * 1024
+COMPRESSION_LEVEL = 9
+
+def loose_dir(source, year):
+    return UTIL_DIR / SOURCE_DIRS[source] / str(year)
+
+def page_order(team):
+    # the order sorted(glob("*.txt")) gives the loose files
+    return team + ".txt"
+
+def build_dictionary(pages, min_share=0.5):
+    """Lines at least min_share of the pages contain, most common last (closest to the data)."""
+    counts = Counter()
+    for html in pages:
+        counts.update(set(html.encode("utf-8").splitlines(keepends=True)))
+    shared = [line for line, count in counts.items() if count >= min_share * len(pages) and len(line) > 8]
+    shared.sort(key=lambda line: (counts[line], len(line)))
+    dictionary = b"".join(shared)
+    return dictionary[-MAX_DICTIONARY:]
+
+class PageArchive:
+    """One (source, year) archive. Safe to add to from several threads."""
+
+    def __init__(self, source, year, base_dir=ARCHIVE_DIR):
+        self.source = source
+        self.year = int(year)
+        directory = Path(base_dir) / source
+        self.data_file = directory / f"{self.year}.pages"
+        self.index_file = directory / f"{self.year}.index.json"
+        self.dictionary_file = directory / f"{self.year}.dict"
+        self._lock = threading.Lock()
+        self._records = None
+        self._dictionary = None
+
+    def exists(self):
+        return self.index_file.exists()
+
+    @property
+    def records(self):
+        if self._records is None:
+            with open(self.index_file, "r", encoding="utf-8") as f:
+                self._records = json.load(f)["pages"]
+        return self._records
+
+    @property
+    def dictionary(self):
+        if self._dictionary is None:
+            self._dictionary = self.dictionary_file.read_bytes()
+        return self._dictionary
+
+    def create(self, pages, dictionary=None):
+        """Start the archive from {team: (html, fetched)}, building the dictionary from them."""
+        self.data_file.parent.mkdir(parents=True, exist_ok=True)
+        self._dictionary = dictionary if dictionary is not None else build_dictionary([html for html, _ in pages.values()])
+        self.dictionary_file.write_bytes(self._dictionary)
+        self.data_file.write_bytes(b"")
+        self._records = []
+        for team in sorted(pages, key=page_order):
+            self.add(team, *pages[team])
+        self.save()
+
+    def latest(self, at=None):
+        """{team: record} of each team's newest snapshot fetched at or before at (default: newest)."""
+        latest = {}
+        for record in self.records:
+            if at is not None and record["fetched"] > at:
+                continue
+            if record["team"] not in latest or record["fetched"] >= latest[record["team"]]["fetched"]:
+                latest[record["team"]] = record
+        return latest
+
+    def teams(self):
+        return sorted(self.latest(), key=page_order)
+
+    def has(self, team):
+        return any(record["team"] == team for record in self.records)
+
+    def snapshots(self, team):
+        return sorted(record["fetched"] for record in self.records if record["team"] == team)
+
+    def _decompress(self, data):
+        decompressor = zlib.decompressobj(zdict=self.dictionary)
+        return (decompressor.decompress(data) + decompressor.flush()).decode("utf-8")
+
+    def get(self, team, at=None):
+        record = self.latest(at).get(team)
+        if record is None:
+            raise KeyError(f"No {self.source} page for {team} in {self.year}")
+        with open(self.data_file, "rb") as f:
+            f.seek(record["offset"])
+            return self._decompress(f.read(record["length"]))
+
+    def pages(self, at=None):
+        """Yield (team, html, compressed bytes) for every team's latest page, in file-name order."""
+        latest = self.latest(at)
+        with open(self.data_file, "rb") as f:
+            for team in sorted(latest, key=page_order):
+                record = latest[team]
+                f.seek(record["offset"])
+                yield team, self._decompress(f.read(record["length"])), record["length"]
+
+    def add(self, team, html, fetched=None):
+        """Append a snapshot of team's page. Returns False (and adds nothing) if it is identical to the latest."""
+        body = html.encode("utf-8")
+        digest = hashlib.sha256(body).hexdigest()
+        fetched = time.time() if fetched is None else fetched
+        with self._lock:
+            previous = [record for record in self.records if record["team"] == team]
+            if previous and max(previous, key=lambda record: record["fetched"])["sha256"] == digest:
+                return False
+            compressor = zlib.compressobj(COMPRESSION_LEVEL, zdict=self.dictionary)
+            data = compressor.compress(body) + compressor.flush()
+            with open(self.data_file, "ab") as f:
+                offset = f.tell()
+                f.write(data)
+            self.records.append({"team": team, "fetched": fetched, "offset": offset, "length": len(data),
+                "size": len(body), "sha256": digest})
+            return True
+
+    def save(self):
+        with self._lock:
+            tmp_file = self.index_file.with_suffix(".tmp")
+            with open(tmp_file, "w", encoding="utf-8") as f:
+                json.dump({"source": self.source, "year": self.year, "pages": self.records}, f, indent=1)
+            os.replace(tmp_file, self.index_file)
+
+def season_pages(source, year):
+    """
+    Yield (team, html, bytes read) for each of the season's pages in file-name order,
+    from the archive if there is one, else from the loose .txt files.
+    """
+    archive = PageArchive(source, year)
+    if archive.exists():
+        yield from archive.pages()
+        return
+    source_dir = loose_dir(source, year)
+    if not source_dir.exists():
+        raise FileNotFoundError(f"Input directory not found: {source_dir}")
+    for txt_file in sorted(source_dir.glob("*.txt")):
+        html = txt_file.read_text(encoding="utf-8", errors="ignore")
+        yield txt_file.stem, html, txt_file.stat().st_size
+
+def import_loose(source, year, prune=False):
+    """Archive the season's loose pages (fetch time: file mtime), optionally deleting them after."""
+    source_dir = loose_dir(source, year)
+    txt_files = sorted(source_dir.glob("*.txt"))
+    pages = {path.stem: (path.read_text(encoding="utf-8", errors="ignore"), path.stat().st_mtime) for path in txt_files}
+    archive = PageArchive(source, year)
+    if archive.exists():
+        added = sum(archive.add(team, html, fetched) for team, (html, fetched) in pages.items())
+        archive.save()
+    else:
+        archive.create(pages)
+        added = len(pages)
+    print(f"Archived {added} new {source} pages for {year} ({len(pages) - added} already archived) in {archive.data_file}")
+    if prune:
+        # only delete what reads back identically
+        for path in txt_files:
+            if archive.get(path.stem) != pages[path.stem][0]:
+                raise RuntimeError(f"{path} does not read back identically, not pruning")
+        for path in txt_files:
+            path.unlink()
+        print(f"Removed {len(txt_files)} loose pages from {source_dir}")
+    return archive
+
+def export_loose(source, year, at=None):
+    """Write the archive's latest pages (as of at) back out as loose .txt files."""
+    source_dir = loose_dir(source, year)
+    source_dir.mkdir(parents=True, exist_ok=True)
+    count = 0
+    for team, html, _ in PageArchive(source, year).pages(at):
+        (source_dir / f"{team}.txt").write_text(html, encoding="utf-8")
+        count += 1
+    print(f"Wrote {count} pages to {source_dir}")
+
+def print_stats(source, year):
+    archive = PageArchive(source, year)
+    archive_bytes = sum(os.path.getsize(path) for path in (archive.data_file, archive.index_file, archive.dictionary_file))
+    raw_bytes = sum(record["size"] for record in archive.latest().values())
+    start = time.perf_counter()
+    count = sum(1 for _ in archive.pages())
+    read_seconds = time.perf_counter() - start
+    print(f"{count} teams, {len(archive.records)} snapshots, {len(archive.dictionary)} byte dictionary")
+    print(f"Latest pages {raw_bytes / 2**20:.2f} MB as text, archive {archive_bytes / 2**20:.2f} MB on disk "
+        f"({raw_bytes / archive_bytes:.1f}x); reading every page takes {read_seconds * 1000:.0f}ms")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Archive scraped team pages compressed, with an offset index.")
+    parser.add_argument("command", choices=["import", "export", "stats"])
+    parser.add_argument("--source", choices=sorted(SOURCE_DIRS), nargs="+", default=sorted(SOURCE_DIRS))
+    parser.add_argument("--year", type=int, default=2026)
+    parser.add_argument("--prune", action="store_true", help="import: delete the loose pages once archived")
+    parser.add_argument("--at", type=float, default=None, help="export: the pages as of this fetch time (epoch seconds)")
+    args = parser.parse_args(argv)
+
+    for source in args.source:
+        if args.command == "import":
+            import_loose(source, args.year, args.prune)
+        elif args.command == "export":
+            export_loose(source, args.year, args.at)
+        else:
+            print_stats(source, args.year)
+
+if __name__ == "__main__":
+    main()
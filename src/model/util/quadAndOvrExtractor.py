@@ -1,71 +1,25 @@
+import hashlib
 import json
+import os
 import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
 from html import unescape
 from pathlib import Path
 from typing import Optional
 
 from bs4 import BeautifulSoup
 
-NUM_TEAMS = 365
-QUAD_KEYS = ("q1", "q2", "q3", "q4")
-KP_STAT_ID_MAP = {
-	"Off Efficiency": "OE",
-	"Def Efficiency": "DE",
-	"Off TO%": "TOPct",
-	"Def TO%": "DTOPct",
-	"Off OR%": "ORPct",
-	"Def OR%": "DORPct",
-	"Off FT%": "FTPct",
-	"Off 3PA": "3PARate",
-	"Off 3P%": "3Pct",
-	"Tempo": "Tempo",
-	"A/FGM": "ARate",
-	"Off Avg. Poss. Length": "APLO",
-	"Def Avg. Poss. Length": "APLD",
-}
-
-ROW_STAT_LABEL_MAP = {
-	"Average Height": "Average Height",
-	"Overall": "SOS Overall",
-	"Non-conference": "SOS Non-conference",
-	"D-1 Experience": "D-1 Experience",
-	"Minutes Continuity": "Minutes Continuity",
-	"Bench Minutes": "Bench Minutes",
-}
-
-CONFERENCE_MAP = {
-	"A10": "Atlantic 10",
-	"AE": "Am East",
-	"B10": "B1G",
-	"BSth": "Big South",
-	"NEC": "NE",
-	"PL": "Patriot",
-	"SB": "Sun Belt",
-}
-
-KP_OVR_OUTPUT_ORDER = (
-	"KenPom Ovr.",
-	"Off Efficiency",
-	"Def Efficiency",
-	"Off TO%",
-	"Def TO%",
-	"Off OR%",
-	"Def OR%",
-	"Off FT%",
-	"Off 3PA",
-	"Off 3P%",
-	"Tempo",
-	"Average Height",
-	"A/FGM",
-	"Off Avg. Poss. Length",
-	"Def Avg. Poss. Length",
-	"SOS Overall",
-	"SOS Non-conference",
-	"D-1 Experience",
-	"Minutes Continuity",
-	"Bench Minutes",
-)
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+import kpPageParser
+import pageArchive
+import pipelineTrace
 
+# per-season content hashes of the pages and their parsed results (see extract_season)
+EXTRACT_STATE_DIR = Path(__file__).resolve().parent.parent / "extractState"
+# the code each source's cached results come from: editing it re-parses every page
+PARSER_FILES = {"kenpom": ("kpPageParser.py",), "bballnet": ("quadAndOvrExtractor.py",)}
+QUAD_KEYS = ("q1", "q2", "q3", "q4")
 KP_GAMES_COLUMNS = [
 	"date",
 	"opponentRank",
@@ -147,168 +101,122 @@ def extract_team_net_and_record(team_soup: BeautifulSoup) -> tuple[Optional[str]
 	return net, record
 
 
-def extractQuadStats(
-	year,
-) -> dict:
-	source_dir = Path(__file__).parent / f"tempTeamQuads/{year}"
-	target_file = Path(__file__).parent / f"quadStats{year}.json"
-
-	if not source_dir.exists():
-		raise FileNotFoundError(f"Input directory not found: {source_dir}")
-
-	team_quad_stats = {}
-
-	for txt_file in sorted(source_dir.glob("*.txt")):
-		team_name = txt_file.stem.replace("_", " ")
-		html = txt_file.read_text(encoding="utf-8", errors="ignore")
-		soup = BeautifulSoup(html, "html.parser")
-		net, team_record = extract_team_net_and_record(soup)
-
-		team_entry = {
-			"net": net,
-			"record": team_record,
-		}
-		team_entry.update(
-			{
-				quad_key: extract_quad_data(soup, quad_key)
-				for quad_key in QUAD_KEYS
-			}
-		)
-
-		team_quad_stats[team_name] = team_entry
-
-	target_file.write_text(json.dumps(team_quad_stats, indent=2), encoding="utf-8")
-	print(f"Saved quad stats for {len(team_quad_stats)} teams to {target_file}")
-
-	return team_quad_stats
-
-
-def extract_table_start_block(html: str) -> Optional[str]:
-	table_start_match = re.search(r"function\s+tableStart\(\)\s*\{(.*?)\}\s*function\s+dechex", html, flags=re.DOTALL)
-	if not table_start_match:
-		return None
-	return table_start_match.group(1)
-
-
-def parse_rank_value_from_fragment(fragment: str) -> tuple[Optional[int], Optional[str]]:
-	fragment_soup = BeautifulSoup(fragment, "html.parser")
+def write_json(target_file, payload) -> bool:
+	"""Write payload as JSON unless the file already holds exactly that, so its mtime only moves on a change. True if written."""
+	target_file = Path(target_file)
+	with pipelineTrace.stage("write_json", "write-json", rows=len(payload), file=target_file.name) as stage:
+		text = json.dumps(payload, indent=2)
+		if target_file.exists() and target_file.read_text(encoding="utf-8") == text:
+			return False
+		target_file.write_text(text, encoding="utf-8")
+		stage.wrote(len(text.encode("utf-8")))
+		return True
 
-	rank = None
-	rank_node = fragment_soup.select_one("span.seed")
-	if rank_node is not None:
-		rank_match = re.search(r"\d+", rank_node.get_text(" ", strip=True))
-		if rank_match:
-			rank = int(rank_match.group(0))
-		rank_node.decompose()
 
-	value = None
-	value_anchor = fragment_soup.find("a")
-	if value_anchor is not None:
-		value = value_anchor.get_text(" ", strip=True)
+def report_write(written, target_file, what, count):
+	if written:
+		print(f"Saved {what} for {count} teams to {target_file}")
 	else:
-		text_value = fragment_soup.get_text(" ", strip=True)
-		value = text_value or None
+		print(f"{what[0].upper()}{what[1:]} for {count} teams unchanged in {target_file}")
+
+
+def page_digest(html: str) -> str:
+	return hashlib.sha256(html.encode("utf-8")).hexdigest()
+
+
+def parser_digest(source) -> str:
+	digest = hashlib.sha256()
+	for name in PARSER_FILES[source]:
+		digest.update((Path(__file__).parent / name).read_bytes())
+	return digest.hexdigest()
+
+
+def manifest_file(source, year) -> Path:
+	return EXTRACT_STATE_DIR / f"{source}{year}.json"
+
+
+def load_manifest(source, year) -> dict:
+	"""{page name: {"sha256", "result"}} from the last extraction, or {} if there was none or the parser changed since."""
+	path = manifest_file(source, year)
+	if not path.exists():
+		return {}
+	manifest = json.loads(path.read_text(encoding="utf-8"))
+	if manifest.get("parser") != parser_digest(source):
+		return {}
+	return manifest["pages"]
+
+
+def save_manifest(source, year, pages):
+	EXTRACT_STATE_DIR.mkdir(exist_ok=True)
+	path = manifest_file(source, year)
+	tmp_file = path.with_suffix(".tmp")
+	tmp_file.write_text(json.dumps({"parser": parser_digest(source), "pages": pages}), encoding="utf-8")
+	os.replace(tmp_file, path)
+
+
+def extract_season(source, year, parse_pages, stage_name, parsed=None) -> dict:
+	"""
+	{team name: parsed result} for every page of the season, in file-name order. A page
+	whose content hash matches the manifest reuses its cached result, as does one in
+	parsed ({content hash: result} of pages already parsed this run); only the rest are
+	handed to parse_pages (a list of html in, a list of results out). Pages gone from the
+	season drop out of the manifest.
+	"""
+	manifest = load_manifest(source, year)
+	parsed = parsed or {}
+	pages, stale = {}, {}
+	with pipelineTrace.stage(stage_name, "parse-html", year=year) as stage:
+		for page_name, html, nbytes in pageArchive.season_pages(source, year):
+			stage.read(nbytes)
+			digest = page_digest(html)
+			entry = manifest.get(page_name)
+			if entry is not None and entry["sha256"] == digest:
+				pages[page_name] = entry
+			elif digest in parsed:
+				pages[page_name] = {"sha256": digest, "result": parsed[digest]}
+			else:
+				pages[page_name] = {"sha256": digest, "result": None}
+				stale[page_name] = html
+		for page_name, result in zip(stale, parse_pages(list(stale.values()))):
+			pages[page_name]["result"] = result
+		stage.rows = len(stale)
 
-	return rank, value
+	if pages != manifest:
+		save_manifest(source, year, pages)
+	print(f"Parsed {len(stale)} new or changed {source} pages for {year}, reused {len(pages) - len(stale)} unchanged")
+	return {page_name.replace("_", " "): entry["result"] for page_name, entry in pages.items()}
 
 
-def extract_rank_value_from_script(table_start_block: str, stat_id: str) -> tuple[Optional[int], Optional[str]]:
-	pattern = rf'\$\(\s*"td#{re.escape(stat_id)}"\s*\)\.html\(\s*"(?P<html>(?:\\.|[^"\\])*)"\s*\);'
-	match = re.search(pattern, table_start_block, flags=re.DOTALL)
-	if not match:
-		return None, None
+def parse_quad_page(html: str) -> dict:
+	soup = BeautifulSoup(html, "html.parser")
+	net, team_record = extract_team_net_and_record(soup)
 
-	fragment = match.group("html")
-	fragment = (
-		fragment
-		.replace(r'\"', '"')
-		.replace(r"\'", "'")
-		.replace(r"\\/", "/")
-		.replace(r"\\n", " ")
-		.replace(r"\\t", " ")
+	team_entry = {
+		"net": net,
+		"record": team_record,
+	}
+	team_entry.update(
+		{
+			quad_key: extract_quad_data(soup, quad_key)
+			for quad_key in QUAD_KEYS
+		}
 	)
+	return team_entry
 
-	return parse_rank_value_from_fragment(fragment)
-
-
-def extract_rank_value_from_cell(cell) -> tuple[Optional[int], Optional[str]]:
-	cell_soup = BeautifulSoup(str(cell), "html.parser")
-
-	rank = None
-	rank_node = cell_soup.select_one("span.seed")
-	if rank_node is not None:
-		rank_match = re.search(r"\d+", rank_node.get_text(" ", strip=True))
-		if rank_match:
-			rank = int(rank_match.group(0))
-		rank_node.decompose()
-
-	value = None
-	value_anchor = cell_soup.find("a")
-	if value_anchor is not None:
-		value = value_anchor.get_text(" ", strip=True)
-	else:
-		text_value = cell_soup.get_text(" ", strip=True)
-		value = text_value or None
-
-	return rank, value
-
-
-def extract_row_based_stats(team_soup: BeautifulSoup) -> dict:
-	report_table = team_soup.select_one("#report-table")
-	row_stats = {output_key: [None, None] for output_key in ROW_STAT_LABEL_MAP.values()}
-	if report_table is None:
-		return row_stats
-
-	for row in report_table.select("tr"):
-		cells = row.find_all("td")
-		if len(cells) < 2:
-			continue
-
-		label = cells[0].get_text(" ", strip=True).replace(":", "").strip()
-		output_key = ROW_STAT_LABEL_MAP.get(label)
-		if output_key is None:
-			continue
-
-		rank, value = extract_rank_value_from_cell(cells[1])
-		row_stats[output_key] = [rank, value]
 
-	return row_stats
-
-
-def extract_conference(team_soup: BeautifulSoup) -> Optional[str]:
-	conf_link = team_soup.select_one('#title-container a[href*="conf.php?c="]')
-	if conf_link is None:
-		return None
-
-	href = conf_link.get("href", "")
-	match = re.search(r"[?&]c=([^&]+)", href)
-	if not match:
-		return None
-
-	conference = unescape(match.group(1)).strip()
-	return CONFERENCE_MAP.get(conference, conference)
-
-
-def extract_overall_rank_value(team_soup: BeautifulSoup) -> tuple[Optional[int], Optional[str]]:
-	title_node = team_soup.select_one("#title-container h5")
-	if title_node is None:
-		return None, None
-
-	rank_nodes = title_node.select("span.rank")
-	if not rank_nodes:
-		return None, None
+def extractQuadStats(
+	year,
+	target_file=None,
+	parsed=None,
+) -> dict:
+	target_file = Path(target_file) if target_file else Path(__file__).parent / f"quadStats{year}.json"
 
-	rank = None
-	match = re.search(r"\d+", rank_nodes[0].get_text(" ", strip=True))
-	if match:
-		rank = int(match.group(0))
+	team_quad_stats = extract_season(
+		"bballnet", year, lambda pages: [parse_quad_page(html) for html in pages], "extractQuadStats", parsed)
 
-	value = None
-	if len(rank_nodes) > 1:
-		record_text = rank_nodes[1].get_text(" ", strip=True)
-		value = record_text.strip("()") if record_text else None
+	report_write(write_json(target_file, team_quad_stats), target_file, "quad stats", len(team_quad_stats))
 
-	return rank, value
+	return team_quad_stats
 
 
 def clean_cell_text(cell) -> str:
@@ -317,120 +225,78 @@ def clean_cell_text(cell) -> str:
 	return re.sub(r"\s+", " ", text).strip()
 
 
-def extract_schedule_opponent(opponent_cell) -> str:
-	opponent_link = opponent_cell.find("a")
-	if opponent_link is None:
-		return clean_cell_text(opponent_cell)
-
-	title = opponent_link.get("title")
-	if title:
-		return unescape(title).strip()
-
-	return clean_cell_text(opponent_link)
-
+def parse_kp_ovr_page(html: str) -> dict:
+	return kpPageParser.parse_team_page(html)[0]
 
-def extract_games(team_soup: BeautifulSoup) -> list[dict]:
-	schedule_table = team_soup.select_one("#schedule-table")
-	if schedule_table is None:
-		return []
 
-	games = []
-	for row in schedule_table.select("tr"):
-		row_classes = row.get("class", [])
-		if "w" not in row_classes and "l" not in row_classes:
-			continue
-
-		cells = row.find_all("td")
-		if len(cells) < 10:
-			continue
+def parse_kp_pages(pages, workers=None) -> list:
+	"""(kpOvrStats entry, kpGames rows) for each page's html, parsed across worker processes."""
+	workers = workers or os.cpu_count() or 1
+	if workers == 1 or len(pages) < 2:
+		return [kpPageParser.parse_team_page(html) for html in pages]
+	with ProcessPoolExecutor(max_workers=workers) as pool:
+		return list(pool.map(kpPageParser.parse_team_page, pages, chunksize=max(1, len(pages) // (workers * 4))))
 
-		games.append(
-			{
-				"date": clean_cell_text(cells[0]),
-				"opponentRank": clean_cell_text(cells[2]),
-				"opponent": extract_schedule_opponent(cells[3]),
-				"result": clean_cell_text(cells[4]),
-				"location": clean_cell_text(cells[7]),
-				"record": clean_cell_text(cells[8]),
-				"conferenceRecord": clean_cell_text(cells[9]),
-			}
-		)
 
-	return games
+def extract_kp_pages(year, stage_name, workers=None, parsed=None) -> dict:
+	"""{team name: (kpOvrStats entry, kpGames rows)} for every kenpom page of the season, in one pass."""
+	return extract_season("kenpom", year, lambda pages: parse_kp_pages(pages, workers), stage_name, parsed)
 
 
 def extractKpOvrStats(
 	year,
+	target_file=None,
+	workers=None,
+	parsed=None,
 ) -> dict:
-	source_dir = Path(__file__).parent / f"tempTeamPhps/{year}"
-	target_file = Path(__file__).parent / f"kpOvrStats{year}.json"
-
-	if not source_dir.exists():
-		raise FileNotFoundError(f"Input directory not found: {source_dir}")
-
-	team_stat_ranks = {}
-	txt_files = sorted(source_dir.glob("*.txt"))
-
-	for txt_file in txt_files:
-		html = txt_file.read_text(encoding="utf-8", errors="ignore")
-		soup = BeautifulSoup(html, "html.parser")
-		team_name = txt_file.stem.replace("_", " ")
-		table_start_block = extract_table_start_block(html)
-
-		overall_rank, overall_value = extract_overall_rank_value(soup)
-		stats = {"KenPom Ovr.": [overall_rank, overall_value]}
-		for output_key, stat_id in KP_STAT_ID_MAP.items():
-			rank, value = (None, None)
-			if table_start_block is not None:
-				rank, value = extract_rank_value_from_script(table_start_block, stat_id)
-			if output_key == "Def Avg. Poss. Length" and rank is not None:
-				rank = NUM_TEAMS - rank
-			stats[output_key] = [rank, value]
-
-		row_stats = extract_row_based_stats(soup)
-		conference = extract_conference(soup)
-
-		ordered_stats = {}
-		for key in KP_OVR_OUTPUT_ORDER:
-			if key in row_stats:
-				ordered_stats[key] = row_stats[key]
-			else:
-				ordered_stats[key] = stats.get(key, [None, None])
-		ordered_stats["conference"] = conference
+	target_file = Path(target_file) if target_file else Path(__file__).parent / f"kpOvrStats{year}.json"
 
-		team_stat_ranks[team_name] = ordered_stats
+	team_stat_ranks = {team_name: stats for team_name, (stats, _) in extract_kp_pages(year, "extractKpOvrStats", workers, parsed).items()}
 
-	target_file.write_text(json.dumps(team_stat_ranks, indent=2), encoding="utf-8")
-	print(f"Saved KenPom ranks for {len(team_stat_ranks)} teams to {target_file}")
+	report_write(write_json(target_file, team_stat_ranks), target_file, "KenPom ranks", len(team_stat_ranks))
 
 	return team_stat_ranks
 
 
+def kp_games_payload(teams: dict) -> dict:
+	return {
+		"columns": KP_GAMES_COLUMNS,
+		"teams": teams,
+	}
+
+
 def extractKpGames(
 	year,
+	target_file=None,
+	workers=None,
+	parsed=None,
 ) -> dict:
-	source_dir = Path(__file__).parent / f"tempTeamPhps/{year}"
-	target_file = Path(__file__).parent / f"kpGames{year}.json"
+	target_file = Path(target_file) if target_file else Path(__file__).parent / f"kpGames{year}.json"
 
-	if not source_dir.exists():
-		raise FileNotFoundError(f"Input directory not found: {source_dir}")
+	teams = {team_name: games for team_name, (_, games) in extract_kp_pages(year, "extractKpGames", workers, parsed).items()}
+	payload = kp_games_payload(teams)
 
-	teams = {}
-	for txt_file in sorted(source_dir.glob("*.txt")):
-		html = txt_file.read_text(encoding="utf-8", errors="ignore")
-		soup = BeautifulSoup(html, "html.parser")
-		team_name = txt_file.stem.replace("_", " ")
-		teams[team_name] = extract_games(soup)
+	report_write(write_json(target_file, payload), target_file, "KenPom games", len(teams))
 
-	payload = {
-		"columns": KP_GAMES_COLUMNS,
-		"teams": teams,
-	}
+	return payload
 
-	target_file.write_text(json.dumps(payload, indent=2), encoding="utf-8")
-	print(f"Saved KenPom games for {len(teams)} teams to {target_file}")
 
-	return payload
+def extractKpPages(
+	year,
+	workers=None,
+	parsed=None,
+) -> tuple[dict, dict]:
+	"""kpOvrStats and kpGames from a single parse of each page."""
+	teams = extract_kp_pages(year, "extractKpPages", workers, parsed)
+	team_stat_ranks = {team_name: stats for team_name, (stats, _) in teams.items()}
+	payload = kp_games_payload({team_name: games for team_name, (_, games) in teams.items()})
+
+	ovr_file = Path(__file__).parent / f"kpOvrStats{year}.json"
+	games_file = Path(__file__).parent / f"kpGames{year}.json"
+	report_write(write_json(ovr_file, team_stat_ranks), ovr_file, "KenPom ranks", len(teams))
+	report_write(write_json(games_file, payload), games_file, "KenPom games", len(teams))
+
+	return team_stat_ranks, payload
 
 if __name__ == "__main__":
 	  extractKpOvrStats(2026)
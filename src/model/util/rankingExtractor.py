@@ -1,33 +1,32 @@
 import json
 import os
+import sys
 from pathlib import Path
 
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+import pipelineTrace
+from seasonStore import season_store
+
 def calculate_net_ratings(year):
     """
     Calculate net ratings for a given year's four factors data.
     Net Rating = adjOE - adjDE
     """
     # Define paths
-    four_factors_path = Path(__file__).parent.parent / "fourFactors" / f"{year}.json"
     ratings_path = Path(__file__).parent.parent / "ratings" / f"{year}.json"
     
+    # Read four factors data (already numeric in the season store)
+    four_factors = season_store.four_factors(year)
+    
     # Check if source file exists
-    if not four_factors_path.exists():
+    if four_factors is None:
         print(f"Warning: Four factors file for {year} not found")
         return
     
-    # Read four factors data
-    with open(str(four_factors_path), 'r') as f:
-        four_factors = json.load(f)
-    
     # Calculate net ratings
     teams_with_ratings = []
-    for team_data in four_factors:
-        team_name = team_data['team']
-        adj_oe = float(team_data['adjOE'])
-        adj_de = float(team_data['adjDE'])
-        net_rating = adj_oe - adj_de
-        
+    net_ratings = four_factors['adjOE'] - four_factors['adjDE']
+    for team_name, net_rating in zip(four_factors['team'], net_ratings.tolist()):
         teams_with_ratings.append({
             'team': team_name,
             'netRating': round(net_rating, 2)
@@ -41,8 +40,10 @@ def calculate_net_ratings(year):
         team['rank'] = rank
     
     # Write to output file
-    with open(str(ratings_path), 'w') as f:
-        json.dump(teams_with_ratings, f, indent=2)
+    with pipelineTrace.stage('write_ratings', 'write-json', rows=len(teams_with_ratings), year=int(year)) as stage:
+        with open(str(ratings_path), 'w') as f:
+            json.dump(teams_with_ratings, f, indent=2)
+        stage.wrote(pipelineTrace.file_size(ratings_path))
     
     print(f"Created ratings file for {year} with {len(teams_with_ratings)} teams")
 
@@ -109,7 +110,7 @@ def add_ratings_to_postseason_games():
     
     print(f"\nCompleted! Updated matchups files from {years[0]} to {years[-1]}")
 
-def main():
+def main(years=None):
     # add ratings
     # add_ratings_to_postseason_games()
     
@@ -127,7 +128,7 @@ def main():
     '''
     # Sort years
     #years.sort()
-    years = [2026]
+    years = years or [2026]
     
     print(f"Processing {len(years)} years: {min(years)} - {max(years)}")
     